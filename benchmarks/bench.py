@@ -0,0 +1,388 @@
+"""Measure the throughput of pdfminer on synthetic documents and samples.
+
+Every workload runs in a fresh Python process, such that the peak resident
+set size of one workload is not affected by the others. The fastest of
+several repetitions is reported. Results can be saved as JSON and compared
+against a previously saved baseline:
+
+    python -m benchmarks.bench -o baseline.json
+    ...change pdfminer...
+    python -m benchmarks.bench -b baseline.json
+
+The exit status is 1 if any workload became slower than the baseline by
+more than the tolerance.
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pdfminer
+from pdfminer.converter import HTMLConverter
+from pdfminer.converter import JSONConverter
+from pdfminer.converter import PDFPageAggregator
+from pdfminer.converter import RawTextConverter
+from pdfminer.converter import TextConverter
+from pdfminer.converter import XMLConverter
+from pdfminer.layout import LAParams
+from pdfminer.pdfdevice import TagExtractor
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfinterp import PDFPageInterpreter
+from pdfminer.pdfinterp import PDFResourceManager
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdftypes import PDFObjectNotFound
+from pdfminer.pdftypes import PDFStream
+from pdfminer.pdftypes import stream_value
+from pdfminer.psparser import PSBaseParser
+from pdfminer.psparser import PSEOF
+
+from . import synthetic
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLES_DIR = os.path.join(ROOT, 'samples')
+
+WORKLOADS = {}
+
+
+def workload(name):
+    """Register a workload.
+
+    A workload is a function that gets the bytes of a PDF document and does
+    all preparations that should not be measured. It returns a function
+    that does the measured work, and returns the number of pages and the
+    number of bytes that were processed.
+    """
+    def register(func):
+        WORKLOADS[name] = func
+        return func
+    return register
+
+
+def get_document(data):
+    return PDFDocument(PDFParser(io.BytesIO(data)))
+
+
+def get_contents(page):
+    return b''.join(stream_value(strm).get_data() for strm in page.contents)
+
+
+@workload('tokenize')
+def tokenize(data):
+    """Tokenize the content streams of all pages with PSBaseParser"""
+    contents = [get_contents(page)
+                for page in PDFPage.create_pages(get_document(data))]
+
+    def run():
+        for content in contents:
+            parser = PSBaseParser(io.BytesIO(content))
+            try:
+                while True:
+                    parser.nexttoken()
+            except PSEOF:
+                pass
+        return (len(contents), sum(len(content) for content in contents))
+    return run
+
+
+@workload('xref')
+def xref(data):
+    """Parse the trailer and load the cross-reference tables"""
+    def run():
+        get_document(data)
+        return (0, len(data))
+    return run
+
+
+@workload('decode')
+def decode(data):
+    """Decode all streams, the number of bytes is that of the decoded data"""
+    doc = get_document(data)
+    streams = []
+    for xref in doc.xrefs:
+        for objid in xref.get_objids():
+            try:
+                obj = doc.getobj(objid)
+            except PDFObjectNotFound:
+                continue
+            if isinstance(obj, PDFStream) and obj.get_rawdata() is not None:
+                streams.append((obj.attrs, obj.get_rawdata(), obj.decipher,
+                                obj.objid, obj.genno))
+
+    def run():
+        size = 0
+        for (attrs, rawdata, decipher, objid, genno) in streams:
+            strm = PDFStream(attrs, rawdata, decipher)
+            strm.set_objid(objid, genno)
+            size += len(strm.get_data())
+        return (0, size)
+    return run
+
+
+def interpret_pages(data, device):
+    interpreter = PDFPageInterpreter(device.rsrcmgr, device)
+    npages = 0
+    for page in PDFPage.get_pages(io.BytesIO(data)):
+        interpreter.process_page(page)
+        npages += 1
+    device.close()
+    return (npages, len(data))
+
+
+@workload('interpret')
+def interpret(data):
+    """Interpret all pages without layout analysis"""
+    def run():
+        device = PDFPageAggregator(PDFResourceManager(), laparams=None)
+        return interpret_pages(data, device)
+    return run
+
+
+@workload('layout')
+def layout(data):
+    """Interpret all pages and analyze their layout"""
+    def run():
+        device = PDFPageAggregator(PDFResourceManager(), laparams=LAParams())
+        return interpret_pages(data, device)
+    return run
+
+
+def converter_workload(name, converter_class):
+    def convert(data):
+        def run():
+            device = converter_class(PDFResourceManager(), io.BytesIO(),
+                                     laparams=LAParams())
+            return interpret_pages(data, device)
+        return run
+    convert.__doc__ = 'Convert all pages to %s' % name
+    workload(name)(convert)
+    return
+
+
+converter_workload('text', TextConverter)
+converter_workload('html', HTMLConverter)
+converter_workload('xml', XMLConverter)
+converter_workload('json', JSONConverter)
+
+
+@workload('raw')
+def raw(data):
+    """Extract the text of all pages without layout analysis"""
+    def run():
+        device = RawTextConverter(PDFResourceManager(), io.BytesIO())
+        return interpret_pages(data, device)
+    return run
+
+
+@workload('tag')
+def tag(data):
+    """Extract the tagged text of all pages"""
+    def run():
+        device = TagExtractor(PDFResourceManager(), io.BytesIO())
+        return interpret_pages(data, device)
+    return run
+
+
+def get_peak_rss():
+    """Peak resident set size of this process in MB, if it is known"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        # bytes on macOS, kilobytes elsewhere
+        rss /= 1024
+    return rss / 1024
+
+
+def load_input(source):
+    """Return the bytes of a synthetic document or of a file
+
+    Synthetic documents are given as synthetic:<pages>:<filter>.
+    """
+    if source.startswith('synthetic:'):
+        (_, npages, fltr) = source.split(':')
+        return synthetic.make_pdf(int(npages), fltr or None)
+    with open(source, 'rb') as fp:
+        return fp.read()
+
+
+def measure(name, source, repeat):
+    """Run a workload in this process and return its results"""
+    data = load_input(source)
+    run = WORKLOADS[name](data)
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        (npages, nbytes) = run()
+        seconds = time.perf_counter() - t0
+        if best is None or seconds < best:
+            best = seconds
+    result = {
+        'seconds': best,
+        'pages': npages,
+        'bytes': nbytes,
+        'pages_per_sec': npages / best if npages and best else None,
+        'mb_per_sec': nbytes / best / 2**20 if nbytes and best else None,
+        'peak_rss_mb': get_peak_rss(),
+    }
+    return result
+
+
+def measure_in_subprocess(name, source, repeat):
+    args = [sys.executable, '-m', 'benchmarks.bench', '--worker', name,
+            source, '--repeat', str(repeat)]
+    proc = subprocess.run(args, cwd=ROOT, stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE, universal_newlines=True)
+    if proc.returncode != 0:
+        lines = proc.stderr.strip().splitlines()
+        return {'error': lines[-1] if lines else 'failed'}
+    return json.loads(proc.stdout)
+
+
+def get_inputs(scales, filters, samples):
+    """Return a list of (input name, source, workloads)"""
+    inputs = []
+    for npages in scales:
+        inputs.append(('synthetic-%dp' % npages,
+                       'synthetic:%d:FlateDecode' % npages,
+                       sorted(WORKLOADS)))
+        for fltr in filters:
+            if fltr != 'FlateDecode':
+                inputs.append(('synthetic-%dp-%s' % (npages, fltr),
+                               'synthetic:%d:%s' % (npages, fltr),
+                               ['decode']))
+    if samples:
+        for (dirpath, dirnames, filenames) in os.walk(SAMPLES_DIR):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.lower().endswith('.pdf'):
+                    path = os.path.join(dirpath, filename)
+                    inputs.append((os.path.relpath(path, SAMPLES_DIR), path,
+                                   sorted(WORKLOADS)))
+    return inputs
+
+
+def format_number(value, fmt):
+    if value is None:
+        return '-'
+    return fmt % value
+
+
+def format_change(result, baseline, tolerance):
+    """Return the change in time relative to the baseline and whether it is
+    a regression"""
+    if baseline is None or 'seconds' not in baseline:
+        return ('', False)
+    ratio = result['seconds'] / baseline['seconds']
+    regression = 1 + tolerance < ratio
+    change = '%+.1f%%' % ((ratio - 1) * 100)
+    if regression:
+        change += ' SLOWER'
+    return (change, regression)
+
+
+def maketheparser():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        '--workload', '-w', action='append', choices=sorted(WORKLOADS),
+        help='Workload to run, can be given multiple times. Default is all.')
+    parser.add_argument(
+        '--scale', '-s', type=int, action='append',
+        help='Number of pages of a synthetic document, can be given '
+             'multiple times. Default is 10 and 100.')
+    parser.add_argument(
+        '--filter', '-f', action='append',
+        choices=sorted(f for f in synthetic.ENCODERS if f),
+        help='Filter of the synthetic documents to decode, can be given '
+             'multiple times. Default is all.')
+    parser.add_argument(
+        '--samples', action='store_true',
+        help='Also run the workloads on all documents in samples/.')
+    parser.add_argument(
+        '--input', '-i', action='append', default=[],
+        help='Also run the workloads on this PDF file.')
+    parser.add_argument(
+        '--repeat', '-r', type=int, default=3,
+        help='Number of repetitions of each workload, the fastest is '
+             'reported.')
+    parser.add_argument(
+        '--output', '-o',
+        help='Save the results as JSON to this file.')
+    parser.add_argument(
+        '--baseline', '-b',
+        help='Compare the results with this JSON file.')
+    parser.add_argument(
+        '--tolerance', '-t', type=float, default=0.1,
+        help='Relative slowdown that is reported as a regression.')
+    parser.add_argument('--worker', nargs=2, help=argparse.SUPPRESS)
+    return parser
+
+
+def main(args=None):
+    A = maketheparser().parse_args(args=args)
+
+    if A.worker:
+        (name, source) = A.worker
+        json.dump(measure(name, source, A.repeat), sys.stdout)
+        return 0
+
+    workloads = A.workload or sorted(WORKLOADS)
+    filters = A.filter or sorted(f for f in synthetic.ENCODERS if f)
+    inputs = get_inputs(A.scale or [10, 100], filters, A.samples)
+    inputs.extend((path, os.path.abspath(path), sorted(WORKLOADS))
+                  for path in A.input)
+
+    baseline = {}
+    if A.baseline:
+        with open(A.baseline) as fp:
+            baseline = json.load(fp)['results']
+
+    results = {}
+    regressions = 0
+    row = '%-10s %-36s %9s %9s %9s %8s  %s'
+    print(row % ('workload', 'input', 'seconds', 'pages/s', 'MB/s',
+                 'peak MB', 'change'))
+    for (input_name, source, input_workloads) in inputs:
+        for name in workloads:
+            if name not in input_workloads:
+                continue
+            key = '%s:%s' % (name, input_name)
+            result = measure_in_subprocess(name, source, A.repeat)
+            results[key] = result
+            if 'error' in result:
+                print(row % (name, input_name, '-', '-', '-', '-',
+                             'error: %s' % result['error']))
+                continue
+            (change, regression) = format_change(
+                result, baseline.get(key), A.tolerance)
+            regressions += regression
+            print(row % (
+                name, input_name,
+                format_number(result['seconds'], '%.3f'),
+                format_number(result['pages_per_sec'], '%.1f'),
+                format_number(result['mb_per_sec'], '%.2f'),
+                format_number(result['peak_rss_mb'], '%.1f'),
+                change))
+            sys.stdout.flush()
+
+    if A.output:
+        with open(A.output, 'w') as fp:
+            json.dump({'pdfminer': pdfminer.__version__,
+                       'python': sys.version.split()[0],
+                       'results': results}, fp, indent=2, sort_keys=True)
+
+    if regressions:
+        print('%d workload(s) are slower than the baseline' % regressions)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,192 @@
+"""Generate synthetic PDF documents for benchmarking.
+
+The documents are deterministic for a given number of pages, filter and seed.
+Every page has a few columns of text set in the standard Helvetica font, with
+kerning adjustments, and some rectangles and lines. The content streams are
+encoded with one of the filters that pdfminer can decode.
+"""
+
+import base64
+import zlib
+from random import Random
+
+
+WORDS = (
+    'lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod '
+    'tempor incididunt ut labore et dolore magna aliqua enim ad minim veniam '
+    'quis nostrud exercitation ullamco laboris nisi aliquip ex ea commodo '
+    'consequat duis aute irure in reprehenderit voluptate velit esse cillum '
+    'eu fugiat nulla pariatur excepteur sint occaecat cupidatat non proident '
+    'sunt culpa qui officia deserunt mollit anim id est laborum').split()
+
+
+def lzwencode(data):
+    """Encode data such that pdfminer.lzw.lzwdecode() gives it back.
+
+    The code width grows one code early, like the decoder expects, and the
+    table is cleared before it runs full.
+    """
+    out = []
+    buff = 0
+    nbuff = 0
+
+    def write(code, nbits):
+        nonlocal buff, nbuff
+        buff = (buff << nbits) | code
+        nbuff += nbits
+        while 8 <= nbuff:
+            nbuff -= 8
+            out.append((buff >> nbuff) & 0xff)
+            buff &= (1 << nbuff) - 1
+
+    def width(ncodes):
+        # The decoder table has 258+ncodes-1 entries after ncodes codes.
+        size = 258 + max(0, ncodes - 1)
+        if size < 511:
+            return 9
+        elif size < 1023:
+            return 10
+        elif size < 2047:
+            return 11
+        return 12
+
+    table = {bytes((c,)): c for c in range(256)}
+    ncodes = 0
+    write(256, 9)
+    w = b''
+    for c in data:
+        wc = w + bytes((c,))
+        if wc in table:
+            w = wc
+            continue
+        write(table[w], width(ncodes))
+        ncodes += 1
+        table[wc] = 257 + ncodes
+        w = bytes((c,))
+        if 4000 <= 257 + ncodes:
+            write(256, width(ncodes))
+            table = {bytes((c,)): c for c in range(256)}
+            ncodes = 0
+    if w:
+        write(table[w], width(ncodes))
+        ncodes += 1
+    write(257, width(ncodes))
+    if nbuff:
+        out.append((buff << (8 - nbuff)) & 0xff)
+    return bytes(out)
+
+
+def rlencode(data):
+    """Encode data with RunLengthDecode literal and repeat runs"""
+    out = bytearray()
+    i = 0
+    n = len(data)
+    while i < n:
+        j = i
+        while j + 1 < n and data[j + 1] == data[i] and j - i < 127:
+            j += 1
+        if i < j:
+            out.append(257 - (j - i + 1))
+            out.append(data[i])
+            i = j + 1
+        else:
+            j = i + 1
+            while j < n and j - i < 128 and \
+                    (j + 1 >= n or data[j] != data[j + 1]):
+                j += 1
+            out.append(j - i - 1)
+            out.extend(data[i:j])
+            i = j
+    out.append(128)
+    return bytes(out)
+
+
+ENCODERS = {
+    None: lambda data: data,
+    'FlateDecode': zlib.compress,
+    'LZWDecode': lzwencode,
+    'ASCII85Decode': lambda data: base64.a85encode(data) + b'~>',
+    'ASCIIHexDecode': lambda data: base64.b16encode(data) + b'>',
+    'RunLengthDecode': rlencode,
+}
+
+
+def escape_string(s):
+    return s.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def make_page_content(rand, pageno, columns=2, lines=45):
+    """Content stream of a page with columns of text and some graphics"""
+    ops = []
+    ops.append('0.5 w 36 36 540 720 re S')
+    for column in range(columns):
+        x = 54 + column * 260
+        ops.append('BT /F1 9 Tf 11 TL %d 740 Td' % x)
+        for lineno in range(lines):
+            words = [rand.choice(WORDS) for _ in range(rand.randint(4, 8))]
+            if lineno % 3 == 0:
+                # TJ with kerning adjustments between words
+                items = []
+                for word in words:
+                    items.append('(%s)' % escape_string(word + ' '))
+                    items.append(str(rand.randint(-30, 30)))
+                ops.append('[%s] TJ T*' % ' '.join(items[:-1]))
+            else:
+                ops.append('(%s) Tj T*' % escape_string(' '.join(words)))
+        ops.append('ET')
+    for i in range(5):
+        y = 60 + i * 130
+        ops.append('%d %d m %d %d l S' % (40, y, 572, y))
+    ops.append('q 0.9 g 300 40 %d 20 re f Q' % (40 + pageno % 200))
+    return '\n'.join(ops).encode('latin-1')
+
+
+def make_pdf(npages, filter='FlateDecode', seed=0):
+    """Return the bytes of a PDF document with npages pages
+
+    filter is the name of the filter used for the content streams, or None
+    to store them unencoded.
+    """
+    encode = ENCODERS[filter]
+    rand = Random(seed)
+    objs = []
+
+    def add(body):
+        objs.append(body)
+        return len(objs)
+
+    catalog = add(None)
+    pages = add(None)
+    font = add(b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica '
+               b'/Encoding /WinAnsiEncoding >>')
+    kids = []
+    for pageno in range(npages):
+        data = encode(make_page_content(rand, pageno))
+        if filter is None:
+            attrs = b'/Length %d' % len(data)
+        else:
+            attrs = b'/Length %d /Filter /%s' % (len(data), filter.encode())
+        content = add(b'<< %s >>\nstream\n%s\nendstream' % (attrs, data))
+        kids.append(add(
+            b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] '
+            b'/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>'
+            % (pages, font, content)))
+    objs[catalog - 1] = b'<< /Type /Catalog /Pages %d 0 R >>' % pages
+    objs[pages - 1] = b'<< /Type /Pages /Count %d /Kids [%s] >>' \
+        % (npages, b' '.join(b'%d 0 R' % kid for kid in kids))
+
+    out = [b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n']
+    pos = len(out[0])
+    offsets = []
+    for (i, body) in enumerate(objs):
+        chunk = b'%d 0 obj\n%s\nendobj\n' % (i + 1, body)
+        offsets.append(pos)
+        out.append(chunk)
+        pos += len(chunk)
+    xref = [b'xref\n0 %d\n' % (len(objs) + 1), b'0000000000 65535 f \n']
+    xref.extend(b'%010d 00000 n \n' % offset for offset in offsets)
+    out.extend(xref)
+    out.append(b'trailer\n<< /Size %d /Root %d 0 R >>\n'
+               % (len(objs) + 1, catalog))
+    out.append(b'startxref\n%d\n%%%%EOF\n' % pos)
+    return b''.join(out)
@@ -2,12 +2,33 @@
 See https://en.wikipedia.org/wiki/RC4
 This code is in the public domain.
 
+The cipher of the cryptography package is used when it supports the length
+of the key.
 """
 
+from cryptography.exceptions import UnsupportedAlgorithm
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.ciphers import Cipher
+
+try:
+    from cryptography.hazmat.decrepit.ciphers.algorithms import ARC4
+except ImportError:
+    # cryptography < 43
+    from cryptography.hazmat.primitives.ciphers.algorithms import ARC4
+
 
 class Arcfour:
 
     def __init__(self, key):
+        self.cipher = None
+        if len(key) * 8 in ARC4.key_sizes:
+            try:
+                self.cipher = Cipher(ARC4(bytes(key)), mode=None,
+                                     backend=default_backend()).encryptor()
+                return
+            except UnsupportedAlgorithm:
+                # RC4 is not available in the OpenSSL of the system
+                pass
         # because Py3 range is not indexable
         s = [i for i in range(256)]
         j = 0
@@ -20,16 +41,17 @@ class Arcfour:
         return
 
     def process(self, data):
+        if self.cipher is not None:
+            return self.cipher.update(data)
         (i, j) = (self.i, self.j)
         s = self.s
-        r = b''
-        for c in iter(data):
+        r = bytearray(len(data))
+        for (n, c) in enumerate(data):
             i = (i+1) % 256
             j = (j+s[i]) % 256
             (s[i], s[j]) = (s[j], s[i])
-            k = s[(s[i]+s[j]) % 256]
-            r += bytes((c ^ k,))
+            r[n] = c ^ s[(s[i]+s[j]) % 256]
         (self.i, self.j) = (i, j)
-        return r
+        return bytes(r)
 
     encrypt = decrypt = process
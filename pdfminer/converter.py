@@ -1,9 +1,10 @@
 import io
+import json
 import logging
+import math
 import re
-import sys
 from .pdfdevice import PDFTextDevice
-from .pdffont import PDFUnicodeNotDefined
+from .layout import LTAnno
 from .layout import LTContainer
 from .layout import LTPage
 from .layout import LTText
@@ -17,12 +18,20 @@ from .layout import LTTextLine
 from .layout import LTTextBox
 from .layout import LTTextBoxVertical
 from .layout import LTTextGroup
+from .layout import TextLineGrouper
 from .utils import apply_matrix_pt
 from .utils import mult_matrix
 from .utils import enc
 from .utils import bbox2str
+from .utils import bbox2list
+from .utils import get_bound
 from . import utils
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 log = logging.getLogger(__name__)
 
@@ -34,6 +43,8 @@ class PDFLayoutAnalyzer(PDFTextDevice):
         self.pageno = pageno
         self.laparams = laparams
         self._stack = []
+        self._grouper_stack = []
+        self.cur_grouper = None
         return
 
     def begin_page(self, page, ctm):
@@ -42,31 +53,61 @@ class PDFLayoutAnalyzer(PDFTextDevice):
         (x1, y1) = apply_matrix_pt(ctm, (x1, y1))
         mediabox = (0, 0, abs(x0-x1), abs(y0-y1))
         self.cur_item = LTPage(self.pageno, mediabox)
+        self.cur_grouper = self._get_grouper(self.cur_item)
         return
 
     def end_page(self, page):
         assert not self._stack, str(len(self._stack))
         assert isinstance(self.cur_item, LTPage), str(type(self.cur_item))
+        self._flush_grouper()
+        stats = self.stats
         if self.laparams is not None:
+            if stats is not None:
+                stats.start('layout')
             self.cur_item.analyze(self.laparams)
+            if stats is not None:
+                stats.stop('layout')
         self.pageno += 1
+        if stats is not None:
+            stats.start('output')
         self.receive_layout(self.cur_item)
+        if stats is not None:
+            stats.stop('output')
         return
 
     def begin_figure(self, name, bbox, matrix):
         self._stack.append(self.cur_item)
+        self._grouper_stack.append(self.cur_grouper)
         self.cur_item = LTFigure(name, bbox, mult_matrix(matrix, self.ctm))
+        self.cur_grouper = self._get_grouper(self.cur_item)
         return
 
     def end_figure(self, _):
         fig = self.cur_item
         assert isinstance(self.cur_item, LTFigure), str(type(self.cur_item))
+        self._flush_grouper()
         self.cur_item = self._stack.pop()
+        self.cur_grouper = self._grouper_stack.pop()
         self.cur_item.add(fig)
         return
 
+    def _get_grouper(self, item):
+        """Returns a TextLineGrouper if text lines are grouped incrementally"""
+        if self.laparams is None or not self.laparams.incremental:
+            return None
+        if isinstance(item, LTFigure) and not self.laparams.all_texts:
+            return None
+        return TextLineGrouper(self.laparams)
+
+    def _flush_grouper(self):
+        if self.cur_grouper is not None:
+            self.cur_item.extend(self.cur_grouper.flush())
+        return
+
     def render_image(self, name, stream):
         assert isinstance(self.cur_item, LTFigure), str(type(self.cur_item))
+        # The image can be used after the file of the document is closed.
+        stream.get_rawdata()
         item = LTImage(name, stream,
                        (self.cur_item.x0, self.cur_item.y0,
                         self.cur_item.x1, self.cur_item.y1))
@@ -124,18 +165,68 @@ class PDFLayoutAnalyzer(PDFTextDevice):
                         gstate.scolor, gstate.ncolor)
         return curve
 
+    def render_string_horizontal(self, seq, matrix, pos,
+                                 font, fontsize, scaling, charspace, wordspace,
+                                 rise, dxscale, ncs, graphicstate):
+        """Render the characters of a horizontal text string at once.
+
+        The characters are created together and passed to render_chars().
+        Subclasses that override render_char() still receive the characters
+        one by one.
+        """
+        if type(self).render_char is not PDFLayoutAnalyzer.render_char:
+            return PDFTextDevice.render_string_horizontal(
+                self, seq, matrix, pos, font, fontsize, scaling, charspace,
+                wordspace, rise, dxscale, ncs, graphicstate)
+        (x, y) = pos
+        needcharspace = False
+        run = []
+        for obj in seq:
+            if utils.isnumber(obj):
+                x -= obj*dxscale
+                needcharspace = True
+            else:
+                for cid in font.decode(obj):
+                    if needcharspace:
+                        x += charspace
+                    (text, textwidth, _) = font.get_glyph(cid)
+                    if text is None:
+                        text = self.handle_undefined_char(font, cid)
+                    run.append((x, text, textwidth))
+                    x += textwidth * fontsize * scaling
+                    if cid == 32 and wordspace:
+                        x += wordspace
+                    needcharspace = True
+        if run:
+            self.render_chars(LTChar.create_horizontal_run(
+                matrix, font, fontsize, scaling, rise, y, run, ncs,
+                graphicstate))
+        return (x, y)
+
+    def render_chars(self, items):
+        """Receives the LTChar objects of a text string at once."""
+        if self.stats is not None:
+            self.stats.count('chars', len(items))
+        if self.cur_grouper is None:
+            self.cur_item.extend(items)
+        else:
+            for item in items:
+                self.cur_item.extend(self.cur_grouper.feed(item))
+        return
+
     def render_char(self, matrix, font, fontsize, scaling, rise, cid, ncs,
                     graphicstate):
-        try:
-            text = font.to_unichr(cid)
-            assert isinstance(text, str), str(type(text))
-        except PDFUnicodeNotDefined:
+        (text, textwidth, textdisp) = font.get_glyph(cid)
+        if text is None:
             text = self.handle_undefined_char(font, cid)
-        textwidth = font.char_width(cid)
-        textdisp = font.char_disp(cid)
         item = LTChar(matrix, font, fontsize, scaling, rise, text, textwidth,
                       textdisp, ncs, graphicstate)
-        self.cur_item.add(item)
+        if self.stats is not None:
+            self.stats.count('chars')
+        if self.cur_grouper is None:
+            self.cur_item.add(item)
+        else:
+            self.cur_item.extend(self.cur_grouper.feed(item))
         return item.adv
 
     def handle_undefined_char(self, font, cid):
@@ -233,6 +324,131 @@ class TextConverter(PDFConverter):
         return
 
 
+class RawTextConverter(PDFTextDevice):
+    """Writes the text of a page in the order of the content stream.
+
+    There is no layout analysis and no LTChar objects are created. Only the
+    start and end points of every text string are computed, to insert a
+    space when there is a gap between two strings or at a large TJ
+    adjustment, and a newline when the text moves to another line.
+
+    word_margin is the gap that separates two words, relative to the font
+    size.
+    """
+
+    def __init__(self, rsrcmgr, outfp, codec='utf-8', word_margin=0.1,
+                 showpageno=False):
+        PDFTextDevice.__init__(self, rsrcmgr)
+        self.outfp = outfp
+        self.codec = codec
+        self.word_margin = word_margin
+        self.showpageno = showpageno
+        self.outfp_binary = PDFConverter._is_binary_stream(outfp)
+        self._parts = []
+        self._last = None
+        return
+
+    def write_text(self, text):
+        if self.outfp_binary:
+            text = text.encode(self.codec, 'ignore')
+        self.outfp.write(text)
+        return
+
+    def begin_page(self, page, ctm):
+        self._parts = []
+        self._last = None
+        if self.showpageno:
+            self._parts.append('Page %s\n' % page.pageid)
+        return
+
+    def end_page(self, page):
+        if self._last is not None:
+            self._parts.append('\n')
+        self._parts.append('\f')
+        self.write_text(''.join(self._parts))
+        self._parts = []
+        return
+
+    def render_string(self, textstate, seq, ncs, graphicstate):
+        matrix = mult_matrix(textstate.matrix, self.ctm)
+        font = textstate.font
+        fontsize = textstate.fontsize
+        scaling = textstate.scaling * .01
+        charspace = textstate.charspace * scaling
+        wordspace = textstate.wordspace * scaling
+        if font.is_multibyte():
+            wordspace = 0
+        dxscale = .001 * fontsize * scaling
+        margin = self.word_margin * fontsize
+        vertical = font.is_vertical()
+        (x, y) = textstate.linematrix
+        (a, b, c, d, _, _) = matrix
+        if vertical:
+            (dirx, diry) = (-c, -d)
+            size = fontsize * math.hypot(a, b)
+        else:
+            (dirx, diry) = (a, b)
+            size = fontsize * math.hypot(c, d)
+        norm = math.hypot(dirx, diry) or 1
+        (dirx, diry) = (dirx / norm, diry / norm)
+        parts = self._parts
+        self.break_text(apply_matrix_pt(matrix, (x, y)), dirx, diry)
+        pos = y if vertical else x
+        needcharspace = False
+        for obj in seq:
+            if utils.isnumber(obj):
+                gap = obj * dxscale
+                pos -= gap
+                if margin < -gap:
+                    self.add_space()
+                needcharspace = True
+                continue
+            for cid in font.decode(obj):
+                if needcharspace:
+                    pos += charspace
+                (text, width, _) = font.get_glyph(cid)
+                if text is None:
+                    text = self.handle_undefined_char(font, cid)
+                parts.append(text)
+                pos += width * fontsize * scaling
+                if cid == 32 and wordspace:
+                    pos += wordspace
+                needcharspace = True
+        if vertical:
+            y = pos
+        else:
+            x = pos
+        textstate.linematrix = (x, y)
+        self._last = (apply_matrix_pt(matrix, (x, y)), size)
+        return
+
+    def break_text(self, start, dirx, diry):
+        """Add a space or a newline between the previous string and the one
+        that starts at start."""
+        if self._last is None:
+            return
+        ((x0, y0), size) = self._last
+        dx = start[0] - x0
+        dy = start[1] - y0
+        along = dx * dirx + dy * diry
+        across = dy * dirx - dx * diry
+        if size * 0.5 < abs(across) or along < -size:
+            self._parts.append('\n')
+        elif self.word_margin * size < along:
+            self.add_space()
+        return
+
+    def add_space(self):
+        parts = self._parts
+        if parts and not parts[-1][-1:].isspace():
+            parts.append(' ')
+        return
+
+    def handle_undefined_char(self, font, cid):
+        log.info('undefined: %r, %r', font, cid)
+        return '(cid:%d)' % cid
+
+
 class HTMLConverter(PDFConverter):
     RECT_COLORS = {
         'figure': 'yellow',
@@ -273,14 +489,21 @@ class HTMLConverter(PDFConverter):
         self._yoffset = self.pagemargin
         self._font = None
         self._fontstack = []
+        self._buffer = []
         self.write_header()
+        self.flush()
         return
 
     def write(self, text):
+        self._buffer.append(text)
+        return
+
+    def flush(self):
+        """Encode and write the output of the page at once"""
+        text = ''.join(self._buffer)
+        self._buffer = []
         if self.codec:
             text = text.encode(self.codec)
-        if sys.version_info < (3, 0):
-            text = str(text)
         self.outfp.write(text)
         return
 
@@ -340,12 +563,10 @@ class HTMLConverter(PDFConverter):
         color = self.text_colors.get(color)
         if color is not None:
             s = '<span style="position:absolute; color:%s; left:%dpx; ' \
-                'top:%dpx; font-size:%dpx;">' % \
+                'top:%dpx; font-size:%dpx;">%s</span>\n' % \
                 (color, x * self.scale, (self._yoffset - y) * self.scale,
-                 size * self.scale * self.fontscale)
+                 size * self.scale * self.fontscale, enc(text))
             self.write(s)
-            self.write_text(text)
-            self.write('</span>\n')
         return
 
     def begin_div(self, color, borderwidth, x, y, w, h, writing_mode=False):
@@ -393,7 +614,14 @@ class HTMLConverter(PDFConverter):
             return
 
         def render(item):
-            if isinstance(item, LTPage):
+            if isinstance(item, LTChar):
+                if self.layoutmode == 'exact':
+                    self.place_border('char', 1, item)
+                    self.place_text('char', item.get_text(), item.x0,
+                                    item.y1, item.size)
+                else:
+                    self.put_text(item.get_text(), item.fontname, item.size)
+            elif isinstance(item, LTPage):
                 self._yoffset += item.y1
                 self.place_border('page', 1, item)
                 if self.showpageno:
@@ -429,10 +657,6 @@ class HTMLConverter(PDFConverter):
                                         item.y1, 20)
                         for child in item:
                             render(child)
-                    elif isinstance(item, LTChar):
-                        self.place_border('char', 1, item)
-                        self.place_text('char', item.get_text(), item.x0,
-                                        item.y1, item.size)
                 else:
                     if isinstance(item, LTTextLine):
                         for child in item:
@@ -446,18 +670,17 @@ class HTMLConverter(PDFConverter):
                         for child in item:
                             render(child)
                         self.end_div('textbox')
-                    elif isinstance(item, LTChar):
-                        self.put_text(item.get_text(), item.fontname,
-                                      item.size)
                     elif isinstance(item, LTText):
                         self.write_text(item.get_text())
             return
         render(ltpage)
         self._yoffset += self.pagemargin
+        self.flush()
         return
 
     def close(self):
         self.write_footer()
+        self.flush()
         return
 
 
@@ -471,10 +694,19 @@ class XMLConverter(PDFConverter):
                               laparams=laparams)
         self.imagewriter = imagewriter
         self.stripcontrol = stripcontrol
+        self._buffer = []
         self.write_header()
+        self.flush()
         return
 
     def write(self, text):
+        self._buffer.append(text)
+        return
+
+    def flush(self):
+        """Encode and write the output of the page at once"""
+        text = ''.join(self._buffer)
+        self._buffer = []
         if self.codec:
             text = text.encode(self.codec)
         self.outfp.write(text)
@@ -493,10 +725,13 @@ class XMLConverter(PDFConverter):
         return
 
     def write_text(self, text):
+        self.write(self.escape_text(text))
+        return
+
+    def escape_text(self, text):
         if self.stripcontrol:
             text = self.CONTROL.sub('', text)
-        self.write(enc(text))
-        return
+        return enc(text)
 
     def receive_layout(self, ltpage):
         def show_group(item):
@@ -511,7 +746,14 @@ class XMLConverter(PDFConverter):
             return
 
         def render(item):
-            if isinstance(item, LTPage):
+            if isinstance(item, LTChar):
+                s = '<text font="%s" bbox="%s" colourspace="%s" ' \
+                    'ncolour="%s" size="%.3f">%s</text>\n' % \
+                    (enc(item.fontname), bbox2str(item.bbox),
+                     item.ncs.name, item.graphicstate.ncolor, item.size,
+                     self.escape_text(item.get_text()))
+                self.write(s)
+            elif isinstance(item, LTPage):
                 s = '<page id="%s" bbox="%s" rotate="%d">\n' % \
                     (item.pageid, bbox2str(item.bbox), item.rotate)
                 self.write(s)
@@ -557,14 +799,6 @@ class XMLConverter(PDFConverter):
                 for child in item:
                     render(child)
                 self.write('</textbox>\n')
-            elif isinstance(item, LTChar):
-                s = '<text font="%s" bbox="%s" colourspace="%s" ' \
-                    'ncolour="%s" size="%.3f">' % \
-                    (enc(item.fontname), bbox2str(item.bbox),
-                     item.ncs.name, item.graphicstate.ncolor, item.size)
-                self.write(s)
-                self.write_text(item.get_text())
-                self.write('</text>\n')
             elif isinstance(item, LTText):
                 self.write('<text>%s</text>\n' % item.get_text())
             elif isinstance(item, LTImage):
@@ -579,8 +813,177 @@ class XMLConverter(PDFConverter):
                 assert False, str(('Unhandled', item))
             return
         render(ltpage)
+        self.flush()
         return
 
     def close(self):
         self.write_footer()
+        self.flush()
+        return
+
+
+class JSONConverter(PDFConverter):
+    """Writes one JSON object per page, as newline-delimited JSON.
+
+    Every page has its text boxes, every box its text lines, and every line
+    its spans: runs of characters with the same font and size. With
+    chars=True, every span also has its characters. All bounding boxes are
+    [x0, y0, x1, y1] lists. Pages are written in chunks of about bufsize
+    bytes. The orjson package is used when it is installed.
+    """
+
+    def __init__(self, rsrcmgr, outfp, pageno=1, laparams=None, chars=False,
+                 bufsize=65536):
+        PDFConverter.__init__(self, rsrcmgr, outfp, codec='utf-8',
+                              pageno=pageno, laparams=laparams)
+        self.chars = chars
+        self.bufsize = bufsize
+        self._buffer = []
+        self._buffered = 0
+        return
+
+    SURROGATES = re.compile('[\ud800-\udfff]')
+
+    def write_record(self, record):
+        try:
+            data = self.dumps(record)
+        except (TypeError, UnicodeEncodeError):
+            # Broken ToUnicode maps can give lone surrogates, which cannot
+            # be encoded as UTF-8.
+            data = self.dumps(self.replace_surrogates(record))
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self.bufsize <= self._buffered:
+            self.flush()
+        return
+
+    @staticmethod
+    def dumps(record):
+        if orjson is not None:
+            return orjson.dumps(record) + b'\n'
+        return json.dumps(record, ensure_ascii=False,
+                          separators=(',', ':')).encode('utf-8') + b'\n'
+
+    def replace_surrogates(self, obj):
+        """Return a copy of obj with the surrogates in its strings replaced
+        by U+FFFD"""
+        if isinstance(obj, str):
+            return self.SURROGATES.sub('\ufffd', obj)
+        elif isinstance(obj, dict):
+            return {k: self.replace_surrogates(v) for (k, v) in obj.items()}
+        elif isinstance(obj, list):
+            return [self.replace_surrogates(v) for v in obj]
+        return obj
+
+    def flush(self):
+        data = b''.join(self._buffer)
+        self._buffer = []
+        self._buffered = 0
+        if not self.outfp_binary:
+            data = data.decode('utf-8')
+        self.outfp.write(data)
+        return
+
+    def receive_layout(self, ltpage):
+        boxes = []
+        self.add_boxes(boxes, ltpage)
+        self.write_record({
+            'page': ltpage.pageid,
+            'bbox': bbox2list(ltpage.bbox),
+            'rotate': ltpage.rotate,
+            'boxes': boxes,
+        })
+        return
+
+    def add_boxes(self, boxes, container):
+        chars = []
+        for item in container:
+            if isinstance(item, LTTextBox):
+                boxes.append({
+                    'id': item.index,
+                    'bbox': bbox2list(item.bbox),
+                    'vertical': isinstance(item, LTTextBoxVertical),
+                    'lines': [self.get_line(line, line.bbox)
+                              for line in item
+                              if isinstance(line, LTTextLine)],
+                })
+            elif isinstance(item, LTTextLine):
+                boxes.append({
+                    'id': None,
+                    'bbox': bbox2list(item.bbox),
+                    'vertical': False,
+                    'lines': [self.get_line(item, item.bbox)],
+                })
+            elif isinstance(item, LTChar):
+                chars.append(item)
+            elif isinstance(item, LTContainer):
+                self.add_boxes(boxes, item)
+        if chars:
+            # Characters without layout analysis are split into lines where
+            # the baseline changes or the text goes back.
+            lines = []
+            start = 0
+            for i in range(1, len(chars) + 1):
+                if i < len(chars):
+                    (prev, char) = (chars[i - 1], chars[i])
+                    if abs(char.y0 - prev.y0) <= prev.height * .5 and \
+                            prev.x0 <= char.x0:
+                        continue
+                lines.append(self.get_line(chars[start:i],
+                                           self.get_bbox(chars[start:i])))
+                start = i
+            boxes.append({
+                'id': None,
+                'bbox': bbox2list(self.get_bbox(chars)),
+                'vertical': False,
+                'lines': lines,
+            })
+        return
+
+    @staticmethod
+    def get_bbox(items):
+        return get_bound(pt for item in items
+                         for pt in ((item.x0, item.y0), (item.x1, item.y1)))
+
+    def get_line(self, items, bbox):
+        spans = []
+        span = texts = None
+        for item in items:
+            if isinstance(item, LTChar):
+                font = item.fontname
+                size = round(item.size, 3)
+                if span is None or span['font'] != font or \
+                        span['size'] != size:
+                    texts = []
+                    span = {'text': texts, 'font': font, 'size': size,
+                            'bbox': list(item.bbox)}
+                    if self.chars:
+                        span['chars'] = []
+                    spans.append(span)
+                else:
+                    sbbox = span['bbox']
+                    if item.x0 < sbbox[0]:
+                        sbbox[0] = item.x0
+                    if item.y0 < sbbox[1]:
+                        sbbox[1] = item.y0
+                    if sbbox[2] < item.x1:
+                        sbbox[2] = item.x1
+                    if sbbox[3] < item.y1:
+                        sbbox[3] = item.y1
+                text = item.get_text()
+                texts.append(text)
+                if self.chars:
+                    span['chars'].append({'text': text,
+                                          'bbox': bbox2list(item.bbox)})
+            elif isinstance(item, LTAnno) and texts is not None:
+                texts.append(item.get_text())
+        for span in spans:
+            span['text'] = ''.join(span['text'])
+            span['bbox'] = bbox2list(span['bbox'])
+        if spans:
+            spans[-1]['text'] = spans[-1]['text'].rstrip('\n')
+        return {'bbox': bbox2list(bbox), 'spans': spans}
+
+    def close(self):
+        self.flush()
         return
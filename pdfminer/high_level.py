@@ -5,7 +5,7 @@ import sys
 from io import StringIO
 
 from .converter import XMLConverter, HTMLConverter, TextConverter, \
-    PDFPageAggregator
+    PDFPageAggregator, RawTextConverter, JSONConverter
 from .image import ImageWriter
 from .layout import LAParams
 from .pdfdevice import TagExtractor
@@ -18,7 +18,8 @@ def extract_text_to_fp(inf, outfp, output_type='text', codec='utf-8',
                        laparams=None, maxpages=0, page_numbers=None,
                        password="", scale=1.0, rotation=0, layoutmode='normal',
                        output_dir=None, strip_control=False, debug=False,
-                       disable_caching=False, **kwargs):
+                       disable_caching=False, stats=None, limits=None,
+                       **kwargs):
     """Parses text from inf-file and writes to outfp file-like object.
 
     Takes loads of optional arguments but the defaults are somewhat sane.
@@ -28,8 +29,11 @@ def extract_text_to_fp(inf, outfp, output_type='text', codec='utf-8',
     :param inf: a file-like object to read PDF structure from, such as a
         file handler (using the builtin `open()` function) or a `BytesIO`.
     :param outfp: a file-like object to write the text to.
-    :param output_type: May be 'text', 'xml', 'html', 'tag'. Only 'text' works
-        properly.
+    :param output_type: May be 'text', 'raw', 'xml', 'html', 'json', 'tag'.
+        Only 'text' works properly. 'raw' writes the text in the order of
+        the content streams, without layout analysis, which is much faster.
+        'json' writes one JSON object per page, see
+        pdfminer.converter.JSONConverter.
     :param codec: Text decoding codec
     :param laparams: An LAParams object from pdfminer.layout. Default is None
         but may not layout correctly.
@@ -44,6 +48,10 @@ def extract_text_to_fp(inf, outfp, output_type='text', codec='utf-8',
     :param strip_control: Does what it says on the tin
     :param debug: Output more logging data
     :param disable_caching: Does what it says on the tin
+    :param stats: A PDFStats object from pdfminer.pdfstats that collects
+        timings and counters, or None.
+    :param limits: A PDFPageLimits object from pdfminer.pdfinterp with the
+        per-page limits, or None.
     :param other:
     :return: nothing, acting as it does on two streams. Use StringIO to get
         strings.
@@ -55,11 +63,13 @@ def extract_text_to_fp(inf, outfp, output_type='text', codec='utf-8',
     if output_dir:
         imagewriter = ImageWriter(output_dir)
 
-    rsrcmgr = PDFResourceManager(caching=not disable_caching)
+    rsrcmgr = PDFResourceManager(caching=not disable_caching, stats=stats)
 
     if output_type == 'text':
         device = TextConverter(rsrcmgr, outfp, codec=codec, laparams=laparams,
                                imagewriter=imagewriter)
+    elif output_type == 'raw':
+        device = RawTextConverter(rsrcmgr, outfp, codec=codec)
 
     if outfp == sys.stdout:
         outfp = sys.stdout.buffer
@@ -72,15 +82,23 @@ def extract_text_to_fp(inf, outfp, output_type='text', codec='utf-8',
         device = HTMLConverter(rsrcmgr, outfp, codec=codec, scale=scale,
                                layoutmode=layoutmode, laparams=laparams,
                                imagewriter=imagewriter)
+    elif output_type == 'json':
+        device = JSONConverter(rsrcmgr, outfp, laparams=laparams)
     elif output_type == 'tag':
         device = TagExtractor(rsrcmgr, outfp, codec=codec)
 
-    interpreter = PDFPageInterpreter(rsrcmgr, device)
+    # Plain text without images does not need paths, colors and images.
+    text_only = output_type == 'raw' or \
+        (output_type == 'text' and imagewriter is None)
+    interpreter = PDFPageInterpreter(rsrcmgr, device, stats=stats,
+                                     limits=limits, text_only=text_only)
     for page in PDFPage.get_pages(inf,
                                   page_numbers,
                                   maxpages=maxpages,
                                   password=password,
-                                  caching=not disable_caching):
+                                  caching=not disable_caching,
+                                  stats=stats,
+                                  lazy_streams=True):
         page.rotate = (page.rotate + rotation) % 360
         interpreter.process_page(page)
 
@@ -88,7 +106,8 @@ def extract_text_to_fp(inf, outfp, output_type='text', codec='utf-8',
 
 
 def extract_text(pdf_file, password='', page_numbers=None, maxpages=0,
-                 caching=True, codec='utf-8', laparams=None):
+                 caching=True, codec='utf-8', laparams=None, stats=None,
+                 limits=None):
     """Parse and return the text contained in a PDF file.
 
     :param pdf_file: Either a file path or a file-like object for the PDF file
@@ -100,16 +119,21 @@ def extract_text(pdf_file, password='', page_numbers=None, maxpages=0,
     :param codec: Text decoding codec
     :param laparams: An LAParams object from pdfminer.layout. If None, uses
         some default settings that often work well.
+    :param stats: A PDFStats object from pdfminer.pdfstats that collects
+        timings and counters, or None.
+    :param limits: A PDFPageLimits object from pdfminer.pdfinterp with the
+        per-page limits, or None.
     :return: a string containing all of the text extracted.
     """
     if laparams is None:
         laparams = LAParams()
 
     with open_filename(pdf_file, "rb") as fp, StringIO() as output_string:
-        rsrcmgr = PDFResourceManager(caching=caching)
+        rsrcmgr = PDFResourceManager(caching=caching, stats=stats)
         device = TextConverter(rsrcmgr, output_string, codec=codec,
                                laparams=laparams)
-        interpreter = PDFPageInterpreter(rsrcmgr, device)
+        interpreter = PDFPageInterpreter(rsrcmgr, device, stats=stats,
+                                         limits=limits, text_only=True)
 
         for page in PDFPage.get_pages(
                 fp,
@@ -117,6 +141,8 @@ def extract_text(pdf_file, password='', page_numbers=None, maxpages=0,
                 maxpages=maxpages,
                 password=password,
                 caching=caching,
+                stats=stats,
+                lazy_streams=True,
         ):
             interpreter.process_page(page)
 
@@ -124,7 +150,7 @@ def extract_text(pdf_file, password='', page_numbers=None, maxpages=0,
 
 
 def extract_pages(pdf_file, password='', page_numbers=None, maxpages=0,
-                  caching=True, laparams=None):
+                  caching=True, laparams=None, stats=None, limits=None):
     """Extract and yield LTPage objects
 
     :param pdf_file: Either a file path or a file-like object for the PDF file
@@ -135,17 +161,23 @@ def extract_pages(pdf_file, password='', page_numbers=None, maxpages=0,
     :param caching: If resources should be cached
     :param laparams: An LAParams object from pdfminer.layout. If None, uses
         some default settings that often work well.
+    :param stats: A PDFStats object from pdfminer.pdfstats that collects
+        timings and counters, or None.
+    :param limits: A PDFPageLimits object from pdfminer.pdfinterp with the
+        per-page limits, or None.
     :return:
     """
     if laparams is None:
         laparams = LAParams()
 
     with open_filename(pdf_file, "rb") as fp:
-        resource_manager = PDFResourceManager(caching=caching)
+        resource_manager = PDFResourceManager(caching=caching, stats=stats)
         device = PDFPageAggregator(resource_manager, laparams=laparams)
-        interpreter = PDFPageInterpreter(resource_manager, device)
+        interpreter = PDFPageInterpreter(resource_manager, device,
+                                         stats=stats, limits=limits)
         for page in PDFPage.get_pages(fp, page_numbers, maxpages=maxpages,
-                                      password=password, caching=caching):
+                                      password=password, caching=caching,
+                                      stats=stats, lazy_streams=True):
             interpreter.process_page(page)
             layout = device.get_result()
             yield layout
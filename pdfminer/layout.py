@@ -55,6 +55,9 @@ class LAParams:
         layout analysis
     :param all_texts: If layout analysis should be performed on text in
         figures.
+    :param incremental: If characters should be grouped into text lines
+        while the page is being rendered, instead of after the whole page
+        has been rendered. The result of the layout analysis is the same.
     """
 
     def __init__(self,
@@ -64,7 +67,8 @@ class LAParams:
                  word_margin=0.1,
                  boxes_flow=0.5,
                  detect_vertical=False,
-                 all_texts=False):
+                 all_texts=False,
+                 incremental=False):
         self.line_overlap = line_overlap
         self.char_margin = char_margin
         self.line_margin = line_margin
@@ -72,6 +76,7 @@ class LAParams:
         self.boxes_flow = boxes_flow
         self.detect_vertical = detect_vertical
         self.all_texts = all_texts
+        self.incremental = incremental
 
         self._validate()
         return
@@ -320,6 +325,48 @@ class LTChar(LTComponent, LTText):
             self.size = self.height
         return
 
+    @classmethod
+    def create_horizontal_run(cls, matrix, font, fontsize, scaling, rise, y,
+                              glyphs, ncs, graphicstate):
+        """Create the characters of a horizontal text run at once.
+
+        For every (x, text, textwidth) in glyphs, this gives the same object
+        as LTChar(translate_matrix(matrix, (x, y)), font, fontsize, scaling,
+        rise, text, textwidth, None, ncs, graphicstate), but everything that
+        the characters have in common is only computed once.
+        """
+        (a, b, c, d, e, f) = matrix
+        fontname = font.fontname
+        descent = font.get_descent() * fontsize
+        lower = descent + rise
+        upper = descent + rise + fontsize
+        upright = (0 < a*d*scaling and b*c <= 0)
+        items = []
+        for (x, text, textwidth) in glyphs:
+            e1 = x * a + y * c + e
+            f1 = x * b + y * d + f
+            adv = textwidth * fontsize * scaling
+            x0 = a * 0 + c * lower + e1
+            y0 = b * 0 + d * lower + f1
+            x1 = a * adv + c * upper + e1
+            y1 = b * adv + d * upper + f1
+            if x1 < x0:
+                (x0, x1) = (x1, x0)
+            if y1 < y0:
+                (y0, y1) = (y1, y0)
+            item = cls.__new__(cls)
+            item._text = text
+            item.matrix = (a, b, c, d, e1, f1)
+            item.fontname = fontname
+            item.ncs = ncs
+            item.graphicstate = graphicstate
+            item.adv = adv
+            item.upright = upright
+            item.set_bbox((x0, y0, x1, y1))
+            item.size = item.height
+            items.append(item)
+        return items
+
     def __repr__(self):
         return ('<%s %s matrix=%s font=%r adv=%s text=%r>' %
                 (self.__class__.__name__, bbox2str(self.bbox),
@@ -590,6 +637,106 @@ class LTTextGroupTBRL(LTTextGroup):
         return
 
 
+class TextLineGrouper:
+    """Groups text objects to text lines, one object at a time.
+
+    Objects are compared to the previous one and either added to the current
+    line or start a new line. This allows lines to be built while the text
+    objects are being rendered, see LAParams.incremental.
+    """
+
+    def __init__(self, laparams):
+        self.laparams = laparams
+        self.obj0 = None
+        self.line = None
+        return
+
+    def feed(self, obj1):
+        """Add a text object and return the lines that were completed."""
+        laparams = self.laparams
+        obj0 = self.obj0
+        line = self.line
+        done = []
+        if obj0 is not None:
+            # halign: obj0 and obj1 is horizontally aligned.
+            #
+            #   +------+ - - -
+            #   | obj0 | - - +------+   -
+            #   |      |     | obj1 |   | (line_overlap)
+            #   +------+ - - |      |   -
+            #          - - - +------+
+            #
+            #          |<--->|
+            #        (char_margin)
+            halign = \
+                obj0.is_compatible(obj1) \
+                and obj0.is_voverlap(obj1) \
+                and min(obj0.height, obj1.height) * laparams.line_overlap \
+                < obj0.voverlap(obj1) \
+                and obj0.hdistance(obj1) \
+                < max(obj0.width, obj1.width) * laparams.char_margin
+
+            # valign: obj0 and obj1 is vertically aligned.
+            #
+            #   +------+
+            #   | obj0 |
+            #   |      |
+            #   +------+ - - -
+            #     |    |     | (char_margin)
+            #     +------+ - -
+            #     | obj1 |
+            #     |      |
+            #     +------+
+            #
+            #     |<-->|
+            #   (line_overlap)
+            valign = \
+                laparams.detect_vertical \
+                and obj0.is_compatible(obj1) \
+                and obj0.is_hoverlap(obj1) \
+                and min(obj0.width, obj1.width) * laparams.line_overlap \
+                < obj0.hoverlap(obj1) \
+                and obj0.vdistance(obj1) \
+                < max(obj0.height, obj1.height) * laparams.char_margin
+
+            if ((halign and isinstance(line, LTTextLineHorizontal)) or
+                    (valign and isinstance(line, LTTextLineVertical))):
+
+                line.add(obj1)
+            elif line is not None:
+                done.append(line)
+                line = None
+            else:
+                if valign and not halign:
+                    line = LTTextLineVertical(laparams.word_margin)
+                    line.add(obj0)
+                    line.add(obj1)
+                elif halign and not valign:
+                    line = LTTextLineHorizontal(laparams.word_margin)
+                    line.add(obj0)
+                    line.add(obj1)
+                else:
+                    line = LTTextLineHorizontal(laparams.word_margin)
+                    line.add(obj0)
+                    done.append(line)
+                    line = None
+        self.obj0 = obj1
+        self.line = line
+        return done
+
+    def flush(self):
+        """Return the last line, if any."""
+        line = self.line
+        if line is None:
+            if self.obj0 is None:
+                return []
+            line = LTTextLineHorizontal(self.laparams.word_margin)
+            line.add(self.obj0)
+        self.obj0 = None
+        self.line = None
+        return [line]
+
+
 class LTLayoutContainer(LTContainer):
     def __init__(self, bbox):
         LTContainer.__init__(self, bbox)
@@ -598,77 +745,10 @@ class LTLayoutContainer(LTContainer):
 
     # group_objects: group text object to textlines.
     def group_objects(self, laparams, objs):
-        obj0 = None
-        line = None
-        for obj1 in objs:
-            if obj0 is not None:
-                # halign: obj0 and obj1 is horizontally aligned.
-                #
-                #   +------+ - - -
-                #   | obj0 | - - +------+   -
-                #   |      |     | obj1 |   | (line_overlap)
-                #   +------+ - - |      |   -
-                #          - - - +------+
-                #
-                #          |<--->|
-                #        (char_margin)
-                halign = \
-                    obj0.is_compatible(obj1) \
-                    and obj0.is_voverlap(obj1) \
-                    and min(obj0.height, obj1.height) * laparams.line_overlap \
-                    < obj0.voverlap(obj1) \
-                    and obj0.hdistance(obj1) \
-                    < max(obj0.width, obj1.width) * laparams.char_margin
-
-                # valign: obj0 and obj1 is vertically aligned.
-                #
-                #   +------+
-                #   | obj0 |
-                #   |      |
-                #   +------+ - - -
-                #     |    |     | (char_margin)
-                #     +------+ - -
-                #     | obj1 |
-                #     |      |
-                #     +------+
-                #
-                #     |<-->|
-                #   (line_overlap)
-                valign = \
-                    laparams.detect_vertical \
-                    and obj0.is_compatible(obj1) \
-                    and obj0.is_hoverlap(obj1) \
-                    and min(obj0.width, obj1.width) * laparams.line_overlap \
-                    < obj0.hoverlap(obj1) \
-                    and obj0.vdistance(obj1) \
-                    < max(obj0.height, obj1.height) * laparams.char_margin
-
-                if ((halign and isinstance(line, LTTextLineHorizontal)) or
-                        (valign and isinstance(line, LTTextLineVertical))):
-
-                    line.add(obj1)
-                elif line is not None:
-                    yield line
-                    line = None
-                else:
-                    if valign and not halign:
-                        line = LTTextLineVertical(laparams.word_margin)
-                        line.add(obj0)
-                        line.add(obj1)
-                    elif halign and not valign:
-                        line = LTTextLineHorizontal(laparams.word_margin)
-                        line.add(obj0)
-                        line.add(obj1)
-                    else:
-                        line = LTTextLineHorizontal(laparams.word_margin)
-                        line.add(obj0)
-                        yield line
-                        line = None
-            obj0 = obj1
-        if line is None:
-            line = LTTextLineHorizontal(laparams.word_margin)
-            line.add(obj0)
-        yield line
+        grouper = TextLineGrouper(laparams)
+        for obj in objs:
+            yield from grouper.feed(obj)
+        yield from grouper.flush()
         return
 
     def group_textlines(self, laparams, lines):
@@ -705,16 +785,24 @@ class LTLayoutContainer(LTContainer):
     def group_textboxes(self, laparams, boxes):
         """Group textboxes hierarchically.
 
-        Get pair-wise distances, via dist func defined below, and then merge
-        from the closest textbox pair. Once obj1 and obj2 are merged /
-        grouped, the resulting group is considered as a new object, and its
-        distances to other objects & groups are added to the process queue.
-
-        For performance reason, pair-wise distances and object pair info are
-        maintained in a heap of (idx, dist, id(obj1), id(obj2), obj1, obj2)
-        tuples. It ensures quick access to the smallest element. Note that
-        since comparison operators, e.g., __lt__, are disabled for
-        LTComponent, id(obj) has to appear before obj in element tuples.
+        Repeatedly merge the closest pair of objects, via dist func defined
+        below. Once obj1 and obj2 are merged / grouped, the resulting group is
+        considered as a new object and takes part in the following merges.
+
+        For performance reason, pair-wise distances are not computed for all
+        pairs. Instead, every object only keeps track of its nearest neighbor
+        in a heap of (dist, id(obj1), id(obj2), id(owner), obj1, obj2, owner)
+        tuples. Neighbors are searched in a growing area of a Plane, which
+        stops as soon as no object outside the area can be closer. When the
+        neighbor of an object has been merged, its nearest neighbor is
+        searched again once its entry comes up in the heap. Note that since
+        comparison operators, e.g., __lt__, are disabled for LTComponent,
+        id(obj) has to appear before obj in element tuples.
+
+        Pairs are merged in exactly the same order as with a heap of all the
+        pair-wise distances: ties are broken by the ids of the pair, ordered
+        as (earlier box, later box) for two of the given boxes and as
+        (newer object, older object) for pairs that involve a group.
 
         :param laparams: LAParams object.
         :param boxes: All textbox objects to be grouped.
@@ -732,6 +820,11 @@ class LTLayoutContainer(LTContainer):
                     +------+www+------+
                     :wwwwwwwwww| obj2 |
             (x0, y0) +..........+------+
+
+            If obj1 and obj2 are separated by a gap of g, the bounding
+            rectangle is at least g wider (or higher) than both objects
+            together. The distance is therefore at least g times the height
+            (or width) of obj1.
             """
             x0 = min(obj1.x0, obj2.x0)
             y0 = min(obj1.y0, obj2.y0)
@@ -740,47 +833,74 @@ class LTLayoutContainer(LTContainer):
             return (x1 - x0) * (y1 - y0) \
                 - obj1.width*obj1.height - obj2.width*obj2.height
 
-        def isany(obj1, obj2):
-            """Check if there's any other object between obj1 and obj2."""
-            x0 = min(obj1.x0, obj2.x0)
-            y0 = min(obj1.y0, obj2.y0)
-            x1 = max(obj1.x1, obj2.x1)
-            y1 = max(obj1.y1, obj2.y1)
-            objs = set(plane.find((x0, y0, x1, y1)))
-            return objs.difference((obj1, obj2))
+        nboxes = len(boxes)
+        order = {id(obj): i for (i, obj) in enumerate(boxes)}
 
-        dists = []
-        for i in range(len(boxes)):
-            obj1 = boxes[i]
-            for j in range(i+1, len(boxes)):
-                obj2 = boxes[j]
-                dists.append((False, dist(obj1, obj2), id(obj1), id(obj2),
-                              obj1, obj2))
-        heapq.heapify(dists)
+        def ordered(obj1, obj2):
+            """Order a pair as it is compared when breaking ties."""
+            i1 = order[id(obj1)]
+            i2 = order[id(obj2)]
+            if (i1 < i2) == (max(i1, i2) < nboxes):
+                return obj1, obj2
+            else:
+                return obj2, obj1
+
+        def nearest(obj):
+            """Find the closest other object in the plane."""
+            margin = min(obj.width, obj.height)
+            r = margin or plane.gridsize
+            best = None
+            while True:
+                bbox = (obj.x0 - r, obj.y0 - r, obj.x1 + r, obj.y1 + r)
+                for other in plane.find(bbox):
+                    if other is obj:
+                        continue
+                    (obj1, obj2) = ordered(obj, other)
+                    key = (dist(obj1, obj2), id(obj1), id(obj2))
+                    if best is None or key < best[0]:
+                        best = (key, obj1, obj2)
+                # Objects outside bbox are at least r * margin away.
+                if best is not None and best[0][0] < r * margin:
+                    break
+                if bbox[0] <= plane.x0 and bbox[1] <= plane.y0 \
+                        and plane.x1 <= bbox[2] and plane.y1 <= bbox[3]:
+                    break
+                r *= 2
+            return best
+
+        def push(obj):
+            best = nearest(obj)
+            if best is not None:
+                ((d, id1, id2), obj1, obj2) = best
+                heapq.heappush(dists, (d, id1, id2, id(obj), obj1, obj2, obj))
+            return
 
-        plane = Plane(self.bbox)
+        plane = Plane(get_bound(pt for obj in boxes
+                                for pt in ((obj.x0, obj.y0),
+                                           (obj.x1, obj.y1))))
         plane.extend(boxes)
-        done = set()
+        dists = []
+        for obj in boxes:
+            push(obj)
         while len(dists) > 0:
-            (skip_isany, d, id1, id2, obj1, obj2) = heapq.heappop(dists)
+            (d, id1, id2, _, obj1, obj2, owner) = heapq.heappop(dists)
             # Skip objects that are already merged
-            if (id1 not in done) and (id2 not in done):
-                if skip_isany and isany(obj1, obj2):
-                    heapq.heappush(dists, (True, d, id1, id2, obj1, obj2))
-                    continue
-                if isinstance(obj1, (LTTextBoxVertical, LTTextGroupTBRL)) or \
-                        isinstance(obj2, (LTTextBoxVertical, LTTextGroupTBRL)):
-                    group = LTTextGroupTBRL([obj1, obj2])
-                else:
-                    group = LTTextGroupLRTB([obj1, obj2])
-                plane.remove(obj1)
-                plane.remove(obj2)
-                done.update([id1, id2])
-
-                for other in plane:
-                    heapq.heappush(dists, (False, dist(group, other),
-                                           id(group), id(other), group, other))
-                plane.add(group)
+            if owner not in plane:
+                continue
+            # The neighbor has been merged, look for a new one
+            if obj1 not in plane or obj2 not in plane:
+                push(owner)
+                continue
+            if isinstance(obj1, (LTTextBoxVertical, LTTextGroupTBRL)) or \
+                    isinstance(obj2, (LTTextBoxVertical, LTTextGroupTBRL)):
+                group = LTTextGroupTBRL([obj1, obj2])
+            else:
+                group = LTTextGroupLRTB([obj1, obj2])
+            plane.remove(obj1)
+            plane.remove(obj2)
+            order[id(group)] = len(order)
+            plane.add(group)
+            push(group)
         return list(plane)
 
     def analyze(self, laparams):
@@ -788,11 +908,14 @@ class LTLayoutContainer(LTContainer):
         # it has all the individual characters in the page.
         (textobjs, otherobjs) = fsplit(lambda obj: isinstance(obj, LTChar),
                                        self)
+        # textlines that were already grouped while rendering the page.
+        (textlines, otherobjs) = fsplit(
+            lambda obj: isinstance(obj, LTTextLine), otherobjs)
         for obj in otherobjs:
             obj.analyze(laparams)
-        if not textobjs:
+        if not textobjs and not textlines:
             return
-        textlines = list(self.group_objects(laparams, textobjs))
+        textlines.extend(self.group_objects(laparams, textobjs))
         (empties, textlines) = fsplit(lambda obj: obj.is_empty(), textlines)
         for obj in empties:
             obj.analyze(laparams)
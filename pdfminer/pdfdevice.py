@@ -9,6 +9,7 @@ class PDFDevice:
     def __init__(self, rsrcmgr):
         self.rsrcmgr = rsrcmgr
         self.ctm = None
+        self.stats = None
         return
 
     def __repr__(self):
@@ -27,6 +28,11 @@ class PDFDevice:
         self.ctm = ctm
         return
 
+    def set_stats(self, stats):
+        """Set the PDFStats object that the device reports to"""
+        self.stats = stats
+        return
+
     def begin_tag(self, tag, props=None):
         return
 
@@ -156,7 +162,7 @@ class TagExtractor(PDFDevice):
                 except PDFUnicodeNotDefined:
                     print(chars)
                     pass
-        self.outfp.write(utils.enc(text))
+        self.outfp.write(utils.make_compat_bytes(utils.enc(text)))
         return
 
     def begin_page(self, page, ctm):
@@ -1,6 +1,8 @@
 import logging
 import re
 import struct
+from collections import OrderedDict
+from itertools import compress, count, repeat
 from hashlib import sha256, md5
 
 from cryptography.hazmat.backends import default_backend
@@ -64,6 +66,87 @@ LITERAL_XREF = LIT('XRef')
 LITERAL_CATALOG = LIT('Catalog')
 
 
+class PDFObjStm:
+    """The objects in an object stream.
+
+    The header of the stream has the object id and offset of every object,
+    relative to /First. An object is only parsed when it is requested. When
+    the header is invalid, all objects are parsed one after the other.
+    """
+
+    def __init__(self, stream, doc=None):
+        if stream.get('Type') is not LITERAL_OBJSTM:
+            if settings.STRICT:
+                raise PDFSyntaxError('Not a stream object: %r' % stream)
+        try:
+            n = int_value(stream['N'])
+        except KeyError:
+            if settings.STRICT:
+                raise PDFSyntaxError('N is not defined: %r' % stream)
+            n = 0
+        self.data = stream.get_data()
+        self.parser = PDFStreamParser(self.data)
+        self.parser.set_document(doc)
+        self.objids = []
+        self.offsets = self._read_header(stream, n)
+        if self.offsets is None:
+            log.info('invalid header of object stream: %r', stream)
+            self.objs = self._read_objects(n)
+        return
+
+    def __repr__(self):
+        return '<PDFObjStm: objids=%r>' % self.objids
+
+    def _read_header(self, stream, n):
+        """Read the object ids and the positions of the objects"""
+        nums = []
+        try:
+            while len(nums) < 2*n:
+                (_, token) = self.parser.nexttoken()
+                if not isinstance(token, int):
+                    return None
+                nums.append(token)
+        except PSEOF:
+            return None
+        first = stream.get('First')
+        if not isinstance(first, int):
+            first = self.parser.bufpos + self.parser.charpos
+        positions = [first+offset for offset in nums[1::2]]
+        if positions != sorted(positions) \
+                or (positions and len(self.data) <= positions[-1]):
+            return None
+        self.objids = nums[0::2]
+        return positions
+
+    def _read_objects(self, n):
+        self.parser.seek(0)
+        objs = []
+        try:
+            while 1:
+                (_, obj) = self.parser.nextobject()
+                objs.append(obj)
+        except PSEOF:
+            pass
+        n = min(n, len(objs)//2)
+        self.objids = objs[0:n*2:2]
+        return objs[n*2:]
+
+    def get_objids(self):
+        return self.objids
+
+    def get_object(self, index):
+        if self.offsets is None:
+            try:
+                return self.objs[index]
+            except IndexError:
+                raise PDFSyntaxError('index too big: %r' % index)
+        if not 0 <= index < len(self.offsets):
+            raise PDFSyntaxError('index too big: %r' % index)
+        self.parser.seek(self.offsets[index])
+        (_, obj) = self.parser.nextobject()
+        return obj
+
+
 class PDFBaseXRef:
 
     def get_trailer(self):
@@ -78,6 +161,16 @@ class PDFBaseXRef:
     def get_pos(self, objid):
         raise KeyError(objid)
 
+    def get_offsets(self):
+        """Return a dict with the result of get_pos() of every object"""
+        offsets = {}
+        for objid in self.get_objids():
+            try:
+                offsets[objid] = self.get_pos(objid)
+            except KeyError:
+                continue
+        return offsets
+
 
 class PDFXRef(PDFBaseXRef):
 
@@ -113,24 +206,63 @@ class PDFXRef(PDFBaseXRef):
                 error_msg = 'Invalid line: {!r}: line={!r}'\
                     .format(parser, line)
                 raise PDFNoValidXRef(error_msg)
-            for objid in range(start, start+nobjs):
-                try:
-                    (_, line) = parser.nextline()
-                except PSEOF:
-                    raise PDFNoValidXRef('Unexpected EOF - file corrupted?')
-                f = line.strip().split(b' ')
-                if len(f) != 3:
-                    error_msg = 'Invalid XRef format: {!r}, line={!r}'\
-                        .format(parser, line)
-                    raise PDFNoValidXRef(error_msg)
-                (pos, genno, use) = f
-                if use != b'n':
-                    continue
-                self.offsets[objid] = (None, int(pos), int(genno))
+            if not self.load_entries(parser, pos+len(line), start, nobjs):
+                self.load_lines(parser, start, nobjs)
         log.info('xref objects: %r', self.offsets)
         self.load_trailer(parser)
         return
 
+    XREF_ENTRY = re.compile(rb'\d{10} \d{5} [fn]([ \r\n]{1,3})')
+
+    def load_entries(self, parser, pos, start, nobjs):
+        """Read the entries of a subsection at once.
+
+        The entries are 20 bytes long in the spec, but 19 or 21 bytes in
+        some documents, so the length is taken from the first entry. Returns
+        False when the entries cannot be read this way, without reading any.
+        """
+        parser.fp.seek(pos)
+        m = self.XREF_ENTRY.match(parser.fp.read(21))
+        if m:
+            entlen = 18 + len(m.group(1))
+            parser.fp.seek(pos)
+            data = parser.fp.read(nobjs*entlen)
+            fields = data.split()
+        if not m or len(fields) != nobjs*3 or data[-1:] not in b' \r\n':
+            parser.seek(pos)
+            return False
+        used = [use == b'n' for use in fields[2::3]]
+        try:
+            offsets = dict(zip(
+                compress(count(start), used),
+                zip(repeat(None),
+                    map(int, compress(fields[0::3], used)),
+                    map(int, compress(fields[1::3], used)))))
+        except ValueError:
+            parser.seek(pos)
+            return False
+        self.offsets.update(offsets)
+        parser.seek(pos+len(data))
+        return True
+
+    def load_lines(self, parser, start, nobjs):
+        """Read the entries of a subsection line by line"""
+        for objid in range(start, start+nobjs):
+            try:
+                (_, line) = parser.nextline()
+            except PSEOF:
+                raise PDFNoValidXRef('Unexpected EOF - file corrupted?')
+            f = line.strip().split(b' ')
+            if len(f) != 3:
+                error_msg = 'Invalid XRef format: {!r}, line={!r}'\
+                    .format(parser, line)
+                raise PDFNoValidXRef(error_msg)
+            (pos, genno, use) = f
+            if use != b'n':
+                continue
+            self.offsets[objid] = (None, int(pos), int(genno))
+        return
+
     def load_trailer(self, parser):
         try:
             (_, kwd) = parser.nexttoken()
@@ -157,6 +289,9 @@ class PDFXRef(PDFBaseXRef):
         except KeyError:
             raise
 
+    def get_offsets(self):
+        return self.offsets
+
 
 class PDFXRefFallback(PDFXRef):
 
@@ -191,23 +326,9 @@ class PDFXRefFallback(PDFXRef):
             if isinstance(obj, PDFStream) \
                     and obj.get('Type') is LITERAL_OBJSTM:
                 stream = stream_value(obj)
-                try:
-                    n = stream['N']
-                except KeyError:
-                    if settings.STRICT:
-                        raise PDFSyntaxError('N is not defined: %r' % stream)
-                    n = 0
-                parser1 = PDFStreamParser(stream.get_data())
-                objs = []
-                try:
-                    while 1:
-                        (_, obj) = parser1.nextobject()
-                        objs.append(obj)
-                except PSEOF:
-                    pass
-                n = min(n, len(objs)//2)
-                for index in range(n):
-                    objid1 = objs[index*2]
+                stream.set_objid(objid, genno)
+                objstm = PDFObjStm(stream)
+                for (index, objid1) in enumerate(objstm.get_objids()):
                     self.offsets[objid1] = (objid, index, 0)
         return
 
@@ -250,13 +371,16 @@ class PDFXRefStream(PDFBaseXRef):
         return self.trailer
 
     def get_objids(self):
+        # The entries of all ranges follow each other in the data.
+        index = 0
         for (start, nobjs) in self.ranges:
             for i in range(nobjs):
-                offset = self.entlen * i
+                offset = self.entlen * (index+i)
                 ent = self.data[offset:offset+self.entlen]
                 f1 = nunpack(ent[:self.fl1], 1)
                 if f1 == 1 or f1 == 2:
                     yield start+i
+            index += nobjs
         return
 
     def get_pos(self, objid):
@@ -269,6 +393,26 @@ class PDFXRefStream(PDFBaseXRef):
                 index += nobjs
         else:
             raise KeyError(objid)
+        pos = self._get_entry_pos(index)
+        if pos is None:
+            # this is a free object
+            raise KeyError(objid)
+        return pos
+
+    def get_offsets(self):
+        offsets = {}
+        index = 0
+        for (start, nobjs) in self.ranges:
+            for i in range(nobjs):
+                pos = self._get_entry_pos(index+i)
+                if pos is not None:
+                    offsets[start+i] = pos
+            index += nobjs
+        return offsets
+
+    def _get_entry_pos(self, index):
+        """Return the position of the entry with the index in the data, or
+        None for a free object"""
         offset = self.entlen * index
         ent = self.data[offset:offset+self.entlen]
         f1 = nunpack(ent[:self.fl1], 1)
@@ -278,9 +422,7 @@ class PDFXRefStream(PDFBaseXRef):
             return (None, f2, f3)
         elif f1 == 2:
             return (f2, f3, 0)
-        else:
-            # this is a free object
-            raise KeyError(objid)
+        return None
 
 
 class PDFStandardSecurityHandler:
@@ -293,6 +435,7 @@ class PDFStandardSecurityHandler:
         self.docid = docid
         self.param = param
         self.password = password
+        self._object_keys = {}
         self.init()
         return
 
@@ -406,11 +549,24 @@ class PDFStandardSecurityHandler:
     def decrypt(self, objid, genno, data, attrs=None):
         return self.decrypt_rc4(objid, genno, data)
 
-    def decrypt_rc4(self, objid, genno, data):
+    def get_object_key(self, objid, genno, salt=b''):
+        """Return the key to decrypt the strings and streams of an object.
+
+        Algorithm 3.1, the keys are remembered per object.
+        """
+        try:
+            return self._object_keys[(objid, genno, salt)]
+        except KeyError:
+            pass
         key = self.key + struct.pack('<L', objid)[:3] \
-              + struct.pack('<L', genno)[:2]
+            + struct.pack('<L', genno)[:2] + salt
         hash = md5(key)
-        key = hash.digest()[:min(len(key), 16)]
+        key1 = hash.digest()[:min(len(key), 16)]
+        self._object_keys[(objid, genno, salt)] = key1
+        return key1
+
+    def decrypt_rc4(self, objid, genno, data):
+        key = self.get_object_key(objid, genno)
         return Arcfour(key).decrypt(data)
 
 
@@ -463,10 +619,7 @@ class PDFStandardSecurityHandlerV4(PDFStandardSecurityHandler):
         return data
 
     def decrypt_aes128(self, objid, genno, data):
-        key = self.key + struct.pack('<L', objid)[:3] \
-              + struct.pack('<L', genno)[:2] + b'sAlT'
-        hash = md5(key)
-        key = hash.digest()[:min(len(key), 16)]
+        key = self.get_object_key(objid, genno, b'sAlT')
         initialization_vector = data[:16]
         ciphertext = data[16:]
         cipher = Cipher(algorithms.AES(key),
@@ -544,6 +697,9 @@ class PDFDocument:
 
     """
 
+    # Number of object streams that are kept when caching=False.
+    MAX_OBJSTMS = 10
+
     security_handler_registry = {
         1: PDFStandardSecurityHandler,
         2: PDFStandardSecurityHandler,
@@ -551,9 +707,11 @@ class PDFDocument:
         5: PDFStandardSecurityHandlerV5,
     }
 
-    def __init__(self, parser, password='', caching=True, fallback=True):
+    def __init__(self, parser, password='', caching=True, fallback=True,
+                 stats=None):
         "Set the document to use a given PDFParser object."
         self.caching = caching
+        self.stats = stats
         self.xrefs = []
         self.info = []
         self.catalog = None
@@ -561,44 +719,146 @@ class PDFDocument:
         self.decipher = None
         self._parser = None
         self._cached_objs = {}
-        self._parsed_objs = {}
+        self._parsed_objs = OrderedDict()
+        self._xref_index = None
+        self._fallback = False
         self._parser = parser
         self._parser.set_document(self)
         self.is_printable = self.is_modifiable = self.is_extractable = True
         # Retrieve the information of each header that was appended
         # (maybe multiple times) at the end of the document.
+        if stats is not None:
+            stats.start('xref')
         try:
             pos = self.find_xref(parser)
             self.read_xref_from(parser, pos, self.xrefs)
         except PDFNoValidXRef:
             pass  # fallback = True
+        self._index_xrefs(self.xrefs)
+        if stats is not None:
+            stats.stop('xref')
+        # The fallback xref scans the whole file. It is only loaded here
+        # when the xrefs are missing or damaged, and otherwise when an
+        # object cannot be found through them.
+        self._fallback = fallback
         if fallback:
             parser.fallback = True
-            xref = PDFXRefFallback()
-            xref.load(parser)
-            self.xrefs.append(xref)
+            if not self.xrefs or not self.check_xrefs():
+                self.load_fallback()
         for xref in self.xrefs:
-            trailer = xref.get_trailer()
-            if not trailer:
-                continue
-            # If there's an encryption info, remember it.
-            if 'Encrypt' in trailer:
-                self.encryption = (list_value(trailer['ID']),
-                                   dict_value(trailer['Encrypt']))
-                self._initialize_password(password)
-            if 'Info' in trailer:
-                self.info.append(dict_value(trailer['Info']))
-            if 'Root' in trailer:
-                # Every PDF file must have exactly one /Root dictionary.
-                self.catalog = dict_value(trailer['Root'])
+            if self._read_trailer(xref, password):
                 break
         else:
-            raise PDFSyntaxError('No /Root object! - Is this really a PDF?')
+            xref = self.load_fallback()
+            if xref is None or not self._read_trailer(xref, password):
+                raise PDFSyntaxError(
+                    'No /Root object! - Is this really a PDF?')
         if self.catalog.get('Type') is not LITERAL_CATALOG:
             if settings.STRICT:
                 raise PDFSyntaxError('Catalog not found!')
         return
 
+    def _read_trailer(self, xref, password):
+        """Read the trailer of an xref, return whether it has the /Root"""
+        trailer = xref.get_trailer()
+        if not trailer:
+            return False
+        # If there's an encryption info, remember it.
+        if 'Encrypt' in trailer:
+            self.encryption = (list_value(trailer['ID']),
+                               dict_value(trailer['Encrypt']))
+            self._initialize_password(password)
+        if 'Info' in trailer:
+            self.info.append(dict_value(trailer['Info']))
+        if 'Root' in trailer:
+            # Every PDF file must have exactly one /Root dictionary.
+            self.catalog = dict_value(trailer['Root'])
+            return True
+        return False
+
+    # Number of offsets of every xref that check_xrefs() verifies.
+    XREF_CHECKS = 5
+
+    def check_xrefs(self):
+        """Spot-check the offsets of the objects in the xrefs.
+
+        A few objects of every xref, evenly spread over its object ids, must
+        start with "objid genno obj" at their offset.
+        """
+        for xref in self.xrefs:
+            try:
+                objids = [objid for objid in xref.get_objids()
+                          if xref.get_pos(objid)[0] is None]
+            except KeyError as e:
+                log.info('xref has no position of object %r', e.args[0])
+                return False
+            if not objids:
+                continue
+            step = max(1, len(objids) // self.XREF_CHECKS)
+            checked = objids[::step][:self.XREF_CHECKS - 1] + objids[-1:]
+            for objid in checked:
+                (_, pos, _) = xref.get_pos(objid)
+                if not self._check_offset(pos, objid):
+                    log.info('xref offset of object %r is damaged', objid)
+                    return False
+        return True
+
+    def _check_offset(self, pos, objid):
+        self._parser.seek(pos)
+        try:
+            (_, objid1) = self._parser.nexttoken()
+            (_, genno) = self._parser.nexttoken()
+            (_, kwd) = self._parser.nexttoken()
+        except PSEOF:
+            return False
+        return objid1 == objid and isinstance(genno, int) \
+            and kwd is self.KEYWORD_OBJ
+
+    def load_fallback(self):
+        """Scan the whole file for objects and add them as the last xref.
+
+        Returns the fallback xref, or None when it is disabled or has
+        already been loaded.
+        """
+        if not self._fallback:
+            return None
+        self._fallback = False
+        if self.stats is not None:
+            self.stats.start('xref_fallback')
+        # Streams are read up to endstream while scanning, also when they
+        # are read with their exact length after decryption is set up.
+        parser_fallback = self._parser.fallback
+        self._parser.fallback = True
+        try:
+            xref = PDFXRefFallback()
+            xref.load(self._parser)
+            self.xrefs.append(xref)
+            self._index_xrefs([xref])
+        finally:
+            self._parser.fallback = parser_fallback
+            if self.stats is not None:
+                self.stats.stop('xref_fallback')
+        return xref
+
+    def _index_xrefs(self, xrefs):
+        """Add the objects of xrefs to the index of all objects.
+
+        The xrefs are ordered from new to old, and are older than the xrefs
+        that are already in the index. The position of an object in the
+        newest xref that has it is kept.
+        """
+        index = {}
+        for xref in reversed(xrefs):
+            try:
+                index.update(xref.get_offsets())
+            except KeyError:
+                # The xref lists an object that it has no position of.
+                index.update(PDFBaseXRef.get_offsets(xref))
+        if self._xref_index is not None:
+            index.update(self._xref_index)
+        self._xref_index = index
+        return
+
     KEYWORD_OBJ = KWD(b'obj')
 
     # _initialize_password(password=b'')
@@ -619,40 +879,24 @@ class PDFDocument:
         self._parser.fallback = False  # need to read streams with exact length
         return
 
-    def _getobj_objstm(self, stream, index, objid):
-        if stream.objid in self._parsed_objs:
-            (objs, n) = self._parsed_objs[stream.objid]
-        else:
-            (objs, n) = self._get_objects(stream)
-            if self.caching:
-                self._parsed_objs[stream.objid] = (objs, n)
-        i = n*2+index
-        try:
-            obj = objs[i]
-        except IndexError:
-            raise PDFSyntaxError('index too big: %r' % index)
-        return obj
-
-    def _get_objects(self, stream):
-        if stream.get('Type') is not LITERAL_OBJSTM:
-            if settings.STRICT:
-                raise PDFSyntaxError('Not a stream object: %r' % stream)
-        try:
-            n = stream['N']
-        except KeyError:
-            if settings.STRICT:
-                raise PDFSyntaxError('N is not defined: %r' % stream)
-            n = 0
-        parser = PDFStreamParser(stream.get_data())
-        parser.set_document(self)
-        objs = []
-        try:
-            while 1:
-                (_, obj) = parser.nextobject()
-                objs.append(obj)
-        except PSEOF:
-            pass
-        return (objs, n)
+    def _get_objstm(self, strmid):
+        objstm = self._parsed_objs.get(strmid)
+        if objstm is not None:
+            if self.stats is not None:
+                self.stats.count('cache.objstms.hit')
+            self._parsed_objs.move_to_end(strmid)
+            return objstm
+        if self.stats is not None:
+            self.stats.count('cache.objstms.miss')
+        stream = stream_value(self.getobj(strmid))
+        objstm = PDFObjStm(stream, self)
+        self._parsed_objs[strmid] = objstm
+        # Each object stream keeps its decoded data, so without caching
+        # only the ones that were used most recently are kept.
+        if not self.caching:
+            while self.MAX_OBJSTMS < len(self._parsed_objs):
+                self._parsed_objs.popitem(last=False)
+        return objstm
 
     def _getobj_parse(self, pos, objid):
         self._parser.seek(pos)
@@ -693,34 +937,82 @@ class PDFDocument:
         log.debug('getobj: objid=%r', objid)
         if objid in self._cached_objs:
             (obj, genno) = self._cached_objs[objid]
+            if self.stats is not None:
+                self.stats.count('cache.objects.hit')
         else:
-            for xref in self.xrefs:
-                try:
-                    (strmid, index, genno) = xref.get_pos(objid)
-                except KeyError:
-                    continue
-                try:
-                    if strmid is not None:
-                        stream = stream_value(self.getobj(strmid))
-                        obj = self._getobj_objstm(stream, index, objid)
-                    else:
-                        obj = self._getobj_parse(index, objid)
-                        if self.decipher:
-                            obj = decipher_all(self.decipher, objid, genno,
-                                               obj)
-
-                    if isinstance(obj, PDFStream):
-                        obj.set_objid(objid, genno)
-                    break
-                except (PSEOF, PDFSyntaxError):
-                    continue
-            else:
-                raise PDFObjectNotFound(objid)
+            if self.stats is not None:
+                self.stats.count('cache.objects.miss')
+                self.stats.start('parse')
+            try:
+                (obj, genno) = self._getobj_uncached(objid)
+            finally:
+                if self.stats is not None:
+                    self.stats.stop('parse')
             log.debug('register: objid=%r: %r', objid, obj)
             if self.caching:
                 self._cached_objs[objid] = (obj, genno)
         return obj
 
+    def _getobj_uncached(self, objid):
+        index = self._xref_index
+        if index is None or objid in index:
+            # The index has the newest position of every object. When the
+            # object cannot be parsed there, the older xrefs are tried as
+            # well. There is no index yet while the xrefs are being read.
+            try:
+                (obj, genno) = self._getobj_index(index, objid)
+            except (PSEOF, PDFSyntaxError, KeyError):
+                try:
+                    (obj, genno) = self._getobj_xrefs(self.xrefs, objid)
+                except PDFObjectNotFound:
+                    (obj, genno) = self._getobj_fallback(objid)
+        else:
+            (obj, genno) = self._getobj_fallback(objid)
+        if self.stats is not None:
+            self.stats.count('objects')
+        return (obj, genno)
+
+    def _getobj_index(self, index, objid):
+        if index is None:
+            raise KeyError(objid)
+        (strmid, pos, genno) = index[objid]
+        return (self._getobj_at(objid, strmid, pos, genno), genno)
+
+    def _getobj_fallback(self, objid):
+        xref = self.load_fallback()
+        if xref is None:
+            raise PDFObjectNotFound(objid)
+        return self._getobj_xrefs([xref], objid)
+
+    def _getobj_xrefs(self, xrefs, objid):
+        for xref in xrefs:
+            try:
+                (strmid, index, genno) = xref.get_pos(objid)
+            except KeyError:
+                continue
+            try:
+                obj = self._getobj_at(objid, strmid, index, genno)
+                break
+            except (PSEOF, PDFSyntaxError):
+                continue
+        else:
+            raise PDFObjectNotFound(objid)
+        return (obj, genno)
+
+    def _getobj_at(self, objid, strmid, index, genno):
+        if strmid is not None:
+            if strmid == objid:
+                raise PDFSyntaxError('Object is in itself: %r' % objid)
+            obj = self._get_objstm(strmid).get_object(index)
+        else:
+            obj = self._getobj_parse(index, objid)
+            if self.decipher:
+                obj = decipher_all(self.decipher, objid, genno, obj)
+        if isinstance(obj, PDFStream):
+            obj.set_objid(objid, genno)
+            obj.stats = self.stats
+        return obj
+
     def get_outlines(self):
         if 'Outlines' not in self.catalog:
             raise PDFNoOutlines
@@ -799,33 +1091,44 @@ class PDFDocument:
 
     # read xref table
     def read_xref_from(self, parser, start, xrefs):
-        """Reads XRefs from the given location."""
-        parser.seek(start)
-        parser.reset()
-        try:
-            (pos, token) = parser.nexttoken()
-        except PSEOF:
-            raise PDFNoValidXRef('Unexpected EOF')
-        log.info('read_xref_from: start=%d, token=%r', start, token)
-        if isinstance(token, int):
-            # XRefStream: PDF-1.5
-            parser.seek(pos)
+        """Reads XRefs from the given location.
+
+        The XRefs of /XRefStm and /Prev are read as well. Every location is
+        read once, also when a /Prev points back to a newer XRef.
+        """
+        visited = set()
+        todo = [start]
+        while todo:
+            start = todo.pop()
+            if start in visited:
+                log.info('xref loop: start=%d', start)
+                continue
+            visited.add(start)
+            parser.seek(start)
             parser.reset()
-            xref = PDFXRefStream()
-            xref.load(parser)
-        else:
-            if token is parser.KEYWORD_XREF:
-                parser.nextline()
-            xref = PDFXRef()
-            xref.load(parser)
-        xrefs.append(xref)
-        trailer = xref.get_trailer()
-        log.info('trailer: %r', trailer)
-        if 'XRefStm' in trailer:
-            pos = int_value(trailer['XRefStm'])
-            self.read_xref_from(parser, pos, xrefs)
-        if 'Prev' in trailer:
-            # find previous xref
-            pos = int_value(trailer['Prev'])
-            self.read_xref_from(parser, pos, xrefs)
+            try:
+                (pos, token) = parser.nexttoken()
+            except PSEOF:
+                raise PDFNoValidXRef('Unexpected EOF')
+            log.info('read_xref_from: start=%d, token=%r', start, token)
+            if isinstance(token, int):
+                # XRefStream: PDF-1.5
+                parser.seek(pos)
+                parser.reset()
+                xref = PDFXRefStream()
+                xref.load(parser)
+            else:
+                if token is parser.KEYWORD_XREF:
+                    parser.nextline()
+                xref = PDFXRef()
+                xref.load(parser)
+            xrefs.append(xref)
+            trailer = xref.get_trailer()
+            log.info('trailer: %r', trailer)
+            # /XRefStm and its /Prev chain are read before /Prev.
+            if 'Prev' in trailer:
+                # find previous xref
+                todo.append(int_value(trailer['Prev']))
+            if 'XRefStm' in trailer:
+                todo.append(int_value(trailer['XRefStm']))
         return
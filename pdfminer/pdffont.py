@@ -501,6 +501,7 @@ class PDFFont:
         self.bbox = list_value(resolve_all(descriptor.get('FontBBox',
                                                           (0, 0, 0, 0))))
         self.hscale = self.vscale = .001
+        self._glyphs = {}
 
         # PDF RM 9.8.1 specifies /Descent should always be a negative number.
         # PScript5.dll seems to produce Descent with a positive number, but
@@ -554,6 +555,27 @@ class PDFFont:
     def char_disp(self, cid):
         return 0
 
+    def get_glyph(self, cid):
+        """Returns (text, width, disp) of a cid.
+
+        text is None if the cid has no unicode mapping. The result is
+        computed once per cid and memoized, so that rendering a glyph
+        needs only a single dict lookup instead of several lookups that
+        fail with an exception.
+        """
+        try:
+            return self._glyphs[cid]
+        except KeyError:
+            pass
+        try:
+            text = self.to_unichr(cid)
+            assert isinstance(text, str), str(type(text))
+        except PDFUnicodeNotDefined:
+            text = None
+        glyph = (text, self.char_width(cid), self.char_disp(cid))
+        self._glyphs[cid] = glyph
+        return glyph
+
     def string_width(self, s):
         return sum(self.char_width(cid) for cid in self.decode(s))
 
@@ -1,11 +1,19 @@
+import copyreg
+import hashlib
 import re
 import logging
+import os
+import pickle
+import tempfile
+import time
+from collections import OrderedDict
 from io import BytesIO
 from .cmapdb import CMapDB
 from .cmapdb import CMap
 from .psparser import PSTypeError
 from .psparser import PSEOF
 from .psparser import PSKeyword
+from .psparser import PSLiteral
 from .psparser import literal_name
 from .psparser import keyword_name
 from .psparser import PSStackParser
@@ -42,6 +50,112 @@ class PDFInterpreterError(PDFException):
     pass
 
 
+class PDFPageLimitExceeded(PDFInterpreterError):
+    """A page exceeds one of the limits of its PDFPageLimits"""
+
+    def __init__(self, limit, value, maximum):
+        self.limit = limit
+        self.value = value
+        self.maximum = maximum
+        msg = 'Page limit exceeded: %s=%r > %r' % (limit, value, maximum)
+        PDFInterpreterError.__init__(self, msg)
+        return
+
+
+class PDFPageLimits:
+    """Per-page limits that are enforced by PDFPageInterpreter
+
+    The limits are checked cooperatively while a page is interpreted, such
+    that a single pathological page cannot take an unbounded amount of time
+    or memory. They do not interrupt the decoding of a single stream or the
+    layout analysis of the page. A limit of None is not checked.
+
+    :param max_operators: Maximum number of operators executed, including
+        the operators of Form XObjects.
+    :param max_chars: Maximum number of characters shown.
+    :param max_depth: Maximum nesting depth of Form XObjects.
+    :param max_decoded_bytes: Maximum size of the decoded content streams
+        and the inline images.
+    :param timeout: Maximum wall-clock time in seconds.
+    :param partial: If False, a page that exceeds a limit raises
+        PDFPageLimitExceeded and is not passed on by the device. If True,
+        the interpretation of the page stops, a warning is logged, and the
+        page is passed on with everything that was rendered so far.
+    """
+
+    def __init__(self, max_operators=None, max_chars=None, max_depth=None,
+                 max_decoded_bytes=None, timeout=None, partial=False):
+        self.max_operators = max_operators
+        self.max_chars = max_chars
+        self.max_depth = max_depth
+        self.max_decoded_bytes = max_decoded_bytes
+        self.timeout = timeout
+        self.partial = partial
+        return
+
+    def __repr__(self):
+        return '<PDFPageLimits: max_operators=%r, max_chars=%r, ' \
+               'max_depth=%r, max_decoded_bytes=%r, timeout=%r, ' \
+               'partial=%r>' % \
+               (self.max_operators, self.max_chars, self.max_depth,
+                self.max_decoded_bytes, self.timeout, self.partial)
+
+
+class PDFPageBudget:
+    """What is used of the PDFPageLimits while a page is interpreted"""
+
+    def __init__(self, limits):
+        self.limits = limits
+        self.operators = 0
+        self.chars = 0
+        self.depth = 0
+        self.decoded_bytes = 0
+        self.start = time.monotonic()
+        return
+
+    def add_operator(self):
+        self.operators += 1
+        maximum = self.limits.max_operators
+        if maximum is not None and maximum < self.operators:
+            raise PDFPageLimitExceeded('operators', self.operators, maximum)
+        timeout = self.limits.timeout
+        if timeout is not None:
+            elapsed = time.monotonic() - self.start
+            if timeout < elapsed:
+                raise PDFPageLimitExceeded('time', elapsed, timeout)
+        return
+
+    def add_chars(self, font, seq):
+        maximum = self.limits.max_chars
+        if maximum is None:
+            return
+        for obj in seq:
+            if isinstance(obj, bytes):
+                self.chars += sum(1 for _ in font.decode(obj))
+        if maximum < self.chars:
+            raise PDFPageLimitExceeded('chars', self.chars, maximum)
+        return
+
+    def add_decoded_bytes(self, nbytes):
+        self.decoded_bytes += nbytes
+        maximum = self.limits.max_decoded_bytes
+        if maximum is not None and maximum < self.decoded_bytes:
+            raise PDFPageLimitExceeded('decoded_bytes', self.decoded_bytes,
+                                       maximum)
+        return
+
+    def enter_form(self):
+        self.depth += 1
+        maximum = self.limits.max_depth
+        if maximum is not None and maximum < self.depth:
+            raise PDFPageLimitExceeded('depth', self.depth, maximum)
+        return
+
+    def leave_form(self):
+        self.depth -= 1
+        return
+
+
 LITERAL_PDF = LIT('PDF')
 LITERAL_TEXT = LIT('Text')
 LITERAL_FONT = LIT('Font')
@@ -51,6 +165,9 @@ LITERAL_IMAGE = LIT('Image')
 
 class PDFTextState:
 
+    __slots__ = ('font', 'fontsize', 'charspace', 'wordspace', 'scaling',
+                 'leading', 'render', 'rise', 'matrix', 'linematrix')
+
     def __init__(self):
         self.font = None
         self.fontsize = 0
@@ -95,6 +212,9 @@ class PDFTextState:
 
 class PDFGraphicState:
 
+    __slots__ = ('linewidth', 'linecap', 'linejoin', 'miterlimit', 'dash',
+                 'intent', 'flatness', 'scolor', 'ncolor')
+
     def __init__(self):
         self.linewidth = 0
         self.linecap = None
@@ -141,8 +261,9 @@ class PDFResourceManager:
     allocated multiple times.
     """
 
-    def __init__(self, caching=True):
+    def __init__(self, caching=True, stats=None):
         self.caching = caching
+        self.stats = stats
         self._cached_fonts = {}
         return
 
@@ -167,7 +288,12 @@ class PDFResourceManager:
     def get_font(self, objid, spec):
         if objid and objid in self._cached_fonts:
             font = self._cached_fonts[objid]
+            if self.stats is not None:
+                self.stats.count('cache.fonts.hit')
         else:
+            if self.stats is not None:
+                self.stats.count('cache.fonts.miss')
+                self.stats.start('font')
             log.info('get_font: create: objid=%r, spec=%r', objid, spec)
             if settings.STRICT:
                 if spec['Type'] is not LITERAL_FONT:
@@ -206,13 +332,72 @@ class PDFResourceManager:
                 font = PDFType1Font(self, spec)  # this is so wrong!
             if objid and self.caching:
                 self._cached_fonts[objid] = font
+            if self.stats is not None:
+                self.stats.stop('font')
         return font
 
 
+# Runs of operators that only draw, such as "10 20 m 30 40 l S", and the
+# tokens that may contain text that looks like such a run. The operators
+# are those with numeric operands for path construction, painting,
+# clipping, colors in device color spaces and line styles.
+_NUMBER = rb'[-+]?(?:\d+\.?\d*|\.\d+)'
+_GRAPHICS_OPERATOR = \
+    rb'(?:re|rg|RG|SC|sc|f\*|B\*|b\*|W\*|[mlcvyhSsFfBbnWgGkKwJjMi])'
+_GRAPHICS_RE = re.compile(
+    rb'(?P<graphics>(?<![^\s])(?:(?:%s\s+)*%s(?:\s+|(?=[()<>\[\]{}/%%])|\Z))+)'
+    % (_NUMBER, _GRAPHICS_OPERATOR) +
+    rb'|\((?:[^()\\]|\\.|\((?:[^()\\]|\\.)*\))*\)'
+    rb'|<<|>>|<[0-9A-Fa-f\s]*>'
+    rb'|/[^\s()<>\[\]{}/%]*'
+    rb'|%[^\r\n]*'
+    rb'|(?<![^\s])ID\s.*?EI(?=\s)'
+    rb'|(?P<unknown>[(<]|(?<![^\s])ID\s)', re.DOTALL)
+
+
+def remove_graphics(data):
+    """Remove the runs of drawing operators from a content stream.
+
+    The data is returned unchanged if it contains a string or inline image
+    that cannot be skipped safely.
+    """
+    parts = []
+    pos = 0
+    for m in _GRAPHICS_RE.finditer(data):
+        if m.lastgroup == 'graphics':
+            parts.append(data[pos:m.start()])
+            parts.append(b' ')
+            pos = m.end()
+        elif m.lastgroup == 'unknown':
+            return data
+    if not parts:
+        return data
+    parts.append(data[pos:])
+    return b''.join(parts)
+
+
+def _get_key(obj):
+    """Return a hashable key that is equal for objects with equal content.
+
+    Indirect objects are represented by their document and objid, without
+    resolving them. Raises TypeError for other objects that are not
+    hashable.
+    """
+    if isinstance(obj, dict):
+        return frozenset((k, _get_key(v)) for (k, v) in obj.items())
+    elif isinstance(obj, list):
+        return tuple(_get_key(v) for v in obj)
+    elif isinstance(obj, PDFObjRef):
+        return (PDFObjRef, id(obj.doc), obj.objid)
+    hash(obj)
+    return obj
+
+
 class PDFContentParser(PSStackParser):
 
-    def __init__(self, streams):
+    def __init__(self, streams, text_only=False):
         self.streams = streams
+        self.text_only = text_only
         self.istream = 0
         PSStackParser.__init__(self, None)
         return
@@ -224,7 +409,12 @@ class PDFContentParser(PSStackParser):
                 self.istream += 1
             else:
                 raise PSEOF('Unexpected EOF, file truncated?')
-            self.fp = BytesIO(strm.get_data())
+            data = strm.get_data()
+            if self.text_only:
+                data = remove_graphics(data)
+            # The end of a stream ends its last token, also when the data
+            # does not end with the newline before endstream.
+            self.fp = BytesIO(data + b'\n')
         return
 
     def seek(self, pos):
@@ -245,40 +435,81 @@ class PDFContentParser(PSStackParser):
         self.charpos = 0
         return
 
-    def get_inline_data(self, pos, target=b'EI'):
+    def get_inline_data(self, pos, target=b'EI', length=None):
+        """Return the data of an inline image that starts at pos.
+
+        The data ends before the end-of-line marker that precedes the target
+        followed by whitespace. When the length of the data is given and the
+        target follows it, the length is used instead. The data may continue
+        in the next streams.
+        """
         self.seek(pos)
-        i = 0
-        data = b''
-        while i <= len(target):
-            self.fillbuf()
-            if i:
-                c = self.buf[self.charpos]
-                c = bytes((c,))
-                data += c
-                self.charpos += 1
-                if len(target) <= i and c.isspace():
-                    i += 1
-                elif i < len(target) and c == (bytes((target[i],))):
-                    i += 1
-                else:
-                    i = 0
-            else:
-                try:
-                    j = self.buf.index(target[0], self.charpos)
-                    data += self.buf[self.charpos:j+1]
-                    self.charpos = j+1
-                    i = 1
-                except ValueError:
-                    data += self.buf[self.charpos:]
-                    self.charpos = len(self.buf)
-        data = data[:-(len(target)+1)]  # strip the last part
-        data = re.sub(br'(\x0d\x0a|[\x0d\x0a])$', b'', data)
+        data = self.fp.getvalue()
+        if length is not None:
+            length_pattern = re.compile(br'\s*' + re.escape(target) + br'\s')
+        pattern = re.compile(re.escape(target) + br'\s')
+        parts = []
+        start = pos
+        while 1:
+            if length is not None:
+                end = start + length - sum(map(len, parts))
+                m = length_pattern.match(data, end) if start <= end else None
+                if m:
+                    parts.append(data[start:end])
+                    self.seek(m.end())
+                    return (pos, b''.join(parts))
+            m = pattern.search(data, start)
+            if m:
+                parts.append(data[start:m.start()])
+                break
+            # The data continues in the next stream. The newline that
+            # fillfp adds to the end of every stream is not part of it.
+            parts.append(data[start:-1])
+            self.fp = None
+            self.fillfp()
+            data = self.fp.getvalue()
+            start = 0
+        self.seek(m.end())
+        if len(parts) == 1:
+            data = parts[0]
+        else:
+            data = b''.join(parts)
+        if data.endswith(b'\r\n'):
+            data = data[:-2]
+        elif data.endswith((b'\r', b'\n')):
+            data = data[:-1]
         return (pos, data)
 
     def flush(self):
         self.add_results(*self.popall())
         return
 
+    def compile(self):
+        """Yield the operators of the content streams with their operands.
+
+        Every operator is a tuple (name, method, args), where method is the
+        name of the PDFPageInterpreter method that executes it and args are
+        the operands that precede it. Operands that are not followed by an
+        operator are yielded with None as name and method.
+        """
+        args = []
+        while 1:
+            try:
+                (_, obj) = self.nextobject()
+            except PSEOF:
+                break
+            if isinstance(obj, PSKeyword):
+                name = keyword_name(obj)
+                method = 'do_%s' % name.replace('*', '_a').replace('"', '_w')\
+                    .replace("'", '_q')
+                yield (name, method, tuple(args))
+                args = []
+            else:
+                args.append(obj)
+        if args:
+            yield (None, None, tuple(args))
+        return
+
     KEYWORD_BI = KWD(b'BI')
     KEYWORD_ID = KWD(b'ID')
     KEYWORD_EI = KWD(b'EI')
@@ -295,7 +526,11 @@ class PDFContentParser(PSStackParser):
                         .format(objs)
                     raise PSTypeError(error_msg)
                 d = {literal_name(k): v for (k, v) in choplist(2, objs)}
-                (pos, data) = self.get_inline_data(pos+len(b'ID '))
+                length = d.get('L', d.get('Length'))
+                if not isinstance(length, int) or length < 0:
+                    length = None
+                (pos, data) = self.get_inline_data(pos+len(b'ID '),
+                                                   length=length)
                 obj = PDFStream(d, data)
                 self.push((pos, obj))
                 self.push((pos, self.KEYWORD_EI))
@@ -307,23 +542,207 @@ class PDFContentParser(PSStackParser):
         return
 
 
+def _load_literal(name):
+    return LIT(name)
+
+
+def _load_keyword(name):
+    return KWD(name)
+
+
+class _ProgramPickler(pickle.Pickler):
+    # Literals and keywords must be interned again when they are loaded.
+    dispatch_table = copyreg.dispatch_table.copy()
+    dispatch_table[PSLiteral] = lambda obj: (_load_literal, (obj.name,))
+    dispatch_table[PSKeyword] = lambda obj: (_load_keyword, (obj.name,))
+
+
+class _ProgramUnpickler(pickle.Unpickler):
+    ALLOWED = {
+        (__name__, '_load_literal'): _load_literal,
+        (__name__, '_load_keyword'): _load_keyword,
+        ('pdfminer.pdftypes', 'PDFStream'): PDFStream,
+    }
+
+    def find_class(self, module, name):
+        try:
+            return self.ALLOWED[module, name]
+        except KeyError:
+            raise pickle.UnpicklingError('Forbidden global: %s.%s'
+                                         % (module, name))
+
+
+class PDFProgramCache:
+    """Cache of compiled content streams, see PDFContentParser.compile()
+
+    Programs are keyed by a hash of the decoded data of the content streams,
+    so the same cache can be shared by interpreters with different devices
+    and layout parameters, and even by different documents. The programs
+    that were used most recently are kept in memory. If a directory is
+    given, all programs are also stored there, such that other processes
+    can load them instead of parsing the content streams again.
+    """
+
+    VERSION = 1
+
+    def __init__(self, directory=None, maxsize=1000):
+        self.directory = directory
+        self.maxsize = maxsize
+        self._programs = OrderedDict()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        return
+
+    def __len__(self):
+        return len(self._programs)
+
+    def get_key(self, streams, text_only=False):
+        """Return the key of the program of the content streams"""
+        digest = hashlib.sha1(b'pdfminer-program-%d' % self.VERSION)
+        if text_only:
+            digest.update(b'-text')
+        for stream in streams:
+            data = stream_value(stream).get_data()
+            digest.update(b'%d:' % len(data))
+            digest.update(data)
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return the program with the given key, or None"""
+        program = self._programs.get(key)
+        if program is not None:
+            self._programs.move_to_end(key)
+            return program
+        if self.directory is None:
+            return None
+        try:
+            with open(self._get_path(key), 'rb') as fp:
+                program = _ProgramUnpickler(fp).load()
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            log.warning('Cannot load program %s: %s', key, e)
+            return None
+        self._remember(key, program)
+        return program
+
+    def put(self, key, program):
+        """Store a program"""
+        self._remember(key, program)
+        if self.directory is None:
+            return
+        try:
+            (fd, tmppath) = tempfile.mkstemp(dir=self.directory)
+            with os.fdopen(fd, 'wb') as fp:
+                _ProgramPickler(fp, pickle.HIGHEST_PROTOCOL).dump(program)
+            os.replace(tmppath, self._get_path(key))
+        except OSError as e:
+            log.warning('Cannot store program %s: %s', key, e)
+        return
+
+    def _get_path(self, key):
+        return os.path.join(self.directory, key + '.program')
+
+    def _remember(self, key, program):
+        self._programs[key] = program
+        self._programs.move_to_end(key)
+        while self.maxsize < len(self._programs):
+            self._programs.popitem(last=False)
+        return
+
+
 class PDFPageInterpreter:
     """Processor for the content of a PDF page
 
     Reference: PDF Reference, Appendix A, Operator Summary
+
+    With text_only=True, the operators that construct, paint and clip paths,
+    set colors or other graphics state parameters that only affect drawing,
+    and images are skipped. Use it for devices that only use the text, such
+    as a TextConverter without an ImageWriter.
     """
 
-    def __init__(self, rsrcmgr, device):
+    # Methods that are not called in text-only mode.
+    TEXT_ONLY_SKIPPED = frozenset((
+        'do_w', 'do_J', 'do_j', 'do_M', 'do_d', 'do_ri', 'do_i', 'do_gs',
+        'do_m', 'do_l', 'do_c', 'do_v', 'do_y', 'do_h', 'do_re',
+        'do_S', 'do_s', 'do_f', 'do_F', 'do_f_a', 'do_B', 'do_B_a', 'do_b',
+        'do_b_a', 'do_n', 'do_W', 'do_W_a',
+        'do_CS', 'do_cs', 'do_SC', 'do_SCN', 'do_sc', 'do_scn', 'do_G',
+        'do_g', 'do_RG', 'do_rg', 'do_K', 'do_k', 'do_sh',
+        'do_BI', 'do_ID', 'do_EI',
+    ))
+
+    def __init__(self, rsrcmgr, device, stats=None, limits=None,
+                 programs=None, text_only=False):
         self.rsrcmgr = rsrcmgr
         self.device = device
+        self.stats = stats
+        self.limits = limits
+        self.programs = programs
+        self.text_only = text_only
+        self.budget = None
+        # The document of the pages that are processed, the caches are
+        # cleared when it changes.
+        self.doc = None
+        self.form_cache = {}
+        self.resource_cache = {}
+        if stats is not None:
+            device.set_stats(stats)
         return
 
     def dup(self):
-        return self.__class__(self.rsrcmgr, self.device)
+        interpreter = self.__class__(self.rsrcmgr, self.device,
+                                     stats=self.stats, limits=self.limits,
+                                     programs=self.programs,
+                                     text_only=self.text_only)
+        interpreter.budget = self.budget
+        interpreter.doc = self.doc
+        interpreter.form_cache = self.form_cache
+        interpreter.resource_cache = self.resource_cache
+        return interpreter
+
+    # Number of entries of the resource cache after which it is cleared.
+    MAX_CACHED_RESOURCES = 1000
+
+    def get_resources_key(self, resources):
+        """Return the key of a Resources dictionary in the resource cache.
+
+        Pages and Form XObjects that share the same Resources object, or
+        that have equal direct dictionaries, get the same key. None is
+        returned when the resources cannot be cached.
+        """
+        try:
+            return _get_key(resources)
+        except TypeError:
+            return None
 
     def init_resources(self, resources):
-        """Prepare the fonts and XObjects listed in the Resource attribute."""
+        """Prepare the fonts and XObjects listed in the Resource attribute.
+
+        The fonts, XObjects and color spaces of resources that were prepared
+        before, by this interpreter or the interpreters of its Form XObjects,
+        are reused.
+        """
         self.resources = resources
+        cache = bool(resources) and isinstance(resources, dict) \
+            and self.rsrcmgr.caching
+        key = None
+        if cache:
+            # The same object is returned for an indirect Resources object
+            # when the document caches objects. Otherwise, the content of
+            # the resources is compared.
+            cached = self.resource_cache.get(id(resources))
+            if cached is None:
+                key = self.get_resources_key(resources)
+                cached = self.resource_cache.get(key)
+            if cached is not None:
+                if self.stats is not None:
+                    self.stats.count('cache.resources.hit')
+                (_, self.fontmap, self.xobjmap, self.csmap) = cached
+                return
+            if self.stats is not None:
+                self.stats.count('cache.resources.miss')
         self.fontmap = {}
         self.xobjmap = {}
         self.csmap = PREDEFINED_COLORSPACE.copy()
@@ -360,6 +779,15 @@ class PDFPageInterpreter:
             elif k == 'XObject':
                 for (xobjid, xobjstrm) in dict_value(v).items():
                     self.xobjmap[xobjid] = xobjstrm
+        if cache:
+            if self.MAX_CACHED_RESOURCES <= len(self.resource_cache):
+                self.resource_cache.clear()
+            # The resources are kept, such that their id is not reused and
+            # the documents of the objids in the key are not collected.
+            cached = (resources, self.fontmap, self.xobjmap, self.csmap)
+            self.resource_cache[id(resources)] = cached
+            if key is not None:
+                self.resource_cache[key] = cached
         return
 
     def init_state(self, ctm):
@@ -369,6 +797,10 @@ class PDFPageInterpreter:
         self.device.set_ctm(self.ctm)
         self.textstate = PDFTextState()
         self.graphicstate = PDFGraphicState()
+        # Whether the states are also referenced by the stack, or by the
+        # device, such that they must be copied before they are changed.
+        self.textstate_shared = False
+        self.graphicstate_shared = False
         self.curpath = []
         # argstack: stack for command arguments.
         self.argstack = []
@@ -390,13 +822,34 @@ class PDFPageInterpreter:
         return x
 
     def get_current_state(self):
-        return (self.ctm, self.textstate.copy(), self.graphicstate.copy())
+        """Return the ctm and the text and graphic states.
+
+        The states are not copied. Instead, they are copied by the
+        interpreter when they are changed afterwards.
+        """
+        self.textstate_shared = self.graphicstate_shared = True
+        return (self.ctm, self.textstate, self.graphicstate)
 
     def set_current_state(self, state):
         (self.ctm, self.textstate, self.graphicstate) = state
+        self.textstate_shared = self.graphicstate_shared = True
         self.device.set_ctm(self.ctm)
         return
 
+    def get_textstate(self):
+        """Return the text state such that it can be changed."""
+        if self.textstate_shared:
+            self.textstate = self.textstate.copy()
+            self.textstate_shared = False
+        return self.textstate
+
+    def get_graphicstate(self):
+        """Return the graphic state such that it can be changed."""
+        if self.graphicstate_shared:
+            self.graphicstate = self.graphicstate.copy()
+            self.graphicstate_shared = False
+        return self.graphicstate
+
     def do_q(self):
         """Save graphics state"""
         self.gstack.append(self.get_current_state())
@@ -416,37 +869,37 @@ class PDFPageInterpreter:
 
     def do_w(self, linewidth):
         """Set line width"""
-        self.graphicstate.linewidth = linewidth
+        self.get_graphicstate().linewidth = linewidth
         return
 
     def do_J(self, linecap):
         """Set line cap style"""
-        self.graphicstate.linecap = linecap
+        self.get_graphicstate().linecap = linecap
         return
 
     def do_j(self, linejoin):
         """Set line join style"""
-        self.graphicstate.linejoin = linejoin
+        self.get_graphicstate().linejoin = linejoin
         return
 
     def do_M(self, miterlimit):
         """Set miter limit"""
-        self.graphicstate.miterlimit = miterlimit
+        self.get_graphicstate().miterlimit = miterlimit
         return
 
     def do_d(self, dash, phase):
         """Set line dash pattern"""
-        self.graphicstate.dash = (dash, phase)
+        self.get_graphicstate().dash = (dash, phase)
         return
 
     def do_ri(self, intent):
         """Set color rendering intent"""
-        self.graphicstate.intent = intent
+        self.get_graphicstate().intent = intent
         return
 
     def do_i(self, flatness):
         """Set flatness tolerance"""
-        self.graphicstate.flatness = flatness
+        self.get_graphicstate().flatness = flatness
         return
 
     def do_gs(self, name):
@@ -586,32 +1039,32 @@ class PDFPageInterpreter:
 
     def do_G(self, gray):
         """Set gray level for stroking operations"""
-        self.graphicstate.scolor = gray
+        self.get_graphicstate().scolor = gray
         return
 
     def do_g(self, gray):
         """Set gray level for nonstroking operations"""
-        self.graphicstate.ncolor = gray
+        self.get_graphicstate().ncolor = gray
         return
 
     def do_RG(self, r, g, b):
         """Set RGB color for stroking operations"""
-        self.graphicstate.scolor = (r, g, b)
+        self.get_graphicstate().scolor = (r, g, b)
         return
 
     def do_rg(self, r, g, b):
         """Set RGB color for nonstroking operations"""
-        self.graphicstate.ncolor = (r, g, b)
+        self.get_graphicstate().ncolor = (r, g, b)
         return
 
     def do_K(self, c, m, y, k):
         """Set CMYK color for stroking operations"""
-        self.graphicstate.scolor = (c, m, y, k)
+        self.get_graphicstate().scolor = (c, m, y, k)
         return
 
     def do_k(self, c, m, y, k):
         """Set CMYK color for nonstroking operations"""
-        self.graphicstate.ncolor = (c, m, y, k)
+        self.get_graphicstate().ncolor = (c, m, y, k)
         return
 
     def do_SCN(self):
@@ -622,7 +1075,7 @@ class PDFPageInterpreter:
             if settings.STRICT:
                 raise PDFInterpreterError('No colorspace specified!')
             n = 1
-        self.graphicstate.scolor = self.pop(n)
+        self.get_graphicstate().scolor = self.pop(n)
         return
 
     def do_scn(self):
@@ -633,7 +1086,7 @@ class PDFPageInterpreter:
             if settings.STRICT:
                 raise PDFInterpreterError('No colorspace specified!')
             n = 1
-        self.graphicstate.ncolor = self.pop(n)
+        self.get_graphicstate().ncolor = self.pop(n)
         return
 
     def do_SC(self):
@@ -657,7 +1110,7 @@ class PDFPageInterpreter:
         the identity matrix. Text objects cannot be nested; a second BT cannot
         appear before an ET.
         """
-        self.textstate.reset()
+        self.get_textstate().reset()
         return
 
     def do_ET(self):
@@ -704,7 +1157,7 @@ class PDFPageInterpreter:
 
         :param space: a number expressed in unscaled text space units.
         """
-        self.textstate.charspace = space
+        self.get_textstate().charspace = space
         return
 
     def do_Tw(self, space):
@@ -714,7 +1167,7 @@ class PDFPageInterpreter:
 
         :param space: a number expressed in unscaled text space units
         """
-        self.textstate.wordspace = space
+        self.get_textstate().wordspace = space
         return
 
     def do_Tz(self, scale):
@@ -722,7 +1175,7 @@ class PDFPageInterpreter:
 
         :param scale: is a number specifying the percentage of the normal width
         """
-        self.textstate.scaling = scale
+        self.get_textstate().scaling = scale
         return
 
     def do_TL(self, leading):
@@ -732,7 +1185,7 @@ class PDFPageInterpreter:
 
         :param leading: a number expressed in unscaled text space units
         """
-        self.textstate.leading = -leading
+        self.get_textstate().leading = -leading
         return
 
     def do_Tf(self, fontid, fontsize):
@@ -742,18 +1195,19 @@ class PDFPageInterpreter:
             of the current resource dictionary
         :param fontsize: size is a number representing a scale factor.
         """
+        textstate = self.get_textstate()
         try:
-            self.textstate.font = self.fontmap[literal_name(fontid)]
+            textstate.font = self.fontmap[literal_name(fontid)]
         except KeyError:
             if settings.STRICT:
                 raise PDFInterpreterError('Undefined Font id: %r' % fontid)
-            self.textstate.font = self.rsrcmgr.get_font(None, {})
-        self.textstate.fontsize = fontsize
+            textstate.font = self.rsrcmgr.get_font(None, {})
+        textstate.fontsize = fontsize
         return
 
     def do_Tr(self, render):
         """Set the text rendering mode"""
-        self.textstate.render = render
+        self.get_textstate().render = render
         return
 
     def do_Ts(self, rise):
@@ -761,36 +1215,40 @@ class PDFPageInterpreter:
 
         :param rise: a number expressed in unscaled text space units
         """
-        self.textstate.rise = rise
+        self.get_textstate().rise = rise
         return
 
     def do_Td(self, tx, ty):
         """Move text position"""
-        (a, b, c, d, e, f) = self.textstate.matrix
-        self.textstate.matrix = (a, b, c, d, tx*a+ty*c+e, tx*b+ty*d+f)
-        self.textstate.linematrix = (0, 0)
+        textstate = self.get_textstate()
+        (a, b, c, d, e, f) = textstate.matrix
+        textstate.matrix = (a, b, c, d, tx*a+ty*c+e, tx*b+ty*d+f)
+        textstate.linematrix = (0, 0)
         return
 
     def do_TD(self, tx, ty):
         """Move text position and set leading"""
-        (a, b, c, d, e, f) = self.textstate.matrix
-        self.textstate.matrix = (a, b, c, d, tx*a+ty*c+e, tx*b+ty*d+f)
-        self.textstate.leading = ty
-        self.textstate.linematrix = (0, 0)
+        textstate = self.get_textstate()
+        (a, b, c, d, e, f) = textstate.matrix
+        textstate.matrix = (a, b, c, d, tx*a+ty*c+e, tx*b+ty*d+f)
+        textstate.leading = ty
+        textstate.linematrix = (0, 0)
         return
 
     def do_Tm(self, a, b, c, d, e, f):
         """Set text matrix and text line matrix"""
-        self.textstate.matrix = (a, b, c, d, e, f)
-        self.textstate.linematrix = (0, 0)
+        textstate = self.get_textstate()
+        textstate.matrix = (a, b, c, d, e, f)
+        textstate.linematrix = (0, 0)
         return
 
     def do_T_a(self):
         """Move to start of next text line"""
-        (a, b, c, d, e, f) = self.textstate.matrix
-        self.textstate.matrix = (a, b, c, d, self.textstate.leading*c+e,
-                                 self.textstate.leading*d+f)
-        self.textstate.linematrix = (0, 0)
+        textstate = self.get_textstate()
+        (a, b, c, d, e, f) = textstate.matrix
+        textstate.matrix = (a, b, c, d, textstate.leading*c+e,
+                            textstate.leading*d+f)
+        textstate.linematrix = (0, 0)
         return
 
     def do_TJ(self, seq):
@@ -799,8 +1257,13 @@ class PDFPageInterpreter:
             if settings.STRICT:
                 raise PDFInterpreterError('No font specified!')
             return
-        self.device.render_string(self.textstate, seq, self.ncs,
-                                  self.graphicstate.copy())
+        if self.budget is not None:
+            self.budget.add_chars(self.textstate.font, seq)
+        # The device changes the line matrix of the text state, and its
+        # characters keep the graphic state.
+        self.device.render_string(self.get_textstate(), seq, self.ncs,
+                                  self.graphicstate)
+        self.graphicstate_shared = True
         return
 
     def do_Tj(self, s):
@@ -837,6 +1300,8 @@ class PDFPageInterpreter:
 
     def do_EI(self, obj):
         """End inline image object"""
+        if self.budget is not None and isinstance(obj, PDFStream):
+            self.budget.add_decoded_bytes(len(obj.get_rawdata() or b''))
         if isinstance(obj, PDFStream) and 'W' in obj and 'H' in obj:
             iobjid = str(id(obj))
             self.device.begin_figure(iobjid, (0, 0, 1, 1), MATRIX_IDENTITY)
@@ -867,11 +1332,20 @@ class PDFPageInterpreter:
                 resources = dict_value(xobjres)
             else:
                 resources = self.resources.copy()
+            if self.budget is not None:
+                self.budget.enter_form()
             self.device.begin_figure(xobjid, bbox, matrix)
-            interpreter.render_contents(resources, [xobj],
-                                        ctm=mult_matrix(matrix, self.ctm))
-            self.device.end_figure(xobjid)
+            try:
+                interpreter.render_contents(resources, [xobj],
+                                            ctm=mult_matrix(matrix, self.ctm))
+            finally:
+                # Keep the device consistent when a page limit is exceeded.
+                self.device.end_figure(xobjid)
+                if self.budget is not None:
+                    self.budget.leave_form()
         elif subtype is LITERAL_IMAGE and 'Width' in xobj and 'Height' in xobj:
+            if self.text_only:
+                return
             self.device.begin_figure(xobjid, (0, 0, 1, 1), MATRIX_IDENTITY)
             self.device.render_image(xobjid, xobj)
             self.device.end_figure(xobjid)
@@ -891,9 +1365,44 @@ class PDFPageInterpreter:
             ctm = (0, 1, -1, 0, y1, -x0)
         else:
             ctm = (1, 0, 0, 1, -x0, -y0)
+        if page.doc is not self.doc:
+            # The cached objects of the previous document are not needed
+            # anymore, and would keep it in memory.
+            self.doc = page.doc
+            self.form_cache = {}
+            self.resource_cache = {}
+        if self.stats is not None:
+            self.stats.begin_page(page.pageid)
+            self.stats.start('interpret')
+        # The content streams whose data is still in the file are released
+        # afterwards. The document keeps the streams, but not their data,
+        # which is read again when the page is processed again.
+        unread = [stream for stream in map(resolve1, page.contents)
+                  if isinstance(stream, PDFStream)
+                  and stream.rawdata is None and stream.data is None]
         self.device.begin_page(page, ctm)
-        self.render_contents(page.resources, page.contents, ctm=ctm)
+        if self.limits is None:
+            self.render_contents(page.resources, page.contents, ctm=ctm)
+        else:
+            self.budget = PDFPageBudget(self.limits)
+            try:
+                self.render_contents(page.resources, page.contents, ctm=ctm)
+            except PDFPageLimitExceeded as e:
+                if self.stats is not None:
+                    self.stats.count('pages.limited')
+                if not self.limits.partial:
+                    if self.stats is not None:
+                        self.stats.stop('interpret')
+                    raise
+                log.warning('Incomplete page %r: %s', page, e)
+            finally:
+                self.budget = None
         self.device.end_page(page)
+        for stream in unread:
+            stream.release()
+        if self.stats is not None:
+            self.stats.stop('interpret')
+            self.stats.end_page()
         return
 
     def render_contents(self, resources, streams, ctm=MATRIX_IDENTITY):
@@ -909,35 +1418,101 @@ class PDFPageInterpreter:
         return
 
     def execute(self, streams):
+        budget = self.budget
+        if budget is not None:
+            streams = [stream_value(stream) for stream in streams]
+            for stream in streams:
+                budget.add_decoded_bytes(len(stream.get_data()))
+        stats = self.stats
+        skipped = self.TEXT_ONLY_SKIPPED if self.text_only else ()
+        for (name, method, args) in self.get_program(streams):
+            if method in skipped:
+                if budget is not None:
+                    budget.add_operator()
+                continue
+            self.argstack.extend(args)
+            if name is None:
+                continue
+            if stats is not None:
+                stats.count_operator(name)
+            if budget is not None:
+                budget.add_operator()
+            if hasattr(self, method):
+                func = getattr(self, method)
+                nargs = func.__code__.co_argcount-1
+                if nargs:
+                    args = self.pop(nargs)
+                    log.debug('exec: %s %r', name, args)
+                    if len(args) == nargs:
+                        func(*args)
+                else:
+                    log.debug('exec: %s', name)
+                    func()
+            else:
+                if settings.STRICT:
+                    error_msg = 'Unknown operator: %r' % name
+                    raise PDFInterpreterError(error_msg)
+        return
+
+    def get_form_stream(self, streams):
+        """Return the stream if streams is a Form XObject that can be cached,
+        or None."""
+        if len(streams) != 1 or not self.rsrcmgr.caching:
+            return None
+        stream = streams[0]
+        if not isinstance(stream, PDFStream) or stream.objid is None \
+                or stream.get('Subtype') is not LITERAL_FORM:
+            return None
+        return stream
+
+    def get_program(self, streams):
+        """Return the operators of the content streams.
+
+        The program of a Form XObject that was executed before, or of
+        streams that are found in the program cache, is reused. Otherwise
+        the streams are compiled while the program runs.
+        """
+        stats = self.stats
+        form = self.get_form_stream(streams)
+        if form is not None:
+            (cached_form, program) = \
+                self.form_cache.get((self.doc, form.objid), (None, None))
+            if cached_form is form:
+                if stats is not None:
+                    stats.count('cache.forms.hit')
+                return program
+            if stats is not None:
+                stats.count('cache.forms.miss')
+        key = None
+        if self.programs is not None:
+            key = self.programs.get_key(streams, text_only=self.text_only)
+            program = self.programs.get(key)
+            if program is not None:
+                if stats is not None:
+                    stats.count('cache.programs.hit')
+                if form is not None:
+                    self.form_cache[(self.doc, form.objid)] = (form, program)
+                return program
+            if stats is not None:
+                stats.count('cache.programs.miss')
         try:
-            parser = PDFContentParser(streams)
+            parser = PDFContentParser(streams, text_only=self.text_only)
         except PSEOF:
             # empty page
-            return
-        while 1:
-            try:
-                (_, obj) = parser.nextobject()
-            except PSEOF:
-                break
-            if isinstance(obj, PSKeyword):
-                name = keyword_name(obj)
-                method = 'do_%s' % name.replace('*', '_a').replace('"', '_w')\
-                    .replace("'", '_q')
-                if hasattr(self, method):
-                    func = getattr(self, method)
-                    nargs = func.__code__.co_argcount-1
-                    if nargs:
-                        args = self.pop(nargs)
-                        log.debug('exec: %s %r', name, args)
-                        if len(args) == nargs:
-                            func(*args)
-                    else:
-                        log.debug('exec: %s', name)
-                        func()
-                else:
-                    if settings.STRICT:
-                        error_msg = 'Unknown operator: %r' % name
-                        raise PDFInterpreterError(error_msg)
-            else:
-                self.push(obj)
+            return ()
+        if form is None and key is None:
+            return parser.compile()
+        return self.compile_contents(parser, form, key)
+
+    def compile_contents(self, parser, form, key):
+        """Yield the operators of the parser and store the program in the
+        caches once it is complete."""
+        program = []
+        for op in parser.compile():
+            program.append(op)
+            yield op
+        if form is not None:
+            self.form_cache[(self.doc, form.objid)] = (form, program)
+        if key is not None:
+            self.programs.put(key, program)
         return
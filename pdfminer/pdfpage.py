@@ -107,6 +107,7 @@ class PDFPage:
                 pages = True
         if not pages:
             # fallback when /Pages is missing.
+            document.load_fallback()
             for xref in document.xrefs:
                 for objid in xref.get_objids():
                     try:
@@ -121,11 +122,14 @@ class PDFPage:
     @classmethod
     def get_pages(cls, fp,
                   pagenos=None, maxpages=0, password='',
-                  caching=True, check_extractable=False):
+                  caching=True, check_extractable=False, stats=None,
+                  lazy_streams=False):
         # Create a PDF parser object associated with the file object.
-        parser = PDFParser(fp)
+        # With lazy_streams, fp must stay open while the pages are used.
+        parser = PDFParser(fp, lazy_streams=lazy_streams)
         # Create a PDF document object that stores the document structure.
-        doc = PDFDocument(parser, password=password, caching=caching)
+        doc = PDFDocument(parser, password=password, caching=caching,
+                          stats=stats)
         # Check if the document allows text extraction.
         # If not, warn the user and proceed.
         if not doc.is_extractable:
@@ -8,7 +8,7 @@ from . import settings
 from .pdftypes import PDFException
 from .pdftypes import PDFStream
 from .pdftypes import PDFObjRef
-from .pdftypes import int_value
+from .pdftypes import resolve1
 from .pdftypes import dict_value
 
 log = logging.getLogger(__name__)
@@ -33,12 +33,17 @@ class PDFParser(PSStackParser):
       parser.seek(offset)
       parser.nextobject()
 
+    With lazy_streams=True, the data of a stream with a valid /Length is
+    only read from the file when it is needed. The file must then stay open
+    as long as the data of the streams of the document may be used.
     """
 
-    def __init__(self, fp):
+    def __init__(self, fp, lazy_streams=False):
         PSStackParser.__init__(self, fp)
         self.doc = None
         self.fallback = False
+        self.lazy_streams = lazy_streams
+        self._resolving_lengths = set()
         return
 
     def set_document(self, doc):
@@ -80,13 +85,7 @@ class PDFParser(PSStackParser):
             # stream object
             ((_, dic),) = self.pop(1)
             dic = dict_value(dic)
-            objlen = 0
-            if not self.fallback:
-                try:
-                    objlen = int_value(dic['Length'])
-                except KeyError:
-                    if settings.STRICT:
-                        raise PDFSyntaxError('/Length is undefined: %r' % dic)
+            objlen = self.get_stream_length(dic)
             self.seek(pos)
             try:
                 (_, line) = self.nextline()  # 'stream'
@@ -95,31 +94,33 @@ class PDFParser(PSStackParser):
                     raise PDFSyntaxError('Unexpected EOF')
                 return
             pos += len(line)
-            self.fp.seek(pos)
-            data = bytearray(self.fp.read(objlen))
-            self.seek(pos+objlen)
-            while 1:
-                try:
-                    (linepos, line) = self.nextline()
-                except PSEOF:
-                    if settings.STRICT:
-                        raise PDFSyntaxError('Unexpected EOF')
-                    break
-                if b'endstream' in line:
-                    i = line.index(b'endstream')
-                    objlen += i
-                    if self.fallback:
-                        data += line[:i]
-                    break
-                objlen += len(line)
+            endpos = None
+            if objlen is not None:
+                endpos = self.find_endstream(pos+objlen)
+            if endpos is not None and self.lazy_streams:
+                # The data is read when it is needed.
+                log.debug('Stream: pos=%d, objlen=%d, dic=%r', pos, objlen,
+                          dic)
+                obj = PDFStream(dic, None, self.doc.decipher,
+                                location=(self.fp, pos, objlen))
+            elif endpos is not None:
+                self.fp.seek(pos)
+                data = self.fp.read(objlen)
+                log.debug('Stream: pos=%d, objlen=%d, dic=%r, data=%r...',
+                          pos, objlen, dic, data[:10])
+                obj = PDFStream(dic, data, self.doc.decipher)
+            else:
+                # /Length is missing or wrong.
                 if self.fallback:
-                    data += line
-            data = bytes(data)
-            self.seek(pos+objlen)
-            # XXX limit objlen not to exceed object boundary
-            log.debug('Stream: pos=%d, objlen=%d, dic=%r, data=%r...', pos,
-                      objlen, dic, data[:10])
-            obj = PDFStream(dic, data, self.doc.decipher)
+                    (data, endpos) = self.read_until_endstream(pos)
+                else:
+                    self.fp.seek(pos)
+                    data = self.fp.read(objlen or 0)
+                    (_, endpos) = self.read_until_endstream(pos+len(data))
+                log.debug('Stream: pos=%d, objlen=%d, dic=%r, data=%r...',
+                          pos, len(data), dic, data[:10])
+                obj = PDFStream(dic, data, self.doc.decipher)
+            self.seek(endpos)
             self.push((pos, obj))
 
         else:
@@ -128,6 +129,73 @@ class PDFParser(PSStackParser):
 
         return
 
+    def get_stream_length(self, dic):
+        """Return the /Length of a stream, or None if it is not usable.
+
+        An indirect length is resolved with the parser of the document,
+        which is this parser, so the state of the parser is kept aside. A
+        length that is being resolved already, like a length that refers
+        to its own stream, is not usable.
+        """
+        try:
+            objlen = dic['Length']
+        except KeyError:
+            if settings.STRICT:
+                raise PDFSyntaxError('/Length is undefined: %r' % dic)
+            return None
+        if isinstance(objlen, PDFObjRef):
+            if self.doc is None or objlen.objid in self._resolving_lengths:
+                return None
+            objid = objlen.objid
+            state = (self.context, self.curtype, self.curstack, self.results)
+            self._resolving_lengths.add(objid)
+            try:
+                objlen = resolve1(objlen)
+            except (PDFException, PSEOF, PSSyntaxError):
+                objlen = None
+            finally:
+                self._resolving_lengths.discard(objid)
+                (self.context, self.curtype, self.curstack,
+                 self.results) = state
+        if not isinstance(objlen, int) or objlen < 0:
+            if settings.STRICT:
+                raise PDFSyntaxError('Invalid /Length: %r' % dic)
+            return None
+        return objlen
+
+    def find_endstream(self, pos):
+        """Return the position of the endstream keyword that should follow
+        the data of a stream at pos, or None if it is not there."""
+        self.fp.seek(pos)
+        buf = self.fp.read(64)
+        skipped = len(buf) - len(buf.lstrip(b' \t\r\n\f\0'))
+        if buf.startswith(b'endstream', skipped):
+            return pos+skipped
+        return None
+
+    def read_until_endstream(self, pos):
+        """Read lines from pos until the endstream keyword.
+
+        Returns the data that was read and the position of the keyword.
+        """
+        self.seek(pos)
+        data = []
+        while 1:
+            try:
+                (linepos, line) = self.nextline()
+            except PSEOF:
+                if settings.STRICT:
+                    raise PDFSyntaxError('Unexpected EOF')
+                break
+            if b'endstream' in line:
+                i = line.index(b'endstream')
+                data.append(line[:i])
+                pos += i
+                break
+            data.append(line)
+            pos += len(line)
+        return (b''.join(data), pos)
+
 
 class PDFStreamParser(PDFParser):
     """
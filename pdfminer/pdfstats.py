@@ -0,0 +1,151 @@
+"""Timings and counters of the processing of a PDF document.
+
+Instrumentation is opt-in. Create a PDFStats object and give it to the
+objects that should report to it:
+
+    stats = PDFStats()
+    rsrcmgr = PDFResourceManager(stats=stats)
+    device = PDFPageAggregator(rsrcmgr, laparams=LAParams())
+    interpreter = PDFPageInterpreter(rsrcmgr, device, stats=stats)
+    for page in PDFPage.get_pages(fp, stats=stats):
+        interpreter.process_page(page)
+    stats.dump(sys.stdout)
+
+Or simply pass stats to one of the functions in pdfminer.high_level. When no
+PDFStats object is given, the instrumented code only checks for None.
+"""
+
+import json
+import time
+from collections import Counter
+
+
+class PDFStats:
+    """Accumulates wall time per stage and counters, per page and in total.
+
+    The time of a stage excludes the time of the stages that are started
+    while it runs. For instance, the time spent decoding a content stream
+    while a page is interpreted counts for 'decode' and not for 'interpret'.
+
+    Stages:
+      xref: reading the cross-reference tables and trailers
+      xref_fallback: scanning the whole file for objects, when the xrefs
+        are damaged or an object is not in them
+      parse: parsing indirect objects
+      decode: decoding streams
+      font: loading fonts
+      interpret: executing content stream operators
+      layout: layout analysis of a page
+      output: writing a page by a converter
+
+    Counters:
+      objects: indirect objects parsed
+      chars: characters emitted by a layout analyzer
+      pages: pages processed
+      pages.limited: pages that exceeded a PDFPageLimits limit
+      cache.objects.hit/miss: lookups in the object cache of a document
+      cache.objstms.hit/miss: lookups of object streams in a document
+      cache.fonts.hit/miss: lookups in the font cache of a resource manager
+      cache.forms.hit/miss: lookups of parsed Form XObjects in an interpreter
+      cache.resources.hit/miss: lookups of prepared Resources dictionaries
+        in an interpreter
+      cache.programs.hit/miss: lookups in the PDFProgramCache of an
+        interpreter
+    """
+
+    def __init__(self):
+        self.times = Counter()
+        self.counts = Counter()
+        self.operators = Counter()
+        self.decoded = Counter()
+        self.pages = []
+        self._stages = []
+        self._start = None
+        self._page = None
+        return
+
+    def __repr__(self):
+        return '<PDFStats: pages=%d>' % len(self.pages)
+
+    def start(self, stage):
+        """Start timing a stage, pausing the stage that is running."""
+        now = time.perf_counter()
+        if self._stages:
+            self.times[self._stages[-1]] += now - self._start
+        self._stages.append(stage)
+        self._start = now
+        return
+
+    def stop(self, stage):
+        """Stop timing a stage, resuming the stage that was paused.
+
+        Stages that were started later and not stopped, because of an
+        exception, are stopped as well.
+        """
+        now = time.perf_counter()
+        while self._stages:
+            running = self._stages.pop()
+            self.times[running] += now - self._start
+            self._start = now
+            if running == stage:
+                break
+        return
+
+    def count(self, name, n=1):
+        self.counts[name] += n
+        return
+
+    def count_operator(self, name):
+        self.operators[name] += 1
+        return
+
+    def count_decoded(self, filter_name, nbytes):
+        self.decoded[filter_name] += nbytes
+        return
+
+    def begin_page(self, pageid=None):
+        """Start collecting the stats of a page."""
+        self._page = (pageid, self._snapshot())
+        return
+
+    def end_page(self):
+        """Store the stats since begin_page() in the list of pages."""
+        if self._page is None:
+            return
+        (pageid, before) = self._page
+        self._page = None
+        self.count('pages')
+        after = self._snapshot()
+        page = self._as_dict(*(a - b for (a, b) in zip(after, before)))
+        page['pageid'] = pageid
+        self.pages.append(page)
+        return
+
+    def _snapshot(self):
+        # Include the time of the running stage up to now.
+        if self._stages:
+            now = time.perf_counter()
+            self.times[self._stages[-1]] += now - self._start
+            self._start = now
+        return (self.times.copy(), self.counts.copy(),
+                self.operators.copy(), self.decoded.copy())
+
+    @staticmethod
+    def _as_dict(times, counts, operators, decoded):
+        return {
+            'times': dict(times),
+            'counts': dict(counts),
+            'operators': dict(operators),
+            'decoded': dict(decoded),
+        }
+
+    def as_dict(self):
+        """Return the totals of the document and the stats of every page."""
+        document = self._as_dict(*self._snapshot())
+        return {'document': document, 'pages': list(self.pages)}
+
+    def dump(self, fp):
+        """Write the stats as JSON to a text file-like object."""
+        json.dump(self.as_dict(), fp, indent=2, sort_keys=True)
+        fp.write('\n')
+        return
@@ -8,6 +8,7 @@ from .ccitt import ccittfaxdecode
 from .psparser import PSException
 from .psparser import PSObject
 from .psparser import LIT
+from .psparser import literal_name
 from . import settings
 from .utils import apply_png_predictor
 from .utils import isnumber
@@ -187,14 +188,18 @@ def stream_value(x):
 
 class PDFStream(PDFObject):
 
-    def __init__(self, attrs, rawdata, decipher=None):
+    def __init__(self, attrs, rawdata, decipher=None, location=None):
         assert isinstance(attrs, dict), str(type(attrs))
         self.attrs = attrs
         self.rawdata = rawdata
         self.decipher = decipher
+        # (fp, pos, length) of the raw data in a file, which is read when
+        # the data is needed.
+        self.location = location
         self.data = None
         self.objid = None
         self.genno = None
+        self.stats = None
         return
 
     def set_objid(self, objid, genno):
@@ -204,9 +209,13 @@ class PDFStream(PDFObject):
 
     def __repr__(self):
         if self.data is None:
-            assert self.rawdata is not None
+            if self.rawdata is None:
+                assert self.location is not None
+                rawlen = self.location[2]
+            else:
+                rawlen = len(self.rawdata)
             return '<PDFStream(%r): raw=%d, %r>' % \
-                   (self.objid, len(self.rawdata), self.attrs)
+                   (self.objid, rawlen, self.attrs)
         else:
             assert self.data is not None
             return '<PDFStream(%r): len=%d, %r>' % \
@@ -249,9 +258,12 @@ class PDFStream(PDFObject):
         return list(zip(_filters, params))
 
     def decode(self):
+        data = self.get_rawdata()
         assert self.data is None \
-               and self.rawdata is not None, str((self.data, self.rawdata))
-        data = self.rawdata
+               and data is not None, str((self.data, data))
+        stats = self.stats
+        if stats is not None:
+            stats.start('decode')
         if self.decipher:
             # Handle encryption
             data = self.decipher(self.objid, self.genno, data, self.attrs)
@@ -259,6 +271,8 @@ class PDFStream(PDFObject):
         if not filters:
             self.data = data
             self.rawdata = None
+            if stats is not None:
+                stats.stop('decode')
             return
         for (f, params) in filters:
             if f in LITERALS_FLATE_DECODE:
@@ -310,8 +324,12 @@ class PDFStream(PDFObject):
                 else:
                     error_msg = 'Unsupported predictor: %r' % pred
                     raise PDFNotImplementedError(error_msg)
+            if stats is not None:
+                stats.count_decoded(literal_name(f), len(data))
         self.data = data
         self.rawdata = None
+        if stats is not None:
+            stats.stop('decode')
         return
 
     def get_data(self):
@@ -320,4 +338,26 @@ class PDFStream(PDFObject):
         return self.data
 
     def get_rawdata(self):
+        if self.rawdata is None and self.data is None \
+                and self.location is not None:
+            (fp, pos, length) = self.location
+            if fp.closed:
+                raise PDFException('The file of %r is closed' % self)
+            # The file is shared with the parser, which expects the file
+            # position to stay where it was.
+            curpos = fp.tell()
+            fp.seek(pos)
+            self.rawdata = fp.read(length)
+            fp.seek(curpos)
         return self.rawdata
+
+    def release(self):
+        """Drop the raw and decoded data of a stream that is in a file.
+
+        The data is read from the file again when it is needed. Streams
+        that are not in a file keep their data.
+        """
+        if self.location is not None:
+            self.rawdata = None
+            self.data = None
+        return
@@ -2,6 +2,7 @@
 Miscellaneous Routines.
 """
 import io
+import math
 import pathlib
 import struct
 from html import escape
@@ -281,16 +282,32 @@ def decode_text(s):
         return ''.join(PDFDocEncoding[c] for c in s)
 
 
+# Escaped short strings, such as the characters and font names of a page
+_ENC_CACHE = {}
+
+
 def enc(x):
     """Encodes a string for SGML/XML/HTML"""
+    try:
+        return _ENC_CACHE[x]
+    except KeyError:
+        pass
     if isinstance(x, bytes):
         return ''
-    return escape(x)
+    escaped = escape(x)
+    if len(x) <= 32 and len(_ENC_CACHE) < 65536:
+        _ENC_CACHE[x] = escaped
+    return escaped
 
 
 def bbox2str(bbox):
     (x0, y0, x1, y1) = bbox
-    return '{:.3f},{:.3f},{:.3f},{:.3f}'.format(x0, y0, x1, y1)
+    return '%.3f,%.3f,%.3f,%.3f' % (x0, y0, x1, y1)
+
+
+def bbox2list(bbox):
+    (x0, y0, x1, y1) = bbox
+    return [round(x0, 3), round(y0, 3), round(x1, 3), round(y1, 3)]
 
 
 def matrix2str(m):
@@ -329,13 +346,14 @@ class Plane:
     """A set-like data structure for objects placed on a plane.
 
     Can efficiently find objects in a certain rectangular area.
-    It maintains two parallel lists of objects, each of
-    which is sorted by its x or y coordinate.
+    It maintains a grid of cells, each of which keeps the objects that
+    overlap with it together with their bounding box. Every object also
+    remembers the range of cells it is placed in, so it can be displaced
+    without searching the grid.
     """
 
     def __init__(self, bbox, gridsize=50):
-        self._seq = []  # preserve the object order.
-        self._objs = set()
+        self._objs = {}  # obj -> range of cells, preserves the object order.
         self._grid = {}
         self.gridsize = gridsize
         (self.x0, self.y0, self.x1, self.y1) = bbox
@@ -344,7 +362,7 @@ class Plane:
         return '<Plane objs=%r>' % list(self)
 
     def __iter__(self):
-        return (obj for obj in self._seq if obj in self._objs)
+        return iter(self._objs)
 
     def __len__(self):
         return len(self._objs)
@@ -353,16 +371,21 @@ class Plane:
         return obj in self._objs
 
     def _getrange(self, bbox):
+        """Returns the range of cells (gx0, gy0, gx1, gy1) covered by bbox.
+
+        The upper bounds are exclusive. Returns None when bbox is outside
+        the plane.
+        """
         (x0, y0, x1, y1) = bbox
         if x1 <= self.x0 or self.x1 <= x0 or y1 <= self.y0 or self.y1 <= y0:
-            return
+            return None
+        d = self.gridsize
         x0 = max(self.x0, x0)
         y0 = max(self.y0, y0)
         x1 = min(self.x1, x1)
         y1 = min(self.y1, y1)
-        for grid_y in drange(y0, y1, self.gridsize):
-            for grid_x in drange(x0, x1, self.gridsize):
-                yield (grid_x, grid_y)
+        return (math.floor(x0 / d), math.floor(y0 / d),
+                math.floor(x1 / d) + 1, math.floor(y1 / d) + 1)
 
     def extend(self, objs):
         for obj in objs:
@@ -370,37 +393,57 @@ class Plane:
 
     def add(self, obj):
         """place an object."""
-        for k in self._getrange((obj.x0, obj.y0, obj.x1, obj.y1)):
-            if k not in self._grid:
-                r = []
-                self._grid[k] = r
-            else:
-                r = self._grid[k]
-            r.append(obj)
-        self._seq.append(obj)
-        self._objs.add(obj)
+        bbox = (obj.x0, obj.y0, obj.x1, obj.y1)
+        r = self._getrange(bbox)
+        if r is not None:
+            (gx0, gy0, gx1, gy1) = r
+            grid = self._grid
+            entry = bbox + (gx0, gy0)
+            for grid_y in range(gy0, gy1):
+                for grid_x in range(gx0, gx1):
+                    k = (grid_x, grid_y)
+                    if k not in grid:
+                        grid[k] = {obj: entry}
+                    else:
+                        grid[k][obj] = entry
+        self._objs[obj] = r
 
     def remove(self, obj):
         """displace an object."""
-        for k in self._getrange((obj.x0, obj.y0, obj.x1, obj.y1)):
-            try:
-                self._grid[k].remove(obj)
-            except (KeyError, ValueError):
-                pass
-        self._objs.remove(obj)
+        r = self._objs.pop(obj)
+        if r is None:
+            return
+        (gx0, gy0, gx1, gy1) = r
+        grid = self._grid
+        for grid_y in range(gy0, gy1):
+            for grid_x in range(gx0, gx1):
+                k = (grid_x, grid_y)
+                cell = grid[k]
+                del cell[obj]
+                if not cell:
+                    del grid[k]
 
     def find(self, bbox):
-        """finds objects that are in a certain area."""
+        """finds objects that are in a certain area.
+
+        Objects are yielded from the first cell in which they are met, so no
+        bookkeeping of the objects that were already found is needed.
+        """
+        r = self._getrange(bbox)
+        if r is None:
+            return
         (x0, y0, x1, y1) = bbox
-        done = set()
-        for k in self._getrange(bbox):
-            if k not in self._grid:
-                continue
-            for obj in self._grid[k]:
-                if obj in done:
-                    continue
-                done.add(obj)
-                if obj.x1 <= x0 or x1 <= obj.x0 or obj.y1 <= y0 \
-                        or y1 <= obj.y0:
+        (qx0, qy0, qx1, qy1) = r
+        grid = self._grid
+        for grid_y in range(qy0, qy1):
+            for grid_x in range(qx0, qx1):
+                cell = grid.get((grid_x, grid_y))
+                if cell is None:
                     continue
-                yield obj
+                for (obj, (ox0, oy0, ox1, oy1, gx0, gy0)) in cell.items():
+                    if (grid_x != gx0 and grid_x != qx0) \
+                            or (grid_y != gy0 and grid_y != qy0):
+                        continue
+                    if ox1 <= x0 or x1 <= ox0 or oy1 <= y0 or y1 <= oy0:
+                        continue
+                    yield obj
@@ -0,0 +1,36 @@
+from io import BytesIO
+
+from nose.tools import assert_equal
+
+from benchmarks import bench, synthetic
+from pdfminer.ascii85 import ascii85decode, asciihexdecode
+from pdfminer.high_level import extract_text
+from pdfminer.lzw import lzwdecode
+from pdfminer.runlength import rldecode
+
+
+class TestSynthetic:
+    def test_encoders_round_trip(self):
+        data = synthetic.make_page_content(synthetic.Random(0), 0) * 4 \
+            + bytes(range(256)) + b'\0' * 300
+        assert_equal(lzwdecode(synthetic.lzwencode(data)), data)
+        assert_equal(rldecode(synthetic.rlencode(data)), data)
+        assert_equal(ascii85decode(
+            synthetic.ENCODERS['ASCII85Decode'](data)), data)
+        assert_equal(asciihexdecode(
+            synthetic.ENCODERS['ASCIIHexDecode'](data)), data)
+
+    def test_same_text_with_every_filter(self):
+        texts = {fltr: extract_text(BytesIO(synthetic.make_pdf(2, fltr)))
+                 for fltr in synthetic.ENCODERS}
+        assert 'ipsum' in texts[None]
+        for text in texts.values():
+            assert_equal(text, texts[None])
+
+
+class TestBench:
+    def test_measure_counts_pages(self):
+        for name in ('interpret', 'raw', 'tag', 'tokenize'):
+            result = bench.measure(name, 'synthetic:3:FlateDecode', 1)
+            assert_equal(result['pages'], 3)
+            assert result['seconds'] > 0
@@ -1,11 +1,17 @@
 import io
+import json
 from tempfile import TemporaryFile
 
 from nose.tools import assert_equal, assert_false, assert_true
 
-from pdfminer.converter import PDFLayoutAnalyzer, PDFConverter
-from pdfminer.layout import LTContainer, LTRect, LTCurve
-from pdfminer.pdfinterp import PDFGraphicState
+from helpers import absolute_sample_path
+from pdfminer import converter
+from pdfminer.converter import PDFLayoutAnalyzer, PDFConverter, \
+    JSONConverter
+from pdfminer.layout import LAParams, LTContainer, LTRect, LTCurve
+from pdfminer.pdfinterp import PDFGraphicState, PDFPageInterpreter, \
+    PDFResourceManager
+from pdfminer.pdfpage import PDFPage
 
 
 class TestPaintPath():
@@ -121,3 +127,65 @@ class TestBinaryDetector():
 
     def test_non_file_like_object_defaults_to_binary(self):
         assert_true(PDFConverter._is_binary_stream(object()))
+
+
+class TestJSONConverter():
+    def convert(self, path, outfp, **kwargs):
+        rsrcmgr = PDFResourceManager()
+        device = JSONConverter(rsrcmgr, outfp, **kwargs)
+        interpreter = PDFPageInterpreter(rsrcmgr, device)
+        with open(absolute_sample_path(path), 'rb') as fp:
+            for page in PDFPage.get_pages(fp):
+                interpreter.process_page(page)
+        device.close()
+        return outfp.getvalue()
+
+    def get_lines(self, record):
+        return [''.join(span['text'] for span in line['spans'])
+                for box in record['boxes'] for line in box['lines']]
+
+    def test_one_record_per_page(self):
+        output = self.convert('simple4.pdf', io.BytesIO(),
+                              laparams=LAParams())
+        records = [json.loads(line) for line in output.splitlines()]
+        assert_equal(len(records), 1)
+        assert_equal(records[0]['page'], 1)
+        assert_equal(self.get_lines(records[0]), ['Text1', 'Text2', 'Text3'])
+        span = records[0]['boxes'][0]['lines'][0]['spans'][0]
+        assert_equal(set(span), {'text', 'font', 'size', 'bbox'})
+
+    def test_chars_without_laparams(self):
+        output = self.convert('simple1.pdf', io.StringIO(), chars=True)
+        record = json.loads(output)
+        assert_equal(self.get_lines(record), ['Hello World'] * 4)
+        span = record['boxes'][0]['lines'][0]['spans'][0]
+        assert_equal(''.join(char['text'] for char in span['chars']),
+                     'Hello World')
+
+    def test_same_output_without_orjson(self):
+        expected = self.convert('simple3.pdf', io.BytesIO(),
+                                laparams=LAParams())
+        orjson = converter.orjson
+        converter.orjson = None
+        try:
+            output = self.convert('simple3.pdf', io.BytesIO(),
+                                  laparams=LAParams())
+        finally:
+            converter.orjson = orjson
+        assert_equal([json.loads(line) for line in output.splitlines()],
+                     [json.loads(line) for line in expected.splitlines()])
+
+    def test_lone_surrogates(self):
+        record = {'text': 'a\ud800b', 'chars': [{'text': '\udfff'}]}
+        orjson = converter.orjson
+        for module in (orjson, None):
+            converter.orjson = module
+            try:
+                outfp = io.BytesIO()
+                device = JSONConverter(PDFResourceManager(), outfp)
+                device.write_record(record)
+                device.close()
+            finally:
+                converter.orjson = orjson
+            assert_equal(json.loads(outfp.getvalue()),
+                         {'text': 'a\ufffdb', 'chars': [{'text': '\ufffd'}]})
@@ -1,7 +1,9 @@
 import unittest
+from io import StringIO
 
 from helpers import absolute_sample_path
-from pdfminer.high_level import extract_text, extract_pages
+from pdfminer.high_level import extract_text, extract_text_to_fp, \
+    extract_pages
 from pdfminer.layout import LAParams, LTTextContainer
 
 
@@ -13,6 +15,13 @@ def run_with_string(sample_path, laparams=None):
     return s
 
 
+def run_raw(sample_path):
+    output = StringIO()
+    with open(absolute_sample_path(sample_path), "rb") as in_file:
+        extract_text_to_fp(in_file, output, output_type='raw')
+    return output.getvalue()
+
+
 def run_with_file(sample_path):
     absolute_path = absolute_sample_path(sample_path)
     with open(absolute_path, "rb") as in_file:
@@ -33,6 +42,13 @@ test_strings = {
     "simple4.pdf": "Text1\nText2\nText3\n\n\f"
 }
 
+raw_test_strings = {
+    "simple1.pdf": "Hello World\nHello World\nHello World\n"
+                   "H e l l o  W o r l d\n\f",
+    "simple3.pdf": "HelloHelloあいうえおあいうえおWorldWorld\n\f",
+    "simple4.pdf": "Text1\nText2\nText3\n\f",
+}
+
 
 class TestExtractText(unittest.TestCase):
     def test_simple1_with_string(self):
@@ -60,6 +76,19 @@ class TestExtractText(unittest.TestCase):
         s = run_with_string(test_file)
         self.assertEqual(s, test_strings[test_file])
 
+    def test_simple1_incremental(self):
+        test_file = "simple1.pdf"
+        s = run_with_string(test_file, laparams={"incremental": True})
+        self.assertEqual(s, test_strings[test_file])
+
+    def test_simple3_incremental(self):
+        test_file = "simple3.pdf"
+        s = run_with_string(test_file, laparams={"incremental": True,
+                                                 "detect_vertical": True})
+        expected = run_with_string(test_file,
+                                   laparams={"detect_vertical": True})
+        self.assertEqual(s, expected)
+
     def test_simple1_with_file(self):
         test_file = "simple1.pdf"
         s = run_with_file(test_file)
@@ -80,6 +109,18 @@ class TestExtractText(unittest.TestCase):
         s = run_with_file(test_file)
         self.assertEqual(s, test_strings[test_file])
 
+    def test_simple1_raw(self):
+        test_file = "simple1.pdf"
+        self.assertEqual(run_raw(test_file), raw_test_strings[test_file])
+
+    def test_simple3_raw(self):
+        test_file = "simple3.pdf"
+        self.assertEqual(run_raw(test_file), raw_test_strings[test_file])
+
+    def test_simple4_raw(self):
+        test_file = "simple4.pdf"
+        self.assertEqual(run_raw(test_file), raw_test_strings[test_file])
+
 
 class TestExtractPages(unittest.TestCase):
     def _get_test_file_path(self):
@@ -1,12 +1,20 @@
+import heapq
 import unittest
+from random import Random
 
 from pdfminer.layout import (
+    LTChar,
+    LTComponent,
     LTLayoutContainer,
     LAParams,
+    LTTextBoxHorizontal,
+    LTTextGroup,
+    LTTextGroupLRTB,
     LTTextLineHorizontal,
     LTTextLineVertical,
+    TextLineGrouper,
 )
-from pdfminer.utils import Plane
+from pdfminer.utils import Plane, translate_matrix
 
 
 class TestGroupTextLines(unittest.TestCase):
@@ -109,3 +117,147 @@ class TestFindNeigbors(unittest.TestCase):
                 centrally_aligned_overlapping,
             ],
         )
+
+
+class TestGroupTextBoxes(unittest.TestCase):
+    @staticmethod
+    def _merge_all_pairs(boxes):
+        """Reference implementation using a heap with all pair distances"""
+        def dist(obj1, obj2):
+            x0 = min(obj1.x0, obj2.x0)
+            y0 = min(obj1.y0, obj2.y0)
+            x1 = max(obj1.x1, obj2.x1)
+            y1 = max(obj1.y1, obj2.y1)
+            return (x1 - x0) * (y1 - y0) \
+                - obj1.width*obj1.height - obj2.width*obj2.height
+
+        dists = [(dist(obj1, obj2), id(obj1), id(obj2), obj1, obj2)
+                 for (i, obj1) in enumerate(boxes)
+                 for obj2 in boxes[i+1:]]
+        heapq.heapify(dists)
+        objs = list(boxes)
+        done = set()
+        merges = []
+        while dists:
+            (_, id1, id2, obj1, obj2) = heapq.heappop(dists)
+            if id1 in done or id2 in done:
+                continue
+            done.update([id1, id2])
+            group = LTTextGroupLRTB([obj1, obj2])
+            merges.append((obj1, obj2))
+            objs = [obj for obj in objs if id(obj) not in done]
+            for other in objs:
+                heapq.heappush(dists, (dist(group, other), id(group),
+                                       id(other), group, other))
+            objs.append(group)
+        return merges
+
+    @staticmethod
+    def _get_merges(group):
+        merges = []
+
+        def walk(obj):
+            if isinstance(obj, LTTextGroup):
+                (obj1, obj2) = obj
+                walk(obj1)
+                walk(obj2)
+                merges.append((obj1, obj2))
+        walk(group)
+        return merges
+
+    def test_merges_closest_pairs_first(self):
+        laparams = LAParams()
+        random = Random(0)
+        boxes = []
+        for _ in range(60):
+            box = LTTextBoxHorizontal()
+            (x, y) = (random.uniform(0, 500), random.uniform(0, 700))
+            box.set_bbox((x, y, x + random.uniform(1, 200),
+                          y + random.uniform(1, 40)))
+            boxes.append(box)
+        layout = LTLayoutContainer((0, 0, 600, 600))
+
+        groups = layout.group_textboxes(laparams, boxes)
+
+        self.assertEqual(len(groups), 1)
+        expected = self._merge_all_pairs(boxes)
+        actual = self._get_merges(groups[0])
+        self.assertEqual(len(actual), len(expected))
+        for ((a1, a2), (e1, e2)) in zip(sorted(actual, key=self._pair_key),
+                                        sorted(expected, key=self._pair_key)):
+            self.assertEqual(a1.bbox, e1.bbox)
+            self.assertEqual(a2.bbox, e2.bbox)
+
+    @staticmethod
+    def _pair_key(pair):
+        (obj1, obj2) = pair
+        return (obj1.bbox, obj2.bbox)
+
+    def test_single_box_is_returned(self):
+        box = LTTextBoxHorizontal()
+        box.set_bbox((0, 0, 10, 10))
+        layout = LTLayoutContainer((0, 0, 50, 50))
+
+        groups = layout.group_textboxes(LAParams(), [box])
+
+        self.assertEqual(groups, [box])
+
+
+class TestTextLineGrouper(unittest.TestCase):
+    @staticmethod
+    def _get_char(bbox):
+        char = LTComponent(bbox)
+        char.is_compatible = lambda obj: True
+        return char
+
+    def test_same_lines_as_group_objects(self):
+        laparams = LAParams()
+        chars = [self._get_char((x, y, x + 5, y + 10))
+                 for y in (0, 20) for x in (0, 5, 10, 100)]
+        layout = LTLayoutContainer((0, 0, 200, 200))
+
+        grouper = TextLineGrouper(laparams)
+        lines = []
+        for char in chars:
+            lines.extend(grouper.feed(char))
+        lines.extend(grouper.flush())
+
+        expected = list(layout.group_objects(laparams, chars))
+        self.assertEqual([line.bbox for line in lines],
+                         [line.bbox for line in expected])
+        self.assertEqual([line.bbox for line in lines],
+                         [(0, 0, 15, 10), (100, 0, 105, 10),
+                          (0, 20, 15, 30), (100, 20, 105, 30)])
+
+    def test_flush_without_objects(self):
+        grouper = TextLineGrouper(LAParams())
+        self.assertEqual(grouper.flush(), [])
+
+
+class FakeFont:
+    fontname = 'FakeFont'
+
+    def is_vertical(self):
+        return False
+
+    def get_descent(self):
+        return -0.2
+
+
+class TestCreateHorizontalRun(unittest.TestCase):
+    def test_same_as_ltchar(self):
+        font = FakeFont()
+        glyphs = [(0, 'a', 0.5), (6.5, 'b', 0.25), (10, ' ', 0.3)]
+        for matrix in [(1, 0, 0, 1, 10, 20), (0, 1, -1, 0, 5, 7),
+                       (-2, 0, 0.5, -1, 3, 4)]:
+            chars = LTChar.create_horizontal_run(
+                matrix, font, 12, 1.1, 2, 3, glyphs, None, None)
+            for ((x, text, textwidth), char) in zip(glyphs, chars):
+                expected = LTChar(translate_matrix(matrix, (x, 3)), font, 12,
+                                  1.1, 2, text, textwidth, None, None, None)
+                self.assertEqual(char.bbox, expected.bbox)
+                self.assertEqual(char.matrix, expected.matrix)
+                self.assertEqual(char.get_text(), text)
+                self.assertEqual(char.adv, expected.adv)
+                self.assertEqual(char.upright, expected.upright)
+                self.assertEqual(char.size, expected.size)
@@ -1,9 +1,50 @@
-from nose.tools import raises
+from io import BytesIO
 
+from nose.tools import assert_equal, assert_false, assert_true, raises
+
+from benchmarks import synthetic
 from helpers import absolute_sample_path
-from pdfminer.pdfdocument import PDFDocument
-from pdfminer.pdfparser import PDFParser
-from pdfminer.pdftypes import PDFObjectNotFound
+from pdfminer.pdfdocument import PDFDocument, PDFObjStm, PDFXRefFallback
+from pdfminer.pdfparser import PDFParser, PDFSyntaxError
+from pdfminer.pdfstats import PDFStats
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdftypes import PDFException, PDFObjectNotFound, PDFStream
+from pdfminer.psparser import LIT
+
+
+def damage_offsets(data, objids):
+    """Move the xref offsets of some objects into the header"""
+    (head, table) = data.split(b'\nxref\n', 1)
+    lines = table.split(b'\n')
+    for objid in objids:
+        # lines[0] is the subsection header, lines[1] is object 0
+        lines[objid + 1] = b'0000000003' + lines[objid + 1][10:]
+    return head + b'\nxref\n' + b'\n'.join(lines)
+
+
+def make_pdf(*objs):
+    """Return a PDF document with a valid xref and the given objects"""
+    out = [b'%PDF-1.4\n']
+    offsets = []
+    for (objid, body) in enumerate(objs, 1):
+        offsets.append(sum(map(len, out)))
+        out.append(b'%d 0 obj\n%s\nendobj\n' % (objid, body))
+    pos = sum(map(len, out))
+    out.append(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objs) + 1))
+    out.extend(b'%010d 00000 n \n' % offset for offset in offsets)
+    out.append(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n'
+               b'%%%%EOF\n' % (len(objs) + 1, pos))
+    return b''.join(out)
+
+
+def get_stream(body, *objs, lazy_streams=False):
+    data = make_pdf(b'<< /Type /Catalog >>', body, *objs)
+    parser = PDFParser(BytesIO(data), lazy_streams=lazy_streams)
+    return PDFDocument(parser).getobj(2)
+
+
+def has_fallback(doc):
+    return any(isinstance(xref, PDFXRefFallback) for xref in doc.xrefs)
 
 
 class TestPdfDocument(object):
@@ -14,3 +55,311 @@ class TestPdfDocument(object):
             parser = PDFParser(in_file)
             doc = PDFDocument(parser)
             doc.getobj(0)
+
+    def test_valid_xref_does_not_scan_file(self):
+        doc = PDFDocument(PDFParser(BytesIO(synthetic.make_pdf(2))))
+        assert_true(doc.check_xrefs())
+        assert_false(has_fallback(doc))
+        assert_equal(len(list(PDFPage.create_pages(doc))), 2)
+        assert_false(has_fallback(doc))
+
+    def test_damaged_xref_loads_fallback(self):
+        data = damage_offsets(synthetic.make_pdf(2), [1])
+        doc = PDFDocument(PDFParser(BytesIO(data)))
+        assert_true(has_fallback(doc))
+        assert_equal(len(list(PDFPage.create_pages(doc))), 2)
+
+    def test_fallback_is_loaded_on_failed_lookup(self):
+        # Object 6, the contents of the second page, is not spot-checked.
+        data = damage_offsets(synthetic.make_pdf(2), [6])
+        doc = PDFDocument(PDFParser(BytesIO(data)))
+        assert_false(has_fallback(doc))
+        assert_true(isinstance(doc.getobj(6), PDFStream))
+        assert_true(has_fallback(doc))
+
+    def test_fallback_disabled(self):
+        data = damage_offsets(synthetic.make_pdf(2), [6])
+        doc = PDFDocument(PDFParser(BytesIO(data)), fallback=False)
+        assert_equal(doc.load_fallback(), None)
+        try:
+            doc.getobj(6)
+        except PDFObjectNotFound:
+            pass
+        else:
+            raise AssertionError('object 6 was found')
+
+
+class TestStreams(object):
+
+    def test_read_length(self):
+        data = b'\r\nbinary\rendstream\nend\n\n'
+        strm = get_stream(b'<< /Length %d >>\nstream\n%s\nendstream'
+                          % (len(data), data))
+        assert_equal(strm.get_data(), data)
+
+    def test_read_indirect_length(self):
+        strm = get_stream(b'<< /Length 3 0 R >>\nstream\nabc\r\nendstream',
+                          b'3')
+        assert_equal(strm.get_data(), b'abc')
+
+    def test_wrong_length_reads_until_endstream(self):
+        for length in (b'2', b'20', b'-1', b'/None', b'4 0 R'):
+            strm = get_stream(b'<< /Length %s >>\nstream\nabc\n'
+                              b'def\nendstream' % length)
+            assert_equal(strm.get_data(), b'abc\ndef\n')
+        # The indirect length is a malformed object.
+        strm = get_stream(b'<< /Length 3 0 R >>\nstream\nabc\n'
+                          b'def\nendstream', b'<< /Key >>')
+        assert_equal(strm.get_data(), b'abc\ndef\n')
+
+    def test_length_of_itself_reads_until_endstream(self):
+        data = make_pdf(b'<< /Type /Catalog >>',
+                        b'<< /Length 2 0 R >>\nstream\nBT ET\nendstream')
+        for caching in (True, False):
+            for lazy_streams in (True, False):
+                parser = PDFParser(BytesIO(data), lazy_streams=lazy_streams)
+                doc = PDFDocument(parser, caching=caching)
+                assert_equal(doc.getobj(2).get_data(), b'BT ET\n')
+
+    def test_missing_length_reads_until_endstream(self):
+        strm = get_stream(b'<<>>\nstream\nabc\nendstream')
+        assert_equal(strm.get_data(), b'abc\n')
+
+    def test_data_is_read_when_needed(self):
+        strm = get_stream(b'<< /Length 3 >>\nstream\nabc\nendstream',
+                          lazy_streams=True)
+        assert_equal(strm.rawdata, None)
+        assert_equal(strm.get_rawdata(), b'abc')
+        assert_equal(strm.get_data(), b'abc')
+
+    def test_release(self):
+        strm = get_stream(b'<< /Length 3 >>\nstream\nabc\nendstream',
+                          lazy_streams=True)
+        assert_equal(strm.get_data(), b'abc')
+        strm.release()
+        assert_equal((strm.rawdata, strm.data), (None, None))
+        assert_equal(strm.get_data(), b'abc')
+
+    def test_release_keeps_data_not_in_file(self):
+        strm = PDFStream({}, b'abc')
+        strm.release()
+        assert_equal(strm.get_data(), b'abc')
+        strm = get_stream(b'<< /Length 3 >>\nstream\nabc\nendstream')
+        strm.release()
+        assert_equal(strm.get_data(), b'abc')
+
+    def test_data_after_file_is_closed(self):
+        data = make_pdf(b'<< /Type /Catalog >>',
+                        b'<< /Length 3 >>\nstream\nabc\nendstream')
+        with BytesIO(data) as fp:
+            strm = PDFDocument(PDFParser(fp)).getobj(2)
+        assert_equal(strm.get_data(), b'abc')
+
+    @raises(PDFException)
+    def test_lazy_data_after_file_is_closed(self):
+        data = make_pdf(b'<< /Type /Catalog >>',
+                        b'<< /Length 3 >>\nstream\nabc\nendstream')
+        with BytesIO(data) as fp:
+            parser = PDFParser(fp, lazy_streams=True)
+            strm = PDFDocument(parser).getobj(2)
+        strm.get_data()
+
+    def test_reading_data_keeps_file_position(self):
+        data = make_pdf(b'<< /Type /Catalog >>',
+                        b'<< /Length 3 >>\nstream\nabc\nendstream',
+                        b'(def)')
+        fp = BytesIO(data)
+        doc = PDFDocument(PDFParser(fp, lazy_streams=True))
+        strm = doc.getobj(2)
+        fp.seek(7)
+        assert_equal(strm.get_data(), b'abc')
+        assert_equal(fp.tell(), 7)
+        assert_equal(doc.getobj(3), b'def')
+
+
+OBJSTM_HEADER = b'10 0 11 9 12 17\n'
+OBJSTM_OBJECTS = b'(string) [1 2 3] << /Key /Value >>'
+
+
+def make_objstm_pdf():
+    """Return a document without xrefs with the objects in a stream"""
+    return (b'%%PDF-1.5\n1 0 obj << /Type /Catalog >> endobj\n'
+            b'2 0 obj << /Type /ObjStm /N 3 /First %d /Length %d >>\n'
+            b'stream\n%s%s\nendstream endobj\n'
+            b'trailer << /Root 1 0 R >>\n%%%%EOF\n'
+            % (len(OBJSTM_HEADER),
+               len(OBJSTM_HEADER) + len(OBJSTM_OBJECTS),
+               OBJSTM_HEADER, OBJSTM_OBJECTS))
+
+
+def make_objstm(n=3, first=len(OBJSTM_HEADER)):
+    attrs = {'Type': LIT('ObjStm'), 'N': n, 'First': first}
+    return PDFObjStm(PDFStream(attrs, OBJSTM_HEADER + OBJSTM_OBJECTS))
+
+
+class TestObjStm(object):
+
+    def test_get_object(self):
+        objstm = make_objstm()
+        assert_equal(objstm.get_objids(), [10, 11, 12])
+        assert_equal(objstm.get_object(2), {'Key': LIT('Value')})
+        assert_equal(objstm.get_object(0), b'string')
+        assert_equal(objstm.get_object(1), [1, 2, 3])
+
+    @raises(PDFSyntaxError)
+    def test_index_too_big(self):
+        make_objstm().get_object(3)
+
+    def test_invalid_header_parses_all_objects(self):
+        objstm = make_objstm(first=1000)
+        assert_equal(objstm.get_objids(), [10, 11, 12])
+        assert_equal(objstm.get_object(1), [1, 2, 3])
+
+    def test_document_without_caching(self):
+        doc = PDFDocument(PDFParser(BytesIO(make_objstm_pdf())),
+                          caching=False)
+        assert_equal(doc.getobj(11), [1, 2, 3])
+        assert_equal(doc.getobj(12), {'Key': LIT('Value')})
+
+    def test_document_without_caching_reads_header_once(self):
+        stats = PDFStats()
+        doc = PDFDocument(PDFParser(BytesIO(make_objstm_pdf())),
+                          caching=False, stats=stats)
+        for _ in range(3):
+            assert_equal(doc.getobj(11), [1, 2, 3])
+            assert_equal(doc.getobj(12), {'Key': LIT('Value')})
+        assert_equal(stats.counts['cache.objstms.miss'], 1)
+        assert_equal(stats.counts['cache.objstms.hit'], 5)
+
+    def test_document_without_caching_keeps_few_objstms(self):
+        stats = PDFStats()
+        doc = PDFDocument(PDFParser(BytesIO(make_objstm_pdf())),
+                          caching=False, stats=stats)
+        doc.MAX_OBJSTMS = 0
+        for _ in range(3):
+            assert_equal(doc.getobj(11), [1, 2, 3])
+        assert_equal(stats.counts['cache.objstms.miss'], 3)
+        assert_equal(len(doc._parsed_objs), 0)
+
+
+def make_xref_pdf(eols, subsections=((0, 4),)):
+    """Return a document with the xref entries ending with the eols"""
+    head = b'%PDF-1.4\n'
+    objs = b'1 0 obj << /Type /Catalog >> endobj\n'
+    eols = iter(eols)
+    xref = [b'xref\n']
+    for (start, nobjs) in subsections:
+        xref.append(b'%d %d\n' % (start, nobjs))
+        for objid in range(start, start + nobjs):
+            if objid == 0:
+                xref.append(b'0000000000 65535 f' + next(eols))
+            else:
+                xref.append(b'%010d %05d n' % (len(head) + objid - 1, objid)
+                            + next(eols))
+    return (head + objs + b''.join(xref)
+            + b'trailer\n<< /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+            % (len(head) + len(objs)))
+
+
+class TestXRef(object):
+
+    def get_offsets(self, data):
+        doc = PDFDocument(PDFParser(BytesIO(data)), fallback=False)
+        return doc.xrefs[0].offsets
+
+    def test_entry_lengths(self):
+        expected = {1: (None, 9, 1), 2: (None, 10, 2), 3: (None, 11, 3)}
+        for eol in (b' \n', b' \r', b'\r\n', b'\n', b'\r', b'\r\r\n'):
+            data = make_xref_pdf([eol] * 4)
+            assert_equal(self.get_offsets(data), expected)
+
+    def test_mixed_entry_lengths(self):
+        data = make_xref_pdf([b'\n', b' \n', b'\r\n', b'\n'])
+        assert_equal(self.get_offsets(data),
+                     {1: (None, 9, 1), 2: (None, 10, 2), 3: (None, 11, 3)})
+
+    def test_subsections(self):
+        data = make_xref_pdf([b' \n'] * 4, ((0, 2), (5, 2)))
+        assert_equal(self.get_offsets(data),
+                     {1: (None, 9, 1), 5: (None, 13, 5), 6: (None, 14, 6)})
+
+
+def make_xref_stream_pdf():
+    """Return a document with an xref stream with two /Index ranges, in
+    which objects 0 and 11 are free"""
+    out = [b'%PDF-1.5\n']
+    offsets = {}
+    for (objid, body) in ((1, b'<< /Type /Catalog >>'), (2, b'(two)'),
+                          (10, b'(ten)')):
+        offsets[objid] = sum(map(len, out))
+        out.append(b'%d 0 obj %s endobj\n' % (objid, body))
+    pos = sum(map(len, out))
+    entries = [(0, 0, 65535), (1, offsets[1], 0), (1, offsets[2], 0),
+               (1, offsets[10], 0), (0, 0, 0), (1, pos, 0)]
+    data = b''.join(bytes([f1]) + f2.to_bytes(4, 'big') + f3.to_bytes(2, 'big')
+                    for (f1, f2, f3) in entries)
+    out.append(b'12 0 obj << /Type /XRef /Size 13 /Index [0 3 10 3] '
+               b'/W [1 4 2] /Root 1 0 R /Length %d >>\nstream\n' % len(data))
+    out.append(data + b'\nendstream\nendobj\nstartxref\n%d\n%%%%EOF\n' % pos)
+    return b''.join(out)
+
+
+class TestXRefStream(object):
+
+    def test_index_ranges(self):
+        doc = PDFDocument(PDFParser(BytesIO(make_xref_stream_pdf())))
+        assert_false(has_fallback(doc))
+        assert_equal(list(doc.xrefs[0].get_objids()), [1, 2, 10, 12])
+        assert_equal(doc.getobj(2), b'two')
+        assert_equal(doc.getobj(10), b'ten')
+
+    def test_offsets(self):
+        doc = PDFDocument(PDFParser(BytesIO(make_xref_stream_pdf())))
+        xref = doc.xrefs[0]
+        offsets = xref.get_offsets()
+        assert_equal(sorted(offsets), [1, 2, 10, 12])
+        for (objid, pos) in offsets.items():
+            assert_equal(xref.get_pos(objid), pos)
+
+
+def make_revisions(nrevs, prev_loop=False):
+    """Return a document with nrevs incremental updates, each of which
+    changes object 2"""
+    out = [b'%PDF-1.4\n1 0 obj << /Type /Catalog >> endobj\n']
+    prev = None
+    for rev in range(nrevs):
+        obj = b'2 0 obj (rev %d) endobj\n' % rev
+        pos = sum(map(len, out)) + len(obj)
+        if prev is None:
+            entries = b'1 2\n0000000009 00000 n \n'
+        else:
+            entries = b'2 1\n'
+        entries += b'%010d 00000 n \n' % (pos - len(obj))
+        if prev is not None or prev_loop:
+            trailer = b'<< /Root 1 0 R /Prev %d >>' % (prev or pos)
+        else:
+            trailer = b'<< /Root 1 0 R >>'
+        out.append(obj + b'xref\n' + entries + b'trailer\n' + trailer
+                   + b'\nstartxref\n%d\n%%%%EOF\n' % pos)
+        prev = pos
+    return b''.join(out)
+
+
+class TestRevisions(object):
+
+    def test_newest_revision(self):
+        doc = PDFDocument(PDFParser(BytesIO(make_revisions(3))))
+        assert_equal(len(doc.xrefs), 3)
+        assert_equal(doc.getobj(2), b'rev 2')
+
+    def test_many_revisions(self):
+        doc = PDFDocument(PDFParser(BytesIO(make_revisions(2000))))
+        assert_equal(len(doc.xrefs), 2000)
+        assert_equal(doc.getobj(2), b'rev 1999')
+        assert_false(has_fallback(doc))
+
+    def test_prev_loop(self):
+        data = make_revisions(1, prev_loop=True)
+        doc = PDFDocument(PDFParser(BytesIO(data)))
+        assert_equal(len(doc.xrefs), 1)
+        assert_equal(doc.getobj(2), b'rev 0')
@@ -19,3 +19,13 @@ def test_get_cmap_from_pickle():
 
     assert_equal(cmap.attrs.get('CMapName'), cmap_name)
     assert_greater(len(cmap.code2cid), 0)
+
+
+def test_get_glyph_is_memoized():
+    spec = {'Encoding': PSLiteral('Identity-H')}
+    font = PDFCIDFont(PDFResourceManager(), spec)
+
+    glyph = font.get_glyph(65)
+
+    assert_equal(glyph, (None, font.char_width(65), font.char_disp(65)))
+    assert font.get_glyph(65) is glyph
@@ -0,0 +1,501 @@
+import os
+import pickle
+import tempfile
+import unittest
+from io import BytesIO
+
+from helpers import absolute_sample_path
+from pdfminer.converter import PDFPageAggregator
+from pdfminer.high_level import extract_pages
+from pdfminer.layout import LAParams, LTChar, LTCurve, LTFigure
+from pdfminer.pdfinterp import PDFContentParser, PDFPageInterpreter, \
+    PDFPageLimitExceeded, PDFPageLimits, PDFProgramCache, \
+    PDFResourceManager, remove_graphics
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfstats import PDFStats
+from pdfminer.pdftypes import PDFStream
+from pdfminer.psparser import KWD, LIT
+
+
+# A page that draws text and then a Form XObject that draws itself.
+RECURSIVE_FORM_PDF = b'''%PDF-1.4
+1 0 obj << /Type /Catalog /Pages 2 0 R >> endobj
+2 0 obj << /Type /Pages /Kids [3 0 R] /Count 1 >> endobj
+3 0 obj << /Type /Page /Parent 2 0 R /MediaBox [0 0 200 200]
+/Resources << /Font << /F1 4 0 R >> /XObject << /X1 5 0 R >> >>
+/Contents 6 0 R >> endobj
+4 0 obj << /Type /Font /Subtype /Type1 /BaseFont /Helvetica >> endobj
+5 0 obj << /Type /XObject /Subtype /Form /BBox [0 0 200 200]
+/Resources << /XObject << /X1 5 0 R >> >> /Length 6 >>
+stream
+/X1 Do
+endstream endobj
+6 0 obj << /Length 42 >>
+stream
+BT /F1 12 Tf 10 10 Td (Hello) Tj ET /X1 Do
+endstream endobj
+trailer << /Root 1 0 R >>
+%%EOF
+'''
+
+
+# A page that draws the same Form XObject twice at different positions.
+REPEATED_FORM_PDF = b'''%PDF-1.4
+1 0 obj << /Type /Catalog /Pages 2 0 R >> endobj
+2 0 obj << /Type /Pages /Kids [3 0 R] /Count 1 >> endobj
+3 0 obj << /Type /Page /Parent 2 0 R /MediaBox [0 0 200 200]
+/Resources << /XObject << /X1 5 0 R >> >> /Contents 6 0 R >> endobj
+4 0 obj << /Type /Font /Subtype /Type1 /BaseFont /Helvetica >> endobj
+5 0 obj << /Type /XObject /Subtype /Form /BBox [0 0 200 200]
+/Resources << /Font << /F1 4 0 R >> >> /Length 35 >>
+stream
+BT /F1 12 Tf 10 10 Td (Hello) Tj ET
+endstream endobj
+6 0 obj << /Length 34 >>
+stream
+/X1 Do q 1 0 0 1 50 50 cm /X1 Do Q
+endstream endobj
+trailer << /Root 1 0 R >>
+%%EOF
+'''
+
+
+# A page that changes the color of the text between q and Q.
+SAVED_STATE_PDF = b'''%PDF-1.4
+1 0 obj << /Type /Catalog /Pages 2 0 R >> endobj
+2 0 obj << /Type /Pages /Kids [3 0 R] /Count 1 >> endobj
+3 0 obj << /Type /Page /Parent 2 0 R /MediaBox [0 0 200 200]
+/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >> endobj
+4 0 obj << /Type /Font /Subtype /Type1 /BaseFont /Helvetica >> endobj
+5 0 obj << /Length 97 >>
+stream
+0 0 1 rg BT /F1 12 Tf 10 10 Td (A) Tj ET
+q 1 0 0 rg BT 10 30 Td (B) Tj ET Q
+BT 10 50 Td (C) Tj ET
+endstream endobj
+trailer << /Root 1 0 R >>
+%%EOF
+'''
+
+
+# Two pages that share a Resources object and two pages with equal direct
+# Resources dictionaries.
+SHARED_RESOURCES_PDF = b'''%PDF-1.4
+1 0 obj << /Type /Catalog /Pages 2 0 R >> endobj
+2 0 obj << /Type /Pages /Kids [3 0 R 4 0 R 7 0 R 8 0 R] /Count 4 >> endobj
+3 0 obj << /Type /Page /Parent 2 0 R /MediaBox [0 0 200 200]
+/Resources 5 0 R /Contents 9 0 R >> endobj
+4 0 obj << /Type /Page /Parent 2 0 R /MediaBox [0 0 200 200]
+/Resources 5 0 R /Contents 9 0 R >> endobj
+5 0 obj << /Font << /F1 6 0 R >> >> endobj
+6 0 obj << /Type /Font /Subtype /Type1 /BaseFont /Helvetica >> endobj
+7 0 obj << /Type /Page /Parent 2 0 R /MediaBox [0 0 200 200]
+/Resources << /Font << /F1 6 0 R >> /ProcSet [/PDF /Text] >>
+/Contents 9 0 R >> endobj
+8 0 obj << /Type /Page /Parent 2 0 R /MediaBox [0 0 200 200]
+/Resources << /Font << /F1 6 0 R >> /ProcSet [/PDF /Text] >>
+/Contents 9 0 R >> endobj
+9 0 obj << /Length 34 >>
+stream
+BT /F1 12 Tf 10 10 Td (Hello) Tj ET
+endstream endobj
+trailer << /Root 1 0 R >>
+%%EOF
+'''
+
+
+def get_chars(item):
+    if isinstance(item, LTChar):
+        yield item
+    elif hasattr(item, '__iter__'):
+        for child in item:
+            yield from get_chars(child)
+
+
+def get_depth(item):
+    depths = [get_depth(child) for child in item
+              if isinstance(child, LTFigure)]
+    return 1 + max(depths, default=0)
+
+
+class TestPDFPageLimits(unittest.TestCase):
+    def test_max_operators_raises(self):
+        limits = PDFPageLimits(max_operators=5)
+        path = absolute_sample_path('simple1.pdf')
+        with self.assertRaises(PDFPageLimitExceeded) as cm:
+            list(extract_pages(path, limits=limits))
+        self.assertEqual(cm.exception.limit, 'operators')
+        self.assertEqual(cm.exception.maximum, 5)
+
+    def test_max_chars_partial(self):
+        path = absolute_sample_path('simple1.pdf')
+        (page,) = extract_pages(path)
+        limits = PDFPageLimits(max_chars=10, partial=True)
+        with self.assertLogs('pdfminer.pdfinterp', level='WARNING'):
+            (partial_page,) = extract_pages(path, limits=limits)
+        self.assertLess(len(list(get_chars(partial_page))),
+                        len(list(get_chars(page))))
+
+    def test_timeout(self):
+        limits = PDFPageLimits(timeout=0)
+        path = absolute_sample_path('simple1.pdf')
+        with self.assertRaises(PDFPageLimitExceeded) as cm:
+            list(extract_pages(path, limits=limits))
+        self.assertEqual(cm.exception.limit, 'time')
+
+    def test_max_decoded_bytes(self):
+        limits = PDFPageLimits(max_decoded_bytes=10)
+        with self.assertRaises(PDFPageLimitExceeded) as cm:
+            list(extract_pages(BytesIO(RECURSIVE_FORM_PDF), limits=limits))
+        self.assertEqual(cm.exception.limit, 'decoded_bytes')
+
+    def test_recursive_form_max_depth(self):
+        limits = PDFPageLimits(max_depth=3)
+        with self.assertRaises(PDFPageLimitExceeded) as cm:
+            list(extract_pages(BytesIO(RECURSIVE_FORM_PDF), limits=limits))
+        self.assertEqual(cm.exception.limit, 'depth')
+
+    def test_recursive_form_partial(self):
+        limits = PDFPageLimits(max_depth=3, partial=True)
+        with self.assertLogs('pdfminer.pdfinterp', level='WARNING'):
+            (page,) = extract_pages(BytesIO(RECURSIVE_FORM_PDF),
+                                    limits=limits)
+        self.assertEqual(len(list(get_chars(page))), 5)
+        self.assertEqual(get_depth(page), 4)
+
+    def test_device_is_consistent_after_exceeded_limit(self):
+        rsrcmgr = PDFResourceManager()
+        device = PDFPageAggregator(rsrcmgr, laparams=LAParams())
+        interpreter = PDFPageInterpreter(rsrcmgr, device,
+                                         limits=PDFPageLimits(max_depth=3))
+        (page,) = PDFPage.get_pages(BytesIO(RECURSIVE_FORM_PDF))
+        with self.assertRaises(PDFPageLimitExceeded):
+            interpreter.process_page(page)
+        interpreter.limits = PDFPageLimits(max_depth=3, partial=True)
+        with self.assertLogs('pdfminer.pdfinterp', level='WARNING'):
+            interpreter.process_page(page)
+        self.assertEqual(len(list(get_chars(device.get_result()))), 5)
+
+
+class TestFormCache(unittest.TestCase):
+    def get_page(self, caching):
+        stats = PDFStats()
+        rsrcmgr = PDFResourceManager(caching=caching)
+        device = PDFPageAggregator(rsrcmgr, laparams=LAParams())
+        interpreter = PDFPageInterpreter(rsrcmgr, device, stats=stats)
+        (page,) = PDFPage.get_pages(BytesIO(REPEATED_FORM_PDF))
+        interpreter.process_page(page)
+        return (device.get_result(), stats)
+
+    def test_repeated_form_is_parsed_once(self):
+        (_, stats) = self.get_page(caching=True)
+        self.assertEqual(stats.counts['cache.forms.miss'], 1)
+        self.assertEqual(stats.counts['cache.forms.hit'], 1)
+
+    def test_repeated_form_output(self):
+        (cached, _) = self.get_page(caching=True)
+        (uncached, stats) = self.get_page(caching=False)
+        self.assertEqual(stats.counts['cache.forms.hit'], 0)
+        chars = [(c.get_text(), c.bbox) for c in get_chars(cached)]
+        self.assertEqual(chars,
+                         [(c.get_text(), c.bbox) for c in get_chars(uncached)])
+        self.assertEqual(len(chars), 10)
+        self.assertEqual(chars[5][1][0] - chars[0][1][0], 50)
+
+    def test_cache_is_cleared_for_another_document(self):
+        rsrcmgr = PDFResourceManager()
+        device = PDFPageAggregator(rsrcmgr, laparams=None)
+        interpreter = PDFPageInterpreter(rsrcmgr, device)
+        docs = []
+        for _ in range(2):
+            (page,) = PDFPage.get_pages(BytesIO(REPEATED_FORM_PDF))
+            interpreter.process_page(page)
+            docs.append(page.doc)
+        self.assertEqual([doc for (doc, _) in interpreter.form_cache],
+                         [docs[1]])
+
+
+class TestGraphicState(unittest.TestCase):
+    def get_interpreter(self):
+        rsrcmgr = PDFResourceManager()
+        device = PDFPageAggregator(rsrcmgr, laparams=LAParams())
+        interpreter = PDFPageInterpreter(rsrcmgr, device)
+        interpreter.init_resources({})
+        interpreter.init_state((1, 0, 0, 1, 0, 0))
+        return interpreter
+
+    def test_save_does_not_copy(self):
+        interpreter = self.get_interpreter()
+        textstate = interpreter.textstate
+        graphicstate = interpreter.graphicstate
+        interpreter.do_q()
+        interpreter.do_q()
+        self.assertIs(interpreter.textstate, textstate)
+        self.assertIs(interpreter.graphicstate, graphicstate)
+        interpreter.do_Q()
+        interpreter.do_Q()
+        self.assertIs(interpreter.textstate, textstate)
+        self.assertIs(interpreter.graphicstate, graphicstate)
+
+    def test_change_copies_saved_state(self):
+        interpreter = self.get_interpreter()
+        interpreter.do_rg(0, 0, 1)
+        graphicstate = interpreter.graphicstate
+        interpreter.do_q()
+        interpreter.do_rg(1, 0, 0)
+        interpreter.do_w(2)
+        self.assertIsNot(interpreter.graphicstate, graphicstate)
+        self.assertEqual(interpreter.graphicstate.ncolor, (1, 0, 0))
+        self.assertEqual(graphicstate.ncolor, (0, 0, 1))
+        self.assertEqual(graphicstate.linewidth, 0)
+        interpreter.do_Q()
+        self.assertIs(interpreter.graphicstate, graphicstate)
+
+    def test_chars_keep_their_color(self):
+        rsrcmgr = PDFResourceManager()
+        device = PDFPageAggregator(rsrcmgr, laparams=None)
+        interpreter = PDFPageInterpreter(rsrcmgr, device)
+        (page,) = PDFPage.get_pages(BytesIO(SAVED_STATE_PDF))
+        interpreter.process_page(page)
+        chars = list(get_chars(device.get_result()))
+        self.assertEqual([(c.get_text(), c.graphicstate.ncolor)
+                          for c in chars],
+                         [('A', (0, 0, 1)), ('B', (1, 0, 0)),
+                          ('C', (0, 0, 1))])
+        self.assertEqual({c.fontname for c in chars}, {'Helvetica'})
+
+
+class TestInlineImage(unittest.TestCase):
+    def get_images(self, *streams):
+        parser = PDFContentParser([PDFStream({}, data) for data in streams])
+        return [(name, [(arg.attrs, arg.get_rawdata())
+                        if isinstance(arg, PDFStream) else arg
+                        for arg in args])
+                for (name, _, args) in parser.compile()]
+
+    def test_data(self):
+        self.assertEqual(self.get_images(b'BI /W 1 ID \x00EIx\r\nEI Q'),
+                         [('EI', [({'W': 1}, b'\x00EIx')]), ('Q', [])])
+        self.assertEqual(self.get_images(b'BI /W 1 ID EEI\nEI Q'),
+                         [('EI', [({'W': 1}, b'E')]), ('EI', []),
+                          ('Q', [])])
+
+    def test_only_one_eol_is_removed(self):
+        self.assertEqual(self.get_images(b'BI /W 1 ID a\n\n\nEI'),
+                         [('EI', [({'W': 1}, b'a\n\n')])])
+
+    def test_length(self):
+        self.assertEqual(self.get_images(b'BI /W 1 /L 5 ID EI EI\nEI Q'),
+                         [('EI', [({'W': 1, 'L': 5}, b'EI EI')]),
+                          ('Q', [])])
+        self.assertEqual(self.get_images(b'BI /W 1 ID EI EI\nEI Q'),
+                         [('EI', [({'W': 1}, b'')]), ('EI', []), ('EI', []),
+                          ('Q', [])])
+
+    def test_wrong_length(self):
+        self.assertEqual(self.get_images(b'BI /W 1 /L 4 ID ab\nEI Q'),
+                         [('EI', [({'W': 1, 'L': 4}, b'ab')]), ('Q', [])])
+
+    def test_next_stream(self):
+        self.assertEqual(self.get_images(b'BI /W 1 ID ab', b'cd\nEI Q'),
+                         [('EI', [({'W': 1}, b'abcd')]), ('Q', [])])
+
+    def test_length_in_next_stream(self):
+        self.assertEqual(self.get_images(b'BI /W 1 /L 4 ID ab', b'cd EI Q'),
+                         [('EI', [({'W': 1, 'L': 4}, b'abcd')]), ('Q', [])])
+        self.assertEqual(self.get_images(b'BI /W 1 /L 2 ID ab', b'EI Q'),
+                         [('EI', [({'W': 1, 'L': 2}, b'ab')]), ('Q', [])])
+
+
+class TestResourceCache(unittest.TestCase):
+    def render(self, caching=True, doc_caching=True):
+        stats = PDFStats()
+        rsrcmgr = PDFResourceManager(caching=caching)
+        device = PDFPageAggregator(rsrcmgr, laparams=None)
+        interpreter = PDFPageInterpreter(rsrcmgr, device, stats=stats)
+        fontmaps = []
+        for page in PDFPage.get_pages(BytesIO(SHARED_RESOURCES_PDF),
+                                      caching=doc_caching):
+            interpreter.process_page(page)
+            self.assertEqual(
+                [c.get_text() for c in get_chars(device.get_result())],
+                list('Hello'))
+            fontmaps.append(interpreter.fontmap)
+        return (fontmaps, stats)
+
+    def test_shared_resources(self):
+        (fontmaps, stats) = self.render()
+        self.assertEqual(stats.counts['cache.resources.miss'], 2)
+        self.assertEqual(stats.counts['cache.resources.hit'], 2)
+        self.assertIs(fontmaps[0], fontmaps[1])
+        self.assertIs(fontmaps[2], fontmaps[3])
+        self.assertIs(fontmaps[0]['F1'], fontmaps[2]['F1'])
+
+    def test_equal_resources(self):
+        (fontmaps, stats) = self.render(doc_caching=False)
+        self.assertEqual(stats.counts['cache.resources.miss'], 2)
+        self.assertEqual(stats.counts['cache.resources.hit'], 2)
+        self.assertIs(fontmaps[0], fontmaps[1])
+
+    def test_no_caching(self):
+        (fontmaps, stats) = self.render(caching=False)
+        self.assertEqual(stats.counts['cache.resources.miss'], 0)
+        self.assertEqual(stats.counts['cache.resources.hit'], 0)
+        self.assertIsNot(fontmaps[0], fontmaps[1])
+
+    def test_cache_is_cleared_for_another_document(self):
+        rsrcmgr = PDFResourceManager()
+        interpreter = PDFPageInterpreter(rsrcmgr, PDFPageAggregator(rsrcmgr))
+        for _ in range(2):
+            pages = list(PDFPage.get_pages(BytesIO(SHARED_RESOURCES_PDF)))
+            for page in pages:
+                interpreter.process_page(page)
+        # The entries of the shared and the direct resources by id and by
+        # content, of the second document only.
+        self.assertEqual(len(interpreter.resource_cache), 4)
+        for (resources, _, _, _) in interpreter.resource_cache.values():
+            self.assertIn(resources, [page.resources for page in pages])
+
+    def test_cache_size(self):
+        rsrcmgr = PDFResourceManager()
+        interpreter = PDFPageInterpreter(rsrcmgr, PDFPageAggregator(rsrcmgr))
+        interpreter.MAX_CACHED_RESOURCES = 10
+        for i in range(20):
+            interpreter.init_resources({'ProcSet': [i]})
+        self.assertLessEqual(len(interpreter.resource_cache), 10)
+
+    def test_dup(self):
+        rsrcmgr = PDFResourceManager()
+        interpreter = PDFPageInterpreter(rsrcmgr, PDFPageAggregator(rsrcmgr))
+        self.assertIs(interpreter.dup().resource_cache,
+                      interpreter.resource_cache)
+
+
+class TestReleaseContents(unittest.TestCase):
+    def get_page(self):
+        fp = BytesIO(SAVED_STATE_PDF)
+        (page,) = PDFPage.get_pages(fp, lazy_streams=True)
+        rsrcmgr = PDFResourceManager()
+        interpreter = PDFPageInterpreter(rsrcmgr, PDFPageAggregator(rsrcmgr))
+        return (page, interpreter)
+
+    def test_unread_contents_are_released(self):
+        (page, interpreter) = self.get_page()
+        interpreter.process_page(page)
+        (stream,) = page.contents
+        self.assertIsNone(stream.rawdata)
+        self.assertIsNone(stream.data)
+
+    def test_read_contents_are_kept(self):
+        (page, interpreter) = self.get_page()
+        (stream,) = page.contents
+        data = stream.get_data()
+        interpreter.process_page(page)
+        self.assertIs(stream.data, data)
+
+
+class TestPDFProgramCache(unittest.TestCase):
+    def render(self, programs, stats=None):
+        rsrcmgr = PDFResourceManager()
+        device = PDFPageAggregator(rsrcmgr, laparams=LAParams())
+        interpreter = PDFPageInterpreter(rsrcmgr, device, stats=stats,
+                                         programs=programs)
+        path = absolute_sample_path('simple1.pdf')
+        with open(path, 'rb') as fp:
+            for page in PDFPage.get_pages(fp):
+                interpreter.process_page(page)
+        return [(c.get_text(), c.bbox) for c in get_chars(device.get_result())]
+
+    def test_replay_from_memory(self):
+        programs = PDFProgramCache()
+        expected = self.render(None)
+        self.assertEqual(self.render(programs), expected)
+        self.assertEqual(len(programs), 1)
+        stats = PDFStats()
+        self.assertEqual(self.render(programs, stats), expected)
+        self.assertEqual(stats.counts['cache.programs.hit'], 1)
+        self.assertEqual(stats.counts['cache.programs.miss'], 0)
+
+    def test_replay_from_directory(self):
+        with tempfile.TemporaryDirectory() as directory:
+            expected = self.render(PDFProgramCache(directory))
+            programs = PDFProgramCache(directory)
+            stats = PDFStats()
+            self.assertEqual(self.render(programs, stats), expected)
+            self.assertEqual(stats.counts['cache.programs.hit'], 1)
+
+    def test_symbols_are_interned(self):
+        with tempfile.TemporaryDirectory() as directory:
+            program = [('Tf', 'do_Tf', (LIT('F1'), 12)),
+                       (None, None, ([KWD(b'foo')],))]
+            PDFProgramCache(directory).put('key', program)
+            loaded = PDFProgramCache(directory).get('key')
+        self.assertEqual(loaded, program)
+        self.assertIs(loaded[0][2][0], LIT('F1'))
+        self.assertIs(loaded[1][2][0][0], KWD(b'foo'))
+
+    def test_forbidden_globals(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, 'key.program'), 'wb') as fp:
+                pickle.dump([(os.system, ('true',))], fp)
+            with self.assertLogs('pdfminer.pdfinterp', level='WARNING'):
+                self.assertIsNone(PDFProgramCache(directory).get('key'))
+
+    def test_maxsize(self):
+        programs = PDFProgramCache(maxsize=2)
+        for key in ('a', 'b', 'c'):
+            programs.put(key, [])
+        self.assertIsNone(programs.get('a'))
+        self.assertEqual(programs.get('c'), [])
+
+
+class TestTextOnly(unittest.TestCase):
+    def render(self, text_only):
+        rsrcmgr = PDFResourceManager()
+        device = PDFPageAggregator(rsrcmgr, laparams=LAParams())
+        interpreter = PDFPageInterpreter(rsrcmgr, device, text_only=text_only)
+        path = absolute_sample_path('nonfree/dmca.pdf')
+        items = []
+        with open(path, 'rb') as fp:
+            for page in PDFPage.get_pages(fp):
+                interpreter.process_page(page)
+                items.extend(self.get_items(device.get_result()))
+        return items
+
+    def get_items(self, item):
+        yield item
+        if hasattr(item, '__iter__'):
+            for child in item:
+                yield from self.get_items(child)
+
+    def test_same_text_without_graphics(self):
+        items = self.render(text_only=False)
+        text_items = self.render(text_only=True)
+        self.assertTrue(any(isinstance(item, LTCurve) for item in items))
+        self.assertFalse(any(isinstance(item, LTCurve)
+                             for item in text_items))
+        self.assertEqual(
+            [(c.get_text(), c.bbox) for c in items if isinstance(c, LTChar)],
+            [(c.get_text(), c.bbox) for c in text_items
+             if isinstance(c, LTChar)])
+
+    def test_remove_graphics(self):
+        self.assertEqual(
+            remove_graphics(b'q 1 0 0 1 5 5 cm 0 0 1 rg 1 2 3 4 re f Q'),
+            b'q 1 0 0 1 5 5 cm  Q')
+        self.assertEqual(remove_graphics(b'1 2 m 3 4 l S/F1 1 Tf'),
+                         b' /F1 1 Tf')
+
+    def test_remove_graphics_keeps_strings(self):
+        self.assertEqual(remove_graphics(b'(1 2 m) Tj <4142> Tj % 1 2 m'),
+                         b'(1 2 m) Tj <4142> Tj % 1 2 m')
+        self.assertEqual(remove_graphics(b'(a(b)\\)) Tj 1 2 m'),
+                         b'(a(b)\\)) Tj  ')
+        self.assertEqual(remove_graphics(b'BI /W 1 ID \x00 1 m EI 1 m'),
+                         b'BI /W 1 ID \x00 1 m EI  ')
+
+    def test_remove_graphics_gives_up(self):
+        data = b'(a(b(c))) Tj 1 2 m'
+        self.assertIs(remove_graphics(data), data)
+        data = b'BI /W 1 ID \x00 1 m'
+        self.assertIs(remove_graphics(data), data)
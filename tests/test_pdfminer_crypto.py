@@ -46,6 +46,23 @@ class TestArcfour():
         assert_equal(hex(Arcfour(b'Secret').process(b'Attack at dawn')),
                      b'45a01f645fc35b383552544b9bf5')
 
+    def test_key_sizes(self):
+        """The keystreams are taken from RFC 6229, the 40 and 128 bit keys
+        are supported by the cryptography package"""
+        assert_equal(hex(Arcfour(dehex(b'0102030405')).process(bytes(16))),
+                     b'b2396305f03dc027ccc3524a0a1118a8')
+        key = dehex(b'0102030405060708090a0b0c0d0e0f10')
+        assert_equal(hex(Arcfour(key).process(bytes(16))),
+                     b'9ac7cc9a609d1ef7b2932899cde41b97')
+
+    def test_continued(self):
+        """The keystream continues over several calls"""
+        key = dehex(b'0102030405060708090a0b0c0d0e0f10')
+        arcfour = Arcfour(key)
+        data = arcfour.process(bytes(10)) + arcfour.process(bytes(14))
+        assert_equal(data, Arcfour(key).process(bytes(24)))
+        assert_equal(hex(data[16:]), b'5248c4959014126a')
+
 
 class TestLzw():
     def test_lzwdecode(self):
@@ -0,0 +1,51 @@
+import io
+import json
+import unittest
+
+from helpers import absolute_sample_path
+from pdfminer.high_level import extract_pages, extract_text
+from pdfminer.pdfstats import PDFStats
+
+
+class TestPDFStats(unittest.TestCase):
+    def test_nested_stage_is_excluded(self):
+        stats = PDFStats()
+        stats.start('outer')
+        stats.start('inner')
+        stats.stop('inner')
+        stats.stop('outer')
+        self.assertEqual(set(stats.times), {'outer', 'inner'})
+        self.assertEqual(stats._stages, [])
+
+    def test_stop_unwinds_stages_that_were_not_stopped(self):
+        stats = PDFStats()
+        stats.start('outer')
+        stats.start('inner')
+        stats.stop('outer')
+        self.assertEqual(stats._stages, [])
+
+    def test_extract_text(self):
+        stats = PDFStats()
+        text = extract_text(absolute_sample_path('simple1.pdf'), stats=stats)
+        document = stats.as_dict()['document']
+        self.assertEqual(document['counts']['pages'], 1)
+        self.assertEqual(len(stats.pages), 1)
+        self.assertGreaterEqual(document['counts']['chars'],
+                                len(text.split()))
+        self.assertIn('Tj', document['operators'])
+        self.assertIn('interpret', document['times'])
+        self.assertIn('layout', document['times'])
+        self.assertIn('xref', document['times'])
+
+    def test_pages_and_dump(self):
+        stats = PDFStats()
+        path = absolute_sample_path('simple3.pdf')
+        pages = list(extract_pages(path, stats=stats))
+        self.assertEqual(len(stats.pages), len(pages))
+        fp = io.StringIO()
+        stats.dump(fp)
+        dumped = json.loads(fp.getvalue())
+        self.assertEqual(len(dumped['pages']), len(pages))
+        self.assertEqual(sum(page['counts'].get('chars', 0)
+                             for page in dumped['pages']),
+                         dumped['document']['counts']['chars'])
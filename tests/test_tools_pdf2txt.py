@@ -32,6 +32,15 @@ class TestPdf2Txt():
     def test_simple3(self):
         run('simple3.pdf')
 
+    def test_simple1_tag(self):
+        run('simple1.pdf', '-t tag')
+
+    def test_simple1_raw(self):
+        run('simple1.pdf', '-t raw')
+
+    def test_simple1_json(self):
+        run('simple1.pdf', '-t json')
+
     def test_sample_one_byte_identity_encode(self):
         run('sampleOneByteIdentityEncode.pdf')
 
@@ -0,0 +1,35 @@
+import pstats
+
+from helpers import absolute_sample_path
+from tempfilepath import TemporaryFilePath
+from tools import prof
+
+
+class TestProf():
+    def test_pdf2txt_cprofile(self):
+        path = absolute_sample_path('simple1.pdf')
+        with TemporaryFilePath() as output_file_name, \
+                TemporaryFilePath() as prof_file_name:
+            prof.main(['-o', prof_file_name, 'pdf2txt', '-o',
+                       output_file_name, path])
+            stats = pstats.Stats(prof_file_name)
+            assert any(name == 'process_page'
+                       for (_, _, name) in stats.stats)
+
+    def test_dumppdf_sample_collapsed(self):
+        path = absolute_sample_path('simple1.pdf')
+        with TemporaryFilePath() as output_file_name, \
+                TemporaryFilePath() as collapsed_file_name:
+            prof.main(['-p', 'sample', '--interval', '0.0001',
+                       '--collapsed', collapsed_file_name, 'dumppdf',
+                       '-a', '-o', output_file_name, path])
+            with open(collapsed_file_name) as fp:
+                for line in fp:
+                    (stack, count) = line.rsplit(' ', 1)
+                    assert stack.startswith('<module>') or ';' in stack
+                    assert int(count) > 0
+
+    def test_call_with_tracemalloc(self):
+        path = absolute_sample_path('simple1.pdf')
+        prof.main(['-p', 'none', '--tracemalloc', '--call',
+                   'pdfminer.high_level.extract_text', path])
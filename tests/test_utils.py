@@ -3,7 +3,7 @@ import pathlib
 
 from helpers import absolute_sample_path
 from pdfminer.layout import LTComponent
-from pdfminer.utils import open_filename, Plane, shorten_str
+from pdfminer.utils import bbox2str, enc, open_filename, Plane, shorten_str
 
 
 class TestOpenFilename:
@@ -56,6 +56,56 @@ class TestPlane:
         result = list(plane.find((0, 0, 100, 100)))
         assert_equal(result, [obj])
 
+    def test_find_large_object_only_once(self):
+        plane, obj = self.given_plane_with_one_object(object_size=100,
+                                                      gridsize=10)
+        result = list(plane.find((5, 5, 95, 95)))
+        assert_equal(result, [obj])
+
+    def test_find_nothing_after_removing_large_object(self):
+        plane, obj = self.given_plane_with_one_object(object_size=100,
+                                                      gridsize=10)
+        plane.remove(obj)
+        result = list(plane.find((0, 0, 100, 100)))
+        assert_equal(result, [])
+        assert_equal(plane._grid, {})
+
+    def test_iter_keeps_order_after_removing(self):
+        plane = Plane((0, 0, 100, 100))
+        objs = [LTComponent((i, i, i + 10, i + 10)) for i in range(0, 50, 5)]
+        plane.extend(objs)
+        plane.remove(objs[3])
+        assert_equal(list(plane), objs[:3] + objs[4:])
+        assert_equal(len(plane), len(objs) - 1)
+
+    def test_remove_object_outside_plane(self):
+        plane = Plane((0, 0, 100, 100))
+        obj = LTComponent((200, 200, 210, 210))
+        plane.add(obj)
+        assert_equal(list(plane.find((0, 0, 300, 300))), [])
+        plane.remove(obj)
+        assert_equal(list(plane), [])
+
+    def test_find_objects_below_zero(self):
+        plane = Plane((-200, -200, 100, 100), gridsize=50)
+        bboxes = [(-0.5, -0.5, -0.1, -0.1), (-60, -60, -50, -50),
+                  (-120, -10, 10, 5), (-49.9, 0, 0.1, 0.5), (0, 0, 1, 1)]
+        objs = [LTComponent(bbox) for bbox in bboxes]
+        plane.extend(objs)
+        queries = [(-100, -100, 100, 100), (-1, -1, 0, 0),
+                   (-55, -55, -54, -54), (-0.3, -0.3, -0.2, -0.2),
+                   (-130, -1, -119, 0), (0.05, 0.2, 0.3, 0.3)]
+        for (x0, y0, x1, y1) in queries:
+            expected = [obj for obj in objs
+                        if x0 < obj.x1 and obj.x0 < x1
+                        and y0 < obj.y1 and obj.y0 < y1]
+            result = list(plane.find((x0, y0, x1, y1)))
+            assert_equal(len(result), len(expected))
+            assert_equal(set(result), set(expected))
+        for obj in objs:
+            plane.remove(obj)
+        assert_equal(plane._grid, {})
+
     @staticmethod
     def given_plane_with_one_object(object_size=50, gridsize=50):
         bounding_box = (0, 0, 100, 100)
@@ -76,3 +126,13 @@ class TestFunctions(object):
 
     def test_shorten_to_really_short(self):
         assert_equal('Hello', shorten_str('Hello World', 5))
+
+    def test_enc(self):
+        for _ in range(2):
+            assert_equal(enc('<'), '&lt;')
+            assert_equal(enc('a&"b\''), 'a&amp;&quot;b&#x27;')
+            assert_equal(enc(b'<'), '')
+
+    def test_bbox2str(self):
+        assert_equal(bbox2str([1, 2.5, 3.1234, -4]),
+                     '1.000,2.500,3.123,-4.000')
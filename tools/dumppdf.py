@@ -90,6 +90,8 @@ def dumpxml(out, obj, codec=None):
 
 
 def dumptrailers(out, doc, show_fallback_xref=False):
+    if show_fallback_xref:
+        doc.load_fallback()
     for xref in doc.xrefs:
         if not isinstance(xref, PDFXRefFallback) or show_fallback_xref:
             out.write('<trailer>\n')
@@ -107,6 +109,8 @@ def dumptrailers(out, doc, show_fallback_xref=False):
 def dumpallobjs(out, doc, codec=None, show_fallback_xref=False):
     visited = set()
     out.write('<pdf>')
+    # Also dump the objects that are not in any xref.
+    doc.load_fallback()
     for xref in doc.xrefs:
         for objid in xref.get_objids():
             if objid in visited:
@@ -210,6 +214,7 @@ def extractembedded(outfp, fname, objids, pagenos, password='',
         parser = PDFParser(fp)
         doc = PDFDocument(parser, password)
         extracted_objids = set()
+        doc.load_fallback()
         for xref in doc.xrefs:
             for objid in xref.get_objids():
                 obj = doc.getobj(objid)
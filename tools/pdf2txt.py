@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 """A command line tool for extracting text and images from PDF and
-output it to plain text, html, xml or tags."""
+output it to plain text, html, xml, json or tags."""
 import argparse
 import logging
 import sys
@@ -13,6 +13,8 @@ logging.basicConfig()
 OUTPUT_TYPES = ((".htm", "html"),
                 (".html", "html"),
                 (".xml", "xml"),
+                (".json", "json"),
+                (".ndjson", "json"),
                 (".tag", "tag"))
 
 
@@ -149,7 +151,9 @@ def maketheparser():
              "Or \"-\" (default) to write to stdout.")
     output_params.add_argument(
         "--output_type", "-t", type=str, default="text",
-        help="Type of output to generate {text,html,xml,tag}.")
+        help="Type of output to generate {text,raw,html,xml,json,tag}. "
+             "raw is the text in the order of the content streams, without "
+             "layout analysis. json is one JSON object per page.")
     output_params.add_argument(
         "--codec", "-c", type=str, default="utf-8",
         help="Text encoding to use in output file.")
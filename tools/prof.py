@@ -1,34 +1,221 @@
 #!/usr/bin/env python3
+"""Profile a pdfminer command or function.
+
+Runs pdf2txt.py, dumppdf.py or any function given as module.function with
+the remaining arguments, under cProfile or a sampling profiler, and
+optionally with tracemalloc. The reports are written to stderr, such that
+the output of the profiled command is not mixed with them.
+
+Examples:
+    prof.py pdf2txt -o out.txt samples/simple1.pdf
+    prof.py -p sample --collapsed out.folded dumppdf -a samples/simple1.pdf
+    prof.py --tracemalloc --call pdfminer.high_level.extract_text x.pdf
+"""
+import argparse
+import collections
+import cProfile
+import importlib
+import os.path
+import pstats
 import sys
+import threading
+import time
+import tracemalloc
+
+COMMANDS = ('pdf2txt', 'dumppdf')
+
+
+def get_function(name):
+    """Return the function with the given name or command"""
+    if name in COMMANDS:
+        try:
+            module = importlib.import_module('tools.' + name)
+        except ImportError:
+            # This script is run from the tools directory.
+            module = importlib.import_module(name)
+        return module.main
+    if '.' not in name:
+        raise ValueError('Not a command or module.function: %r' % name)
+    (modname, funcname) = name.rsplit('.', 1)
+    module = importlib.import_module(modname)
+    return getattr(module, funcname)
+
+
+class Sampler:
+    """Sampling profiler that records the stack of a thread periodically.
+
+    The stacks can be written in the collapsed format that is used by
+    flamegraph.pl, speedscope and similar tools.
+    """
+
+    def __init__(self, interval=0.001, thread_id=None):
+        self.interval = interval
+        if thread_id is None:
+            thread_id = threading.get_ident()
+        self.thread_id = thread_id
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+        return
+
+    def __enter__(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stop.set()
+        self._thread.join()
+        return
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                filename = os.path.basename(code.co_filename)
+                stack.append('%s (%s:%d)' % (code.co_name, filename,
+                                             code.co_firstlineno))
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+        return
 
+    def write_collapsed(self, fp):
+        for (stack, count) in sorted(self.stacks.items()):
+            fp.write('%s %d\n' % (';'.join(stack), count))
+        return
 
-def prof_main(argv):
-    import hotshot.stats
-
-    def usage():
-        print('usage: %s module.function [args ...]' % argv[0])
-        return 100
-    args = argv[1:]
-    if len(args) < 1:
-        return usage()
-    name = args.pop(0)
-    prof = name+'.prof'
-    i = name.rindex('.')
-    (modname, funcname) = (name[:i], name[i+1:])
-    module = __import__(modname, fromlist=1)
-    func = getattr(module, funcname)
-    if args:
-        args.insert(0, argv[0])
-        prof = hotshot.Profile(prof)
-        prof.runcall(lambda: func(args))
-        prof.close()
+    def print_stats(self, fp, limit):
+        """Print the functions with the most samples"""
+        own = collections.Counter()
+        cumulative = collections.Counter()
+        for (stack, count) in self.stacks.items():
+            own[stack[-1]] += count
+            for function in set(stack):
+                cumulative[function] += count
+        total = sum(self.stacks.values()) or 1
+        fp.write('%d samples, every %gs\n' % (total, self.interval))
+        fp.write('%8s %8s  %s\n' % ('own%', 'cum%', 'function'))
+        for (function, count) in own.most_common(limit):
+            fp.write('%8.1f %8.1f  %s\n' % (100 * count / total,
+                                            100 * cumulative[function] / total,
+                                            function))
+        return
+
+
+def print_allocations(fp, snapshot, limit):
+    """Print the source lines that allocated the most memory"""
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ))
+    fp.write('Top %d allocation sites:\n' % limit)
+    for stat in snapshot.statistics('lineno')[:limit]:
+        frame = stat.traceback[0]
+        fp.write('%10.1f KiB %8d blocks  %s:%d\n'
+                 % (stat.size / 1024, stat.count, frame.filename,
+                    frame.lineno))
+    return
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(
+        description=__doc__, add_help=True,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        'function', type=str,
+        help='pdf2txt, dumppdf or module.function to profile.')
+    parser.add_argument(
+        'args', nargs=argparse.REMAINDER,
+        help='Arguments for the function. A command or function gets them '
+             'as a list, or as separate arguments with --call.')
+    parser.add_argument(
+        '--call', '-c', default=False, action='store_true',
+        help='Call the function with the arguments as separate strings '
+             'instead of as a list.')
+    parser.add_argument(
+        '--profiler', '-p', choices=('cprofile', 'sample', 'none'),
+        default='cprofile', help='Profiler to use.')
+    parser.add_argument(
+        '--sort', '-s', default='tottime',
+        help='Sort order of the cProfile stats, see pstats.Stats.sort_stats.')
+    parser.add_argument(
+        '--limit', '-l', type=int, default=30,
+        help='Number of functions or allocation sites to report.')
+    parser.add_argument(
+        '--output', '-o', type=str, default=None,
+        help='Save the cProfile stats to this file, for use with pstats, '
+             'snakeviz or similar tools.')
+    parser.add_argument(
+        '--collapsed', type=str, default=None,
+        help='Write the sampled stacks in collapsed format to this file, '
+             'for flame graphs. Needs the sampling profiler.')
+    parser.add_argument(
+        '--interval', type=float, default=0.001,
+        help='Seconds between two samples of the sampling profiler.')
+    parser.add_argument(
+        '--tracemalloc', '-m', default=False, action='store_true',
+        help='Trace memory allocations and report the top allocation sites.')
+    return parser
+
+
+def main(argv=None):
+    parser = create_parser()
+    args = parser.parse_args(args=argv)
+    if args.collapsed and args.profiler != 'sample':
+        parser.error('--collapsed needs --profiler sample')
+    if args.output and args.profiler != 'cprofile':
+        parser.error('--output needs --profiler cprofile')
+
+    func = get_function(args.function)
+    if args.call:
+        def run():
+            return func(*args.args)
+    else:
+        def run():
+            return func(args.args)
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    t0 = time.perf_counter()
+    if args.profiler == 'cprofile':
+        profile = cProfile.Profile()
+        result = profile.runcall(run)
+    elif args.profiler == 'sample':
+        with Sampler(args.interval) as sampler:
+            result = run()
     else:
-        stats = hotshot.stats.load(prof)
+        result = run()
+    seconds = time.perf_counter() - t0
+    if args.tracemalloc:
+        snapshot = tracemalloc.take_snapshot()
+        (_, peak) = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    out = sys.stderr
+    out.write('%s took %.3fs\n' % (args.function, seconds))
+    if args.profiler == 'cprofile':
+        if args.output:
+            profile.dump_stats(args.output)
+        stats = pstats.Stats(profile, stream=out)
         stats.strip_dirs()
-        stats.sort_stats('time', 'calls')
-        stats.print_stats(1000)
-    return
+        stats.sort_stats(args.sort)
+        stats.print_stats(args.limit)
+    elif args.profiler == 'sample':
+        if args.collapsed:
+            with open(args.collapsed, 'w') as fp:
+                sampler.write_collapsed(fp)
+        sampler.print_stats(out, args.limit)
+    if args.tracemalloc:
+        out.write('Peak traced memory: %.1f KiB\n' % (peak / 1024))
+        print_allocations(out, snapshot, args.limit)
+    if isinstance(result, int):
+        return result
+    return 0
 
 
 if __name__ == '__main__':
-    sys.exit(prof_main(sys.argv))
+    sys.exit(main())